@@ -0,0 +1,53 @@
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..deps import get_db
+from ..services import alert_rules, alerts, writer
+
+router = APIRouter()
+
+
+@router.post("/games/{game_id}/alerts", response_model=schemas.AlertRuleRead)
+def create_alert_rule(
+    game_id: int, rule_in: schemas.AlertRuleCreate, db: Session = Depends(get_db)
+) -> schemas.AlertRuleRead:
+    """Alert when a store's price drops to target_price, or its discount reaches min_discount percent"""
+    if (rule_in.target_price is None) == (rule_in.min_discount is None):
+        raise HTTPException(status_code=400, detail="Set exactly one of target_price and min_discount")
+    if rule_in.target_price is not None and rule_in.target_price <= 0:
+        raise HTTPException(status_code=400, detail="target_price must be positive")
+    if rule_in.min_discount is not None and not 0 < rule_in.min_discount <= 100:
+        raise HTTPException(status_code=400, detail="min_discount must be a percentage between 0 and 100")
+    if crud.get_game(db, game_id) is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return writer.writes.run(db, crud.create_alert_rule, game_id, rule_in.target_price, rule_in.min_discount)
+
+
+@router.get("/games/{game_id}/alerts", response_model=List[schemas.AlertRuleRead])
+def list_alert_rules(game_id: int, db: Session = Depends(get_db)) -> List[schemas.AlertRuleRead]:
+    return crud.list_alert_rules(db, game_id)
+
+
+@router.delete("/alerts/rules/{rule_id}", status_code=204)
+def delete_alert_rule(rule_id: int, db: Session = Depends(get_db)) -> Response:
+    if not writer.writes.run(db, crud.delete_alert_rule, rule_id):
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return Response(status_code=204)
+
+
+@router.get("/alerts", response_model=List[schemas.PriceAlertRead])
+def list_alerts(
+    pending: bool = Query(False, description="Only alerts still waiting for delivery"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> List[schemas.PriceAlertRead]:
+    """Fired alerts, newest first (pending ones in delivery order)"""
+    return crud.list_alerts(db, limit=limit, pending=pending)
+
+
+@router.get("/alerts/stats")
+def alert_stats() -> Dict[str, Dict[str, object]]:
+    return {"rules": alert_rules.index.stats(), "delivery": alerts.delivery.stats()}
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..deps import get_db
+from ..services import analytics
+from ..services.response_cache import make_etag, responses
+from ..services.serialization import dumps
+
+router = APIRouter()
+
+
+@router.get("/games/{game_id}/analytics", response_model=schemas.GameAnalytics)
+def game_analytics(
+    request: Request,
+    game_id: int,
+    series: bool = Query(False, description="Include the daily best price and moving averages per day"),
+    db: Session = Depends(get_db),
+) -> Response:
+    """All-time lows, price percentile, discount depth, time since the last sale and moving averages"""
+    version = crud.get_game_version(db, game_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    stores_version = crud.get_versions(db, ["stores"])["stores"]
+    crud.sync_store_cache(db, stores_version)
+    # days_since_sale moves with the calendar
+    etag = make_etag("analytics", game_id, version, stores_version, series, datetime.utcnow().date())
+    return responses.respond(request, etag, lambda: dumps(analytics.game_analytics(db, game_id, version, series)))
+
+
+@router.get("/analytics/discounts", response_model=schemas.DiscountReport)
+def watchlist_discounts(
+    request: Request,
+    days: int = Query(90, ge=7, le=365, description="Window of daily closes the median is taken over"),
+    limit: int = Query(20, ge=1, le=500),
+    min_days: int = Query(7, ge=1, description="Skip games with fewer days of closes in the window"),
+    db: Session = Depends(get_db),
+) -> Response:
+    """Games whose current best price is furthest below their median daily close over the window"""
+    versions = crud.get_versions(db, ["watchlist", "stores"])
+    crud.sync_store_cache(db, versions["stores"])
+    today = datetime.utcnow().date()
+    etag = make_etag("discounts", versions["watchlist"], versions["stores"], days, limit, min_days, today)
+    return responses.respond(
+        request, etag, lambda: dumps(analytics.watchlist_discounts(db, days=days, limit=limit, min_days=min_days))
+    )
+
+
+@router.get("/analytics/stats")
+def analytics_stats() -> Dict[str, Dict[str, int]]:
+    return {"histories": analytics.histories.stats(), "closes": analytics.closes.stats()}
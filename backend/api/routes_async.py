@@ -0,0 +1,99 @@
+"""
+Async handlers for the hot request paths, registered ahead of the sync routes when ASYNC_MODE=1.
+
+Upstream calls go through the async HTTP client and reads run on the async engine; the sync
+crud functions are reused through AsyncSession.run_sync, so both modes share one
+implementation of every query. Writes go through the write queue (writer.writes.run_async),
+like their sync counterparts.
+"""
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..deps import get_async_db
+from ..services import price_api, writer
+from ..services.response_cache import responses
+from ..services.search_cache import SEARCH_CACHE_TTL, normalize_query
+from ..services.search_index import SEARCH_LOCAL_MIN_RESULTS, index
+from .routes_games import game_detail_body, game_detail_etag
+from .routes_search import search_cache
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=List[schemas.SearchResult])
+async def search_games(
+    q: str = Query(..., description="Search query"), db: AsyncSession = Depends(get_async_db)
+) -> List[schemas.SearchResult]:
+    query = normalize_query(q)
+    if not query:
+        return []
+    # Queries CheapShark answered within the cache TTL, or that match plenty of known titles, stay local;
+    # older answers go back through the search cache so cheapestPrice gets refreshed
+    local = index.search(query)
+    if local and (index.has_seen(query, SEARCH_CACHE_TTL) or len(local) >= SEARCH_LOCAL_MIN_RESULTS):
+        return [schemas.SearchResult(**item) for item in local]
+    try:
+        results = await search_cache.get_async(query, price_api.search_games_async)
+    except price_api.CheapSharkError as exc:
+        if local:
+            return [schemas.SearchResult(**item) for item in local]
+        raise HTTPException(status_code=503, detail=f"CheapShark unavailable: {exc}")
+    if not index.has_seen(query, SEARCH_CACHE_TTL):
+        await writer.writes.run_async(db, crud.record_search_results, query, results)
+        index.add(results)
+        index.mark_seen([(query, datetime.utcnow())])
+    return [schemas.SearchResult(**item) for item in results]
+
+
+@router.post("/games", response_model=schemas.GameRead)
+async def add_game(game_in: schemas.GameCreate, db: AsyncSession = Depends(get_async_db)) -> schemas.GameRead:
+    existing = await db.run_sync(crud.get_game_by_api_id, game_in.api_game_id)
+    if existing:
+        return schemas.GameRead.model_validate(existing)
+
+    try:
+        details = await price_api.get_game_details_async(game_in.api_game_id)
+        title, thumb, snapshots = price_api.extract_snapshot_rows(details)
+    except price_api.CheapSharkError as exc:
+        raise HTTPException(status_code=503, detail=f"CheapShark unavailable: {exc}")
+
+    derived_store_url = price_api.steam_store_url(details)
+    game_data = schemas.GameCreate(
+        api_game_id=game_in.api_game_id,
+        title=game_in.title or title,
+        cover_image_url=game_in.cover_image_url or thumb,
+        store_url=game_in.store_url or derived_store_url,
+    )
+
+    def create(session: Session) -> schemas.GameRead:
+        game = crud.create_game(session, game_data)
+        if snapshots:
+            crud.upsert_price_snapshots(session, game.id, snapshots)
+        return schemas.GameRead.model_validate(game)
+
+    game = await writer.writes.run_async(db, create)
+    if snapshots:
+        await price_api.sync_stores_async(db)
+    return game
+
+
+@router.get("/games/{game_id}", response_model=schemas.GameDetailResponse)
+async def game_detail(
+    request: Request,
+    game_id: int,
+    resolution: Literal["day", "week", "month"] = "day",
+    days: Optional[int] = Query(None, ge=1, description="Only include the last N days of history"),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    etag = await db.run_sync(game_detail_etag, game_id, resolution, days)
+    if etag is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    return await responses.respond_async(
+        request, etag, lambda: db.run_sync(game_detail_body, game_id, resolution, days)
+    )
@@ -1,14 +1,22 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, Iterator, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from .. import crud, schemas
+from ..database import SessionLocal
 from ..deps import get_db
-from ..services import price_api, scraper
+from ..services import export, price_api, scrape_queue, scraper, watchlist_import, writer
+from ..services.response_cache import make_etag, responses
+from ..services.serialization import dumps, ndjson
 
 router = APIRouter()
 
+# Games read per query while streaming the watchlist
+STREAM_PAGE_SIZE = 500
+
 
 @router.post("/games", response_model=schemas.GameRead)
 def add_game(game_in: schemas.GameCreate, db: Session = Depends(get_db)) -> schemas.GameRead:
@@ -22,8 +30,7 @@ def add_game(game_in: schemas.GameCreate, db: Session = Depends(get_db)) -> sche
     except price_api.CheapSharkError as exc:
         raise HTTPException(status_code=503, detail=f"CheapShark unavailable: {exc}")
 
-    steam_app_id = details.get("info", {}).get("steamAppID") if isinstance(details, dict) else None
-    derived_store_url = f"https://store.steampowered.com/app/{steam_app_id}" if steam_app_id else None
+    derived_store_url = price_api.steam_store_url(details)
 
     # use provided values if available, otherwise fallback to CheapShark data
     game_data = schemas.GameCreate(
@@ -32,50 +39,218 @@ def add_game(game_in: schemas.GameCreate, db: Session = Depends(get_db)) -> sche
         cover_image_url=game_in.cover_image_url or thumb,
         store_url=game_in.store_url or derived_store_url,
     )
-    game = crud.create_game(db, game_data)
 
+    def create(session: Session) -> schemas.GameRead:
+        game = crud.create_game(session, game_data)
+        if snapshots:
+            crud.upsert_price_snapshots(session, game.id, snapshots)
+        return schemas.GameRead.model_validate(game)
+
+    game = writer.writes.run(db, create)
     if snapshots:
-        crud.upsert_price_snapshots(db, game.id, snapshots)
+        # Names stores first seen in these deals (no-op while the last sync is fresh)
+        price_api.sync_stores(db)
+
+    return game
+
+
+@router.post("/games/batch", response_model=schemas.GameImportSummary)
+def add_games(batch: schemas.GameBatchCreate, db: Session = Depends(get_db)) -> schemas.GameImportSummary:
+    """Adds many games with batched CheapShark lookups and bulk inserts; existing games are skipped"""
+    return watchlist_import.import_games(db, batch.games)
+
+
+@router.get("/games", response_model=schemas.GamePage)
+def list_games(
+    request: Request,
+    sort: Literal["created", "title", "best_price", "discount", "last_updated"] = "created",
+    order: Optional[Literal["asc", "desc"]] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    max_price: Optional[float] = Query(None, ge=0),
+    store: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+    db: Session = Depends(get_db),
+) -> Response:
+    versions = crud.get_versions(db, ["watchlist", "stores"])
+    crud.sync_store_cache(db, versions["stores"])
+    etag = make_etag("games", versions["watchlist"], versions["stores"], request.url.query)
+
+    def build() -> bytes:
+        try:
+            games, next_cursor = crud.list_games_page(
+                db,
+                sort=sort,
+                order=order,
+                limit=limit,
+                cursor=cursor,
+                max_price=max_price,
+                store=store,
+                title_prefix=title_prefix,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return dumps({"items": [crud.game_summary_dict(game) for game in games], "next_cursor": next_cursor})
+
+    return responses.respond(request, etag, build)
+
+
+@router.get("/games.ndjson")
+def stream_games(
+    sort: Literal["created", "title", "best_price", "discount", "last_updated"] = "created",
+    order: Optional[Literal["asc", "desc"]] = None,
+    max_price: Optional[float] = Query(None, ge=0),
+    store: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+) -> StreamingResponse:
+    """The whole (filtered) watchlist as one GameSummary per line, read a keyset page at a time"""
+
+    def pages() -> Iterator[dict]:
+        db = SessionLocal()
+        try:
+            cursor = None
+            while True:
+                games, cursor = crud.list_games_page(
+                    db,
+                    sort=sort,
+                    order=order,
+                    limit=STREAM_PAGE_SIZE,
+                    cursor=cursor,
+                    max_price=max_price,
+                    store=store,
+                    title_prefix=title_prefix,
+                )
+                yield from (crud.game_summary_dict(game) for game in games)
+                if cursor is None:
+                    return
+        finally:
+            db.close()
+
+    return StreamingResponse(ndjson(pages()), media_type="application/x-ndjson")
+
+
+@router.get("/games/{game_id}/history.ndjson")
+def stream_history(
+    game_id: int,
+    resolution: Literal["day", "week", "month"] = "day",
+    days: Optional[int] = Query(None, ge=1, description="Only include the last N days of history"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """A game's full price history as one PriceHistoryPoint per line"""
+    if crud.get_game_version(db, game_id) is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    def points() -> Iterator[dict]:
+        # The request session may be closed before the body is sent; the stream reads on its own
+        session = SessionLocal()
+        try:
+            yield from crud.iter_price_history(session, game_id, resolution=resolution, days=days)
+        finally:
+            session.close()
 
-    return game  # type: ignore
+    return StreamingResponse(ndjson(points()), media_type="application/x-ndjson")
 
 
-@router.get("/games", response_model=List[schemas.GameSummary])
-def list_games(db: Session = Depends(get_db)) -> List[schemas.GameSummary]:
-    games = crud.get_games_with_summary(db)
-    return games
+@router.get("/snapshots/export")
+def export_snapshots(
+    format: Literal["csv", "parquet"] = "csv",
+    game_id: Optional[int] = None,
+    since: Optional[datetime] = Query(None, description="Only snapshots taken at or after this time"),
+) -> StreamingResponse:
+    """Raw price snapshots streamed as CSV or Parquet, read through a server-side cursor"""
+    def chunks() -> Iterator[list]:
+        db = SessionLocal()
+        try:
+            yield from crud.iter_snapshot_export(db, game_id=game_id, since=since, chunk_size=export.EXPORT_CHUNK_ROWS)
+        finally:
+            db.close()
+
+    if format == "parquet":
+        body, media_type = export.parquet_chunks(chunks()), "application/vnd.apache.parquet"
+    else:
+        body, media_type = export.csv_chunks(chunks()), "text/csv"
+    headers = {"Content-Disposition": f'attachment; filename="price_snapshots.{format}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
 
 
 @router.get("/games/{game_id}", response_model=schemas.GameDetailResponse)
-def game_detail(game_id: int, db: Session = Depends(get_db)) -> schemas.GameDetailResponse:
-    game = crud.get_game(db, game_id)
-    if not game:
+def game_detail(
+    request: Request,
+    game_id: int,
+    resolution: Literal["day", "week", "month"] = "day",
+    days: Optional[int] = Query(None, ge=1, description="Only include the last N days of history"),
+    db: Session = Depends(get_db),
+) -> Response:
+    etag = game_detail_etag(db, game_id, resolution, days)
+    if etag is None:
         raise HTTPException(status_code=404, detail="Game not found")
 
-    current_prices = crud.get_latest_prices_by_store(db, game_id)
-    history = crud.get_price_history(db, game_id)
-    metadata = crud.get_metadata(db, game_id)
+    return responses.respond(request, etag, lambda: game_detail_body(db, game_id, resolution, days))
 
-    return schemas.GameDetailResponse(
-        game=schemas.GameRead.from_orm(game),
-        current_prices=[schemas.PriceSnapshotRead.from_orm(p) for p in current_prices],
-        history=history,
-        metadata=metadata,
+
+def game_detail_body(db: Session, game_id: int, resolution: str, days: Optional[int]) -> bytes:
+    """The GameDetailResponse JSON, built from rows and plain dicts without per-row schema validation."""
+    metadata = crud.get_metadata(db, game_id)
+    return dumps(
+        {
+            "game": crud.game_read_dict(crud.get_game(db, game_id)),
+            "current_prices": crud.latest_price_dicts(db, game_id),
+            "history": list(crud.iter_price_history(db, game_id, resolution=resolution, days=days)),
+            "metadata": metadata.model_dump() if metadata else None,
+        }
     )
 
 
-@router.post("/games/{game_id}/refresh_metadata", response_model=schemas.GameMetadataRead)
-def refresh_metadata(game_id: int, db: Session = Depends(get_db)) -> schemas.GameMetadataRead:
+def game_detail_etag(db: Session, game_id: int, resolution: str, days: Optional[int]) -> Optional[str]:
+    """ETag for a game's detail response from the games and data_versions rows alone; None if no such game."""
+    version = crud.get_game_version(db, game_id)
+    if version is None:
+        return None
+    stores_version = crud.get_versions(db, ["stores"])["stores"]
+    crud.sync_store_cache(db, stores_version)
+    # A trailing window of days moves with the (UTC) calendar even when no data changes
+    window_end = datetime.utcnow().date() if days else None
+    return make_etag("game", game_id, version, stores_version, resolution, days, window_end)
+
+
+@router.post("/games/{game_id}/refresh_metadata", response_model=schemas.ScrapeJobRead, status_code=202)
+def refresh_metadata(
+    game_id: int,
+    force: bool = Query(False, description="Fetch even if the metadata was scraped within the freshness window"),
+    db: Session = Depends(get_db),
+) -> schemas.ScrapeJobRead:
     game = crud.get_game(db, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     if not game.store_url:
         raise HTTPException(status_code=400, detail="Game has no store_url to scrape")
     try:
-        scraper.update_game_metadata(db, game)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc))
-    metadata = crud.get_metadata(db, game_id)
-    if metadata is None:
-        raise HTTPException(status_code=500, detail="Failed to store metadata")
-    return metadata
+        job = scrape_queue.scrapes.enqueue([(game.id, game.store_url)], force=force)
+    except scrape_queue.QueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return job.as_schema()
+
+
+@router.post("/metadata/refresh_stale", response_model=schemas.ScrapeJobRead, status_code=202)
+def refresh_stale_metadata(
+    max_age_hours: float = Query(scrape_queue.METADATA_MAX_AGE_HOURS, ge=0),
+) -> schemas.ScrapeJobRead:
+    try:
+        job = scrape_queue.scrapes.enqueue_stale(max_age_hours)
+    except scrape_queue.QueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return job.as_schema()
+
+
+@router.get("/metadata/stats")
+def metadata_stats() -> Dict[str, int]:
+    """Scrape queue depth and metadata refresh outcomes, including fetches and parses avoided"""
+    return {**scrape_queue.scrapes.stats(), **scraper.fetch_stats()}
+
+
+@router.get("/metadata/jobs/{job_id}", response_model=schemas.ScrapeJobRead)
+def metadata_job(job_id: str) -> schemas.ScrapeJobRead:
+    job = scrape_queue.scrapes.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return job.as_schema()
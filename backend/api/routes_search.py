@@ -1,17 +1,55 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
 
-from .. import schemas
-from ..services import price_api
+from .. import crud, schemas
+from ..deps import get_db
+from ..services import price_api, writer
+from ..services.search_cache import SEARCH_CACHE_TTL, TTLCache, normalize_query
+from ..services.search_index import SEARCH_LOCAL_MIN_RESULTS, index
 
 router = APIRouter()
 
+# Keyed by normalized query; shared by all requests in this process
+search_cache: TTLCache[List[Dict[str, Optional[str]]]] = TTLCache(price_api.search_games)
+
 
 @router.get("/search", response_model=List[schemas.SearchResult])
-def search_games(q: str = Query(..., description="Search query")) -> List[schemas.SearchResult]:
+def search_games(
+    q: str = Query(..., description="Search query"), db: Session = Depends(get_db)
+) -> List[schemas.SearchResult]:
+    query = normalize_query(q)
+    if not query:
+        return []
+    # Queries CheapShark answered within the cache TTL, or that match plenty of known titles, stay local;
+    # older answers go back through the search cache so cheapestPrice gets refreshed
+    local = index.search(query)
+    if local and (index.has_seen(query, SEARCH_CACHE_TTL) or len(local) >= SEARCH_LOCAL_MIN_RESULTS):
+        return [schemas.SearchResult(**item) for item in local]
     try:
-        results = price_api.search_games(q)
+        results = search_cache.get(query)
     except price_api.CheapSharkError as exc:
+        if local:
+            return [schemas.SearchResult(**item) for item in local]
         raise HTTPException(status_code=503, detail=f"CheapShark unavailable: {exc}")
+    if not index.has_seen(query, SEARCH_CACHE_TTL):
+        writer.writes.run(db, crud.record_search_results, query, results)
+        index.add(results)
+        index.mark_seen([(query, datetime.utcnow())])
     return [schemas.SearchResult(**item) for item in results]
+
+
+@router.get("/search/suggest", response_model=List[schemas.SearchResult])
+def suggest_games(
+    q: str = Query(..., description="Partial title"), limit: int = Query(10, ge=1, le=50)
+) -> List[schemas.SearchResult]:
+    """Autocomplete from the local title index only; never calls CheapShark"""
+    return [schemas.SearchResult(**item) for item in index.search(q, limit=limit)]
+
+
+@router.get("/search/stats")
+def search_cache_stats() -> Dict[str, int]:
+    """Hit/miss/coalesce counters for the search cache"""
+    return search_cache.stats()
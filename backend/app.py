@@ -1,12 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from .database import Base, engine
-from .api import routes_games, routes_refresh, routes_search
-from .scheduler import start_scheduler
+from . import crud
+from .database import ASYNC_MODE, SessionLocal, engine, ensure_schema
+from .api import routes_alerts, routes_analytics, routes_async, routes_games, routes_refresh, routes_search
+from .scheduler import scheduler_lease, scheduler_status, start_scheduler, stop_scheduler
+from .services import http_client, metrics, response_cache, scrape_queue, search_index, store_cache, writer
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+# Create tables if they don't exist and add any newer columns/indexes
+ensure_schema()
 
 app = FastAPI(title="GamePriceLens")
 
@@ -20,17 +23,133 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency covers the other middleware and streamed bodies
+app.add_middleware(metrics.MetricsMiddleware)
+
+if ASYNC_MODE:
+    # Registered first so these handlers take precedence over their sync counterparts
+    app.include_router(routes_async.router, prefix="/api", tags=["async"])
 app.include_router(routes_search.router, prefix="/api", tags=["search"])
 app.include_router(routes_games.router, prefix="/api", tags=["games"])
 app.include_router(routes_refresh.router, prefix="/api", tags=["refresh"])
+app.include_router(routes_alerts.router, prefix="/api", tags=["alerts"])
+app.include_router(routes_analytics.router, prefix="/api", tags=["analytics"])
 
 
 @app.on_event("startup")
 def startup_event():
-    """Start background tasks on application startup"""
+    """Load the store cache and local search index and start background tasks on application startup"""
+    db = SessionLocal()
+    try:
+        store_cache.stores.load(db)
+        search_index.index.add(crud.list_search_titles(db))
+        search_index.index.mark_seen(crud.list_search_queries(db))
+    finally:
+        db.close()
     start_scheduler()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_scheduler()
+    await http_client.client.aclose()
+
+
 @app.get("/api/health")
 def health() -> dict:
-    return {"status": "ok"}
+    """Liveness, including whether the scheduler threads are running and when prices were last refreshed"""
+    scheduler = scheduler_status()
+    degraded = bool(scheduler["threads"]) and not scheduler["running"]
+    return {"status": "degraded" if degraded else "ok", "scheduler": scheduler}
+
+
+# Counters other components already keep, read on every scrape
+metrics.registry.collector(
+    "upstream_http_attempts_total",
+    "counter",
+    "HTTP attempts per upstream host, retries included",
+    lambda: [({"host": host}, stats["requests"]) for host, stats in http_client.host_stats().items()],
+)
+metrics.registry.collector(
+    "upstream_http_retries_total",
+    "counter",
+    "Retried upstream attempts per host",
+    lambda: [({"host": host}, stats["retries"]) for host, stats in http_client.host_stats().items()],
+)
+metrics.registry.collector(
+    "upstream_circuit_open",
+    "gauge",
+    "1 while the host's circuit breaker is open or half-open",
+    lambda: [({"host": host}, int(stats["circuit"] != "closed")) for host, stats in http_client.host_stats().items()],
+)
+metrics.registry.collector(
+    "db_pool_checked_out",
+    "gauge",
+    "Database connections currently checked out of the pool",
+    lambda: [({}, engine.pool.checkedout())] if hasattr(engine.pool, "checkedout") else [],
+)
+metrics.registry.collector(
+    "sqlite_writer_queued",
+    "gauge",
+    "Writes waiting for the SQLite writer",
+    lambda: [({}, writer.writes.stats()["queued"])],
+)
+metrics.registry.collector(
+    "sqlite_writer_transactions_total",
+    "counter",
+    "Transactions committed by the SQLite writer",
+    lambda: [({}, writer.writes.stats()["transactions"])],
+)
+metrics.registry.collector(
+    "scrape_queue_depth",
+    "gauge",
+    "Store pages waiting to be scraped",
+    lambda: [({}, scrape_queue.scrapes.stats()["queued"])],
+)
+metrics.registry.collector(
+    "response_cache_requests_total",
+    "counter",
+    "Games list/detail responses by how they were answered",
+    lambda: [
+        ({"result": name}, value) for name, value in response_cache.responses.stats().items() if name != "size"
+    ],
+)
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus text exposition of request, database, upstream and refresh metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/health/upstream")
+def upstream_health() -> dict:
+    """Per-host request, error and latency counters for upstream APIs"""
+    return http_client.host_stats()
+
+
+@app.get("/api/health/scheduler")
+def scheduler_health() -> dict:
+    """Whether this process holds the scheduler lease, and who does"""
+    db = SessionLocal()
+    try:
+        lease = crud.get_lease(db, scheduler_lease.name)
+    finally:
+        db.close()
+    return {
+        **scheduler_lease.status(),
+        "current_holder": lease.holder if lease else None,
+        "expires_at": lease.expires_at if lease else None,
+    }
+
+
+@app.get("/api/health/db")
+def db_health() -> dict:
+    """Connection pool state and SQLite writer queue counters (writes grouped per transaction)"""
+    return {"pool": engine.pool.status(), "writer": writer.writes.stats()}
+
+
+@app.get("/api/health/responses")
+def response_cache_health() -> dict:
+    """304 and cached-body counters for the games list and detail responses"""
+    return response_cache.responses.stats()
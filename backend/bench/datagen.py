@@ -0,0 +1,103 @@
+"""
+Synthetic data: fills a database with N games x M stores x D days of price snapshots.
+
+Usage (from the repo root):
+    python -m backend.bench.datagen --games 1000 --stores 8 --days 30
+    python -m backend.bench.datagen --url sqlite:///./bench.db --games 5000 --reset
+
+Game N has api_game_id "N", matching the fake CheapShark catalog (backend.bench.fake_upstream).
+Snapshots go through crud.bulk_insert_snapshots one day at a time, so current prices, daily
+rollups and watchlist summaries are maintained exactly as by real refreshes. Prices follow a
+seeded random walk: each day a fraction `churn` of (game, store) prices moves.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from .. import crud, schemas
+from ..database import Base
+from ..services import store_cache
+
+
+def populate(
+    db: Session,
+    games: int,
+    stores: int,
+    days: int,
+    steam_base: Optional[str] = None,
+    churn: float = 0.1,
+    seed: int = 7,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Adds games 1..N with `days` daily snapshots for each of `stores` stores, ending at `now`.
+    With `steam_base`, each game's store_url points at `<steam_base>/app/<N>`. Returns counts.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    ids = crud.bulk_create_games(
+        db,
+        [
+            schemas.GameCreate(
+                api_game_id=str(number),
+                title=f"Game {number}",
+                store_url=f"{steam_base}/app/{number}" if steam_base else None,
+            )
+            for number in range(1, games + 1)
+        ],
+    )
+    crud.sync_stores(db, {str(store): f"Shop {store}" for store in range(1, stores + 1)}, synced_at=now)
+
+    prices: Dict[Tuple[int, str], Tuple[float, float]] = {}
+    for game_id in ids.values():
+        for store in range(1, stores + 1):
+            retail = round(rng.uniform(5, 70), 2)
+            prices[(game_id, str(store))] = (round(retail * rng.uniform(0.2, 1.0), 2), retail)
+
+    snapshots = 0
+    for day in range(days - 1, -1, -1):
+        for key, (price, retail) in prices.items():
+            if rng.random() < churn:
+                prices[key] = (round(retail * rng.uniform(0.2, 1.0), 2), retail)
+        rows = [(game_id, store, price, retail, "USD") for (game_id, store), (price, retail) in prices.items()]
+        snapshots += crud.bulk_insert_snapshots(db, rows, timestamp=now - timedelta(days=day), write_mode="append")
+    return {"games": len(ids), "stores": stores, "days": days, "snapshots": snapshots}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///./bench.db", help="database URL (default: ./bench.db)")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--stores", type=int, default=8)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--steam-base", default=None, help="base URL for generated store_url values")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate every table first")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        store_cache.stores.load(session)
+        started = time.perf_counter()
+        counts = populate(session, args.games, args.stores, args.days, steam_base=args.steam_base, seed=args.seed)
+        elapsed = time.perf_counter() - started
+    finally:
+        session.close()
+        engine.dispose()
+    print(
+        f"{counts['games']} games x {counts['stores']} stores x {counts['days']} days: "
+        f"{counts['snapshots']} snapshots in {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
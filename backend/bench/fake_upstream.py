@@ -0,0 +1,203 @@
+"""
+Local stand-ins for CheapShark and the Steam store, for benchmarks that must not touch the network.
+
+    python -m backend.bench.fake_upstream --stores 8 --latency 0.05 --error-rate 0.01
+
+Both servers answer from a deterministic catalog derived from the game id (game N is titled
+"Game N" with one deal per store), add `latency` seconds (± `jitter`) to every response and
+answer a fraction `error_rate` of requests with 503, which the shared HTTP client retries.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .scrape import _synthetic_page
+
+# Most search results CheapShark returns for one title query
+SEARCH_LIMIT = 60
+
+
+class _FakeServer:
+    """ThreadingHTTPServer on a free local port, run from a daemon thread."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 7) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]  # type: ignore[union-attr]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_FakeServer":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                fake._handle(self)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "_FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors}
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.error_rate
+            self.errors += int(fail)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self._send(handler, 503, b'{"error":"unavailable"}', "application/json")
+            return
+        parts = urlsplit(handler.path)
+        status, body, content_type, headers = self.respond(parts.path, parse_qs(parts.query), handler.headers)
+        self._send(handler, status, body, content_type, headers)
+
+    def respond(self, path: str, query: Dict[str, List[str]], headers) -> Tuple[int, bytes, str, Dict[str, str]]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _send(
+        handler: BaseHTTPRequestHandler,
+        status: int,
+        body: bytes,
+        content_type: str,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+class FakeCheapShark(_FakeServer):
+    """
+    Serves /api/1.0/games (?title=, ?id=, ?ids=) and /api/1.0/stores. A fraction `price_churn`
+    of deals moves each time a game is looked up, so repeated refreshes see some changes.
+    """
+
+    def __init__(self, stores: int = 8, games: int = 1000, price_churn: float = 0.05, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.stores = stores
+        self.games = games
+        self.price_churn = price_churn
+
+    @property
+    def base(self) -> str:
+        """Value for price_api.CHEAPSHARK_BASE."""
+        return f"{self.url}/api/1.0"
+
+    def details(self, api_id: str) -> Dict:
+        rng = random.Random(f"game-{api_id}")
+        deals = []
+        for store in range(1, self.stores + 1):
+            retail = round(rng.uniform(5, 70), 2)
+            price = round(retail * rng.uniform(0.2, 1.0), 2)
+            with self._lock:
+                if self._rng.random() < self.price_churn:
+                    price = round(retail * self._rng.uniform(0.2, 1.0), 2)
+            deals.append({"storeID": str(store), "price": f"{price:.2f}", "retailPrice": f"{retail:.2f}"})
+        return {"info": {"title": f"Game {api_id}", "steamAppID": api_id, "thumb": None}, "deals": deals}
+
+    def respond(self, path, query, headers):
+        if path.endswith("/stores"):
+            payload = [{"storeID": str(i), "storeName": f"Shop {i}", "isActive": 1} for i in range(1, self.stores + 1)]
+        elif path.endswith("/games") and "ids" in query:
+            payload = {api_id: self.details(api_id) for api_id in query["ids"][0].split(",") if api_id}
+        elif path.endswith("/games") and "id" in query:
+            payload = self.details(query["id"][0])
+        elif path.endswith("/games") and "title" in query:
+            title = query["title"][0]
+            digest = int(hashlib.sha1(title.encode()).hexdigest(), 16)
+            ids = sorted({str(1 + (digest + i * 7919) % max(1, self.games)) for i in range(SEARCH_LIMIT)}, key=int)
+            payload = [
+                {"gameID": api_id, "external": f"Game {api_id}", "thumb": None, "cheapest": "9.99"} for api_id in ids
+            ]
+        else:
+            return 404, b'{"error":"not found"}', "application/json", {}
+        return 200, json.dumps(payload).encode(), "application/json", {}
+
+
+class FakeSteam(_FakeServer):
+    """Serves synthetic store pages at /app/<id> with a strong ETag; a matching If-None-Match gets 304."""
+
+    def respond(self, path, query, headers):
+        app_id = path.rstrip("/").rsplit("/", 1)[-1]
+        if not path.startswith("/app/") or not app_id.isdigit():
+            return 404, b"not found", "text/plain", {}
+        body, etag = _page(int(app_id))
+        if headers.get("If-None-Match") == etag:
+            return 304, b"", "text/html", {"ETag": etag}
+        return 200, body, "text/html; charset=utf-8", {"ETag": etag}
+
+
+@lru_cache(maxsize=512)
+def _page(app_id: int) -> Tuple[bytes, str]:
+    # Fewer filler blocks than the parser benchmark: this one is about request paths, not parsing
+    body = _synthetic_page(app_id, filler_blocks=100).encode()
+    return body, f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, default=8)
+    parser.add_argument("--games", type=int, default=1000, help="catalog size searches draw from")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    options = {"latency": args.latency, "error_rate": args.error_rate}
+    cheapshark = FakeCheapShark(stores=args.stores, games=args.games, **options).start()
+    steam = FakeSteam(**options).start()
+    print(f"CHEAPSHARK_BASE={cheapshark.base}")
+    print(f"Steam pages at {steam.url}/app/<id>")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        cheapshark.stop()
+        steam.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+End-to-end request path benchmarks against local CheapShark/Steam stand-ins.
+
+Usage (from the repo root):
+    python -m backend.bench.run
+    python -m backend.bench.run --sizes 100x4x7,1000x8x30,5000x8x90 --output bench.json
+    python -m backend.bench.run --latency 0.05 --error-rate 0.02 --compare bench.json
+
+Each size (GAMESxSTORESxDAYS) runs in its own process on a fresh temporary SQLite database
+(or --url, which is wiped), filled by backend.bench.datagen. Requests go through the ASGI app
+in-process; upstream calls go over HTTP to backend.bench.fake_upstream servers. Scenarios:
+
+    games_list       GET /api/games, cycling sort orders
+    game_detail      GET /api/games/{id} for random games
+    search_local     GET /api/search for repeat queries answered by the local index
+    search_upstream  GET /api/search for unseen queries (fake CheapShark)
+    refresh          POST /api/refresh of the whole watchlist
+    scrape           metadata scrape of --scrape-pages games through the scrape queue
+
+Every scenario reports p50/p99/mean latency, throughput, errors, the peak traced Python
+allocation of one extra run and the process max RSS. --output writes the results as JSON;
+--compare prints p50/p99 ratios against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+SCENARIOS = ("games_list", "game_detail", "search_local", "search_upstream", "refresh", "scrape")
+# Scenarios that cover the whole watchlist per iteration run --heavy-iterations times
+HEAVY_SCENARIOS = {"refresh", "scrape"}
+# Distinct queries search_local repeats
+LOCAL_QUERIES = 20
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))]
+
+
+def _measure(
+    run: Callable[[int], Tuple[bool, int]], iterations: int, warmup: int, memory: bool
+) -> Dict[str, object]:
+    """
+    Calls run(i) -> (ok, units) `iterations` times after `warmup` untimed calls. Units are the
+    items one call handled (1 request, N games refreshed, N pages scraped) for throughput.
+    """
+    for i in range(warmup):
+        run(-1 - i)
+    timings: List[float] = []
+    errors = units = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        ok, handled = run(i)
+        timings.append(time.perf_counter() - call_started)
+        errors += not ok
+        units += handled
+    elapsed = time.perf_counter() - started
+    peak_kib = None
+    if memory:
+        tracemalloc.start()
+        run(iterations)
+        peak_kib = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "p50_ms": round(_percentile(timings, 50) * 1000, 3),
+        "p99_ms": round(_percentile(timings, 99) * 1000, 3),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3) if timings else 0.0,
+        "throughput_per_s": round(units / elapsed, 2) if elapsed > 0 else 0.0,
+        "peak_traced_kib": peak_kib,
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _worker(args: argparse.Namespace, games: int, stores: int, days: int) -> List[Dict[str, object]]:
+    """Runs every scenario for one data size; DATABASE_URL was set by the parent before import."""
+    from fastapi.testclient import TestClient
+
+    from .. import crud
+    from ..app import app
+    from ..database import SessionLocal
+    from ..services import http_client, price_api, response_cache, scrape_queue, search_index, store_cache
+    from . import datagen, fake_upstream
+
+    rng = random.Random(args.seed)
+    options = {"latency": args.latency, "jitter": args.latency / 4, "error_rate": args.error_rate, "seed": args.seed}
+    cheapshark = fake_upstream.FakeCheapShark(stores=stores, games=games, **options).start()
+    steam = fake_upstream.FakeSteam(**options).start()
+    price_api.CHEAPSHARK_BASE = cheapshark.base
+    if args.upstream_rate:
+        http_client.configure_host(cheapshark.url.split("://", 1)[1], rate=args.upstream_rate, burst=args.upstream_rate)
+
+    db = SessionLocal()
+    try:
+        store_cache.stores.load(db)
+        seeded = time.perf_counter()
+        counts = datagen.populate(db, games, stores, days, steam_base=steam.url, seed=args.seed)
+        seed_seconds = time.perf_counter() - seeded
+        # What app startup loads, without starting the scheduler
+        search_index.index.add(crud.list_search_titles(db))
+        search_index.index.mark_seen(crud.list_search_queries(db))
+        store_urls = crud.list_stale_metadata_games(db, datetime.utcnow())
+    finally:
+        db.close()
+
+    client = TestClient(app)
+    sorts = ("created", "title", "best_price", "discount", "last_updated")
+
+    def cold() -> None:
+        if args.cold:
+            response_cache.responses.clear()
+
+    def games_list(i: int) -> Tuple[bool, int]:
+        cold()
+        resp = client.get("/api/games", params={"sort": sorts[i % len(sorts)], "limit": 50})
+        return resp.status_code == 200, 1
+
+    def game_detail(i: int) -> Tuple[bool, int]:
+        cold()
+        return client.get(f"/api/games/{rng.randint(1, games)}").status_code == 200, 1
+
+    # Repeat queries: each goes to CheapShark once here, after which the local index answers it for SEARCH_CACHE_TTL
+    local_queries = [f"game {number}" for number in rng.sample(range(1, games + 1), min(games, LOCAL_QUERIES))]
+    for query in local_queries:
+        client.get("/api/search", params={"q": query})
+
+    def search_local(i: int) -> Tuple[bool, int]:
+        return client.get("/api/search", params={"q": rng.choice(local_queries)}).status_code == 200, 1
+
+    def search_upstream(i: int) -> Tuple[bool, int]:
+        # Unique queries miss both the local index and the search cache
+        resp = client.get("/api/search", params={"q": f"zq{args.seed}-{i}-{rng.random():.6f}"})
+        return resp.status_code == 200, 1
+
+    def refresh(i: int) -> Tuple[bool, int]:
+        resp = client.post("/api/refresh")
+        return resp.status_code == 200, resp.json().get("games_processed", 0) if resp.status_code == 200 else 0
+
+    def scrape(i: int) -> Tuple[bool, int]:
+        targets = store_urls[: args.scrape_pages]
+        job = scrape_queue.scrapes.enqueue(targets, force=True)
+        while job.finished_at is None:
+            time.sleep(0.01)
+        return job.failed == 0, job.completed
+
+    runners = {
+        "games_list": games_list,
+        "game_detail": game_detail,
+        "search_local": search_local,
+        "search_upstream": search_upstream,
+        "refresh": refresh,
+        "scrape": scrape,
+    }
+    results = []
+    for name in args.scenarios:
+        heavy = name in HEAVY_SCENARIOS
+        iterations = args.heavy_iterations if heavy else args.iterations
+        warmup = 0 if heavy else args.warmup
+        upstream_before = cheapshark.stats()["requests"] + steam.stats()["requests"]
+        result = _measure(runners[name], iterations, warmup, memory=not args.no_memory)
+        results.append(
+            {
+                "scenario": name,
+                "size": f"{games}x{stores}x{days}",
+                **counts,
+                **result,
+                "upstream_requests": cheapshark.stats()["requests"] + steam.stats()["requests"] - upstream_before,
+                "seed_seconds": round(seed_seconds, 2),
+            }
+        )
+    cheapshark.stop()
+    steam.stop()
+    return results
+
+
+def _parse_size(size: str) -> Tuple[int, int, int]:
+    games, stores, days = (int(part) for part in size.lower().split("x"))
+    return games, stores, days
+
+
+def _run_size(args: argparse.Namespace, size: str, argv: List[str]) -> List[Dict[str, object]]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        env["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        # Local fake hosts need no politeness gap unless one is asked for
+        env.setdefault("SCRAPE_HOST_DELAY", "0")
+        proc = subprocess.run(
+            [sys.executable, "-m", "backend.bench.run", *argv, "--worker-size", size],
+            env=env,
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+    return json.loads(proc.stdout)
+
+
+def _compare(results: List[Dict[str, object]], path: str) -> None:
+    with open(path) as fh:
+        previous = {(row["scenario"], row["size"]): row for row in json.load(fh)["results"]}
+    print(f"\nvs {path} (ratio > 1 is slower)")
+    for row in results:
+        old = previous.get((row["scenario"], row["size"]))
+        if old is None:
+            continue
+        ratios = [
+            f"{metric} {row[metric] / old[metric]:.2f}x" if old[metric] else f"{metric} n/a"
+            for metric in ("p50_ms", "p99_ms")
+        ]
+        print(f"{row['size']:<14} {row['scenario']:<16} {'  '.join(ratios)}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100x4x7,1000x8x30", help="comma-separated GAMESxSTORESxDAYS")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of scenarios")
+    parser.add_argument("--iterations", type=int, default=200, help="timed requests per request scenario")
+    parser.add_argument("--heavy-iterations", type=int, default=3, help="timed runs of refresh and scrape")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scrape-pages", type=int, default=200, help="games scraped per scrape run")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the fake upstreams add per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream requests answered 503")
+    parser.add_argument("--upstream-rate", type=float, default=0.0, help="rate limit (req/s) for the fake CheapShark")
+    parser.add_argument("--cold", action="store_true", help="clear the response cache before each list/detail request")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced-memory run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="throwaway database URL to use instead of temporary SQLite files")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to compare p50/p99 against")
+    parser.add_argument("--worker-size", help=argparse.SUPPRESS)
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv)
+    args.scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.worker_size:
+        from .. import models  # noqa: F401 - registers the tables before the schema is created
+        from ..database import Base, engine
+
+        Base.metadata.drop_all(bind=engine)
+        json.dump(_worker(args, *_parse_size(args.worker_size)), sys.stdout)
+        return
+
+    results: List[Dict[str, object]] = []
+    for size in args.sizes.split(","):
+        _parse_size(size)
+        rows = _run_size(args, size, argv)
+        results.extend(rows)
+        for row in rows:
+            print(
+                f"{row['size']:<14} {row['scenario']:<16} p50 {row['p50_ms']:>9.2f} ms  p99 {row['p99_ms']:>9.2f} ms  "
+                f"{row['throughput_per_s']:>9.1f}/s  errors {row['errors']:<3} peak {row['peak_traced_kib']} KiB  "
+                f"rss {row['max_rss_kib']} KiB"
+            )
+    report = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Steam metadata parsing benchmark: full BeautifulSoup parse vs. the targeted region parser.
+
+Usage (from the repo root):
+    python -m backend.bench.scrape
+    python -m backend.bench.scrape --pages 'saved/*.html' --repeat 20 --json
+
+Saved pages are plain store pages (e.g. `curl -o saved/620.html https://store.steampowered.com/app/620`).
+Without --pages, synthetic pages shaped like Steam's (scripts, nested layout, description,
+tag block) are generated. Both parsers must return the same metadata for every page.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from ..services import scraper
+
+PARSERS = ("soup", "fast")
+
+
+def _synthetic_page(seed: int, filler_blocks: int = 400) -> str:
+    rng = random.Random(seed)
+    words = ["space", "quest", "puzzle", "co-op", "story", "craft", "roguelike", "&amp;", "open", "world"]
+
+    def sentence(n: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    head = "".join(
+        f"<script type='text/javascript'>var cfg{i} = {{\"k\": \"<div class=\\\"x\\\">{sentence(4)}</div>\"}};</script>"
+        for i in range(40)
+    )
+    filler = "".join(
+        f"<div class='block_{i % 7}'><div class='inner'><a href='/app/{i}'>{sentence(6)}</a>"
+        f"<img src='/img/{i}.jpg'/><span>{sentence(10)}</span></div></div>"
+        for i in range(filler_blocks)
+    )
+    tags = "".join(
+        f'<a href="/tags/{i}" class="app_tag" style="display: none;">\n\t\t\t\t{sentence(1).capitalize()} {i}\t\t\t\t</a>'
+        for i in range(20)
+    )
+    description = "".join(
+        f"<h2 class='bb_tag'>{sentence(2)}</h2><p>{sentence(40)}<br><i>{sentence(5)}</i></p>"
+        f"<!-- {sentence(3)} --><ul class='bb_ul'><li>{sentence(8)}</li><li>{sentence(8)}</li></ul>"
+        for _ in range(8)
+    )
+    return (
+        f"<!DOCTYPE html><html><head><title>Game {seed}</title>{head}</head><body class='v6 app'>"
+        f"<div id='global_header'>{filler[: len(filler) // 3]}</div>"
+        f"<div class='game_description_snippet'>\n\t\t{sentence(25)}\t\t</div>"
+        f"<div class='glance_ctn_responsive_right'><div class='glance_tags popular_tags' data-appid='{seed}'>"
+        f"{tags}<div class='app_tag add_button'>+</div></div></div>"
+        f"{filler[len(filler) // 3 :]}"
+        f"<div id='game_area_description' class='game_area_description'><h2>About This Game</h2>{description}</div>"
+        f"<div id='footer'>{sentence(30)}</div></body></html>"
+    )
+
+
+def _load_pages(pattern: str, count: int) -> List[Tuple[str, str]]:
+    if pattern:
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise SystemExit(f"No pages match {pattern}")
+        pages = []
+        for path in paths:
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                pages.append((os.path.basename(path), fh.read()))
+        return pages
+    return [(f"synthetic-{seed}", _synthetic_page(seed)) for seed in range(count)]
+
+
+def _measure(parser: str, html: str, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scraper.parse_steam_metadata(html, parser=parser)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    scraper.parse_steam_metadata(html, parser=parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": statistics.median(timings) * 1000, "peak_kib": peak / 1024}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="", help="glob of saved Steam store pages; default: synthetic pages")
+    parser.add_argument("--count", type=int, default=5, help="number of synthetic pages")
+    parser.add_argument("--repeat", type=int, default=10, help="timed parses per page and parser")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    pages = _load_pages(args.pages, args.count)
+    results = []
+    for name, html in pages:
+        expected = scraper.parse_steam_metadata(html, parser="soup")
+        if scraper.parse_steam_metadata(html, parser="fast") != expected:
+            raise SystemExit(f"{name}: fast parser output differs from BeautifulSoup")
+        for parser_name in PARSERS:
+            result = _measure(parser_name, html, args.repeat)
+            results.append(
+                {
+                    "page": name,
+                    "page_kib": round(len(html) / 1024, 1),
+                    "parser": parser_name,
+                    "ms_per_page": round(result["ms"], 3),
+                    "peak_kib": round(result["peak_kib"], 1),
+                }
+            )
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for row in results:
+        print(f"{row['page']:<24} {row['page_kib']:>8.1f} KiB  {row['parser']:<5} {row['ms_per_page']:>9.3f} ms  "
+              f"{row['peak_kib']:>10.1f} KiB peak")
+    for parser_name in PARSERS:
+        rows = [row for row in results if row["parser"] == parser_name]
+        print(f"{parser_name:<5} mean {statistics.mean(r['ms_per_page'] for r in rows):.3f} ms/page, "
+              f"{statistics.mean(r['peak_kib'] for r in rows):.1f} KiB peak")
+
+
+if __name__ == "__main__":
+    main()
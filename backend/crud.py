@@ -1,12 +1,67 @@
-from datetime import datetime
+import base64
+from datetime import date, datetime, timedelta
+import functools
 import json
-import re
-from typing import Dict, Iterable, List, Optional, Tuple
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import bindparam, case, delete, func, insert, select, tuple_, update
 from sqlalchemy.orm import Session
 
 from . import models, schemas
+from .services import alert_rules, search_index, store_cache, writer
+
+# Rows per INSERT batch during bulk snapshot ingestion
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "500"))
+
+# "append" stores every observed price; "changes" only stores a row when price or list_price
+# differs from the last stored row for that (game, store) and otherwise bumps its last_seen_at
+SNAPSHOT_WRITE_MODE = os.getenv("SNAPSHOT_WRITE_MODE", "append")
+
+# (game_id, CheapShark store id, price, list_price, currency code), as extracted from deals
+SnapshotRow = Tuple[int, str, float, Optional[float], str]
+# (game_id, store_id, price_cents, list_price_cents, currency_id), as stored
+CompactRow = Tuple[int, int, int, Optional[int], int]
+# (last_scraped_at, etag, last_modified, content_hash) of stored metadata
+MetadataValidators = Tuple[Optional[datetime], Optional[str], Optional[str], Optional[str]]
+
+# Columns the watchlist is listed and summarized from; rows of these stand in for Game objects
+GAME_SUMMARY_COLUMNS = (
+    models.Game.id,
+    models.Game.title,
+    models.Game.api_game_id,
+    models.Game.store_url,
+    models.Game.cover_image_url,
+    models.Game.created_at,
+    models.Game.updated_at,
+    models.Game.title_key,
+    models.Game.best_price,
+    models.Game.best_store_id,
+    models.Game.best_discount,
+    models.Game.last_price_at,
+)
+
+# Watchlist sort keys: column and default direction. Each has a (column, id) index.
+GAME_SORTS = {
+    "created": (models.Game.created_at, "desc"),
+    "title": (models.Game.title_key, "asc"),
+    "best_price": (models.Game.best_price, "asc"),
+    "discount": (models.Game.best_discount, "desc"),
+    "last_updated": (models.Game.last_price_at, "desc"),
+}
+
+
+def make_title_key(title: str) -> str:
+    """Case-folded title used for title sorting and prefix filtering."""
+    return " ".join(title.casefold().split())
+
+
+def to_cents(amount: Optional[float]) -> Optional[int]:
+    return None if amount is None else int(round(amount * 100))
+
+
+def from_cents(cents: Optional[int]) -> Optional[float]:
+    return None if cents is None else cents / 100
 
 
 def get_game_by_api_id(db: Session, api_game_id: str) -> Optional[models.Game]:
@@ -18,34 +73,249 @@ def get_game(db: Session, game_id: int) -> Optional[models.Game]:
 
 
 def create_game(db: Session, game_data: schemas.GameCreate) -> models.Game:
+    title = game_data.title or "Unknown Game"
     game = models.Game(
-        title=game_data.title or "Unknown Game",
+        title=title,
+        title_key=make_title_key(title),
         api_game_id=game_data.api_game_id,
         store_url=game_data.store_url,
         cover_image_url=game_data.cover_image_url,
     )
     db.add(game)
+    bump_versions(db, ["watchlist"])
     db.commit()
     db.refresh(game)
+    entry = {
+        "api_game_id": game.api_game_id,
+        "title": game.title,
+        "thumb": game.cover_image_url,
+        "cheapestPrice": game.best_price,
+    }
+    writer.after_commit(db, functools.partial(search_index.index.add, [entry]))
     return game
 
 
+def get_existing_api_ids(db: Session, api_game_ids: Iterable[str]) -> Set[str]:
+    """The subset of `api_game_ids` already on the watchlist, in one query."""
+    api_game_ids = list(api_game_ids)
+    if not api_game_ids:
+        return set()
+    game = models.Game
+    return {api_id for (api_id,) in db.query(game.api_game_id).filter(game.api_game_id.in_(api_game_ids))}
+
+
+def bulk_create_games(
+    db: Session, games: List[schemas.GameCreate], batch_size: int = SNAPSHOT_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    create_game for many games: core INSERT batches of `batch_size` rows committed once, with a
+    single watchlist version bump and search index update. Games whose api_game_id already
+    exists are left untouched. Returns {api_game_id: id} for all of `games`.
+    """
+    table = models.Game.__table__
+    now = datetime.utcnow()
+    rows = []
+    for game_data in games:
+        title = game_data.title or "Unknown Game"
+        rows.append(
+            {
+                "title": title,
+                "title_key": make_title_key(title),
+                "api_game_id": game_data.api_game_id,
+                "store_url": game_data.store_url,
+                "cover_image_url": game_data.cover_image_url,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    if not rows:
+        return {}
+    try:
+        for start in range(0, len(rows), batch_size):
+            _upsert(db, table, rows[start : start + batch_size], ["api_game_id"], on_conflict="ignore")
+        bump_versions(db, ["watchlist"])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    game = models.Game
+    api_ids = [row["api_game_id"] for row in rows]
+    ids: Dict[str, int] = {}
+    for start in range(0, len(api_ids), batch_size):
+        chunk = api_ids[start : start + batch_size]
+        ids.update(db.query(game.api_game_id, game.id).filter(game.api_game_id.in_(chunk)).all())
+    entries = [
+        {
+            "api_game_id": row["api_game_id"],
+            "title": row["title"],
+            "thumb": row["cover_image_url"],
+            "cheapestPrice": None,
+        }
+        for row in rows
+    ]
+    writer.after_commit(db, functools.partial(search_index.index.add, entries))
+    return ids
+
+
 def list_games(db: Session) -> List[models.Game]:
     return db.query(models.Game).order_by(models.Game.created_at.desc()).all()
 
 
+def list_due_games(db: Session, now: datetime, limit: int) -> List[models.Game]:
+    """Games whose next refresh is due (never scheduled first, then most overdue), at most `limit`."""
+    game = models.Game
+    return (
+        db.query(game)
+        .filter(game.next_refresh_at.is_(None) | (game.next_refresh_at <= now))
+        .order_by(game.next_refresh_at.isnot(None), game.next_refresh_at, game.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def get_price_fingerprints(db: Session, game_ids: Iterable[int]) -> Dict[int, frozenset]:
+    """Per game, the set of (store_id, price_cents, list_price_cents) currently stored."""
+    current = models.CurrentPrice
+    game_ids = list(game_ids)
+    prices: Dict[int, set] = {game_id: set() for game_id in game_ids}
+    for start in range(0, len(game_ids), SNAPSHOT_BATCH_SIZE):
+        rows = db.query(current.game_id, current.store_id, current.price_cents, current.list_price_cents).filter(
+            current.game_id.in_(game_ids[start : start + SNAPSHOT_BATCH_SIZE])
+        )
+        for game_id, store_id, price_cents, list_price_cents in rows:
+            prices[game_id].add((store_id, price_cents, list_price_cents))
+    return {game_id: frozenset(rows) for game_id, rows in prices.items()}
+
+
+def schedule_refreshes(db: Session, schedule: List[Tuple[int, int, datetime]]) -> None:
+    """Stores (game_id, refresh_interval, next_refresh_at) for each game in one transaction."""
+    games = models.Game.__table__
+    for start in range(0, len(schedule), SNAPSHOT_BATCH_SIZE):
+        db.execute(
+            update(games).where(games.c.id == bindparam("g_id")).values(updated_at=games.c.updated_at),
+            [
+                {"g_id": game_id, "refresh_interval": interval, "next_refresh_at": next_at}
+                for game_id, interval, next_at in schedule[start : start + SNAPSHOT_BATCH_SIZE]
+            ],
+        )
+    db.commit()
+
+
+def list_games_page(
+    db: Session,
+    sort: str = "created",
+    order: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    max_price: Optional[float] = None,
+    store: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Returns one page of the watchlist and the cursor for the next page (None on the last page).
+    Games come back as rows of GAME_SUMMARY_COLUMNS rather than ORM objects; compute_game_summary
+    and game_summary_dict accept either.
+
+    Pages are fetched with keyset conditions on (sort column, id), so every page is an index
+    range scan no matter how deep it is. Games without a value for the sort column (no prices
+    yet) come after all others, ordered by id. Raises ValueError for an unknown sort or a
+    cursor that does not belong to this sort.
+    """
+    if sort not in GAME_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    column, default_order = GAME_SORTS[sort]
+    order = order or default_order
+    descending = order == "desc"
+    sort_key = f"{sort}:{order}"
+    phase, value, last_id = _decode_cursor(cursor, sort_key, column) if cursor else (0, None, None)
+
+    game = models.Game
+    query = db.query(*GAME_SUMMARY_COLUMNS)
+    if max_price is not None:
+        query = query.filter(game.best_price <= max_price)
+    if store:
+        store_ids = get_store_ids_named(db, store)
+        query = query.filter(
+            game.id.in_(select(models.CurrentPrice.game_id).where(models.CurrentPrice.store_id.in_(store_ids)))
+        )
+    if title_prefix:
+        prefix = make_title_key(title_prefix)
+        query = query.filter(game.title_key >= prefix, game.title_key < prefix + "\uffff")
+
+    games: List[Any] = []
+    if phase == 0:
+        valued = query.filter(column.isnot(None))
+        if last_id is not None:
+            position = tuple_(column, game.id)
+            valued = valued.filter(position < (value, last_id) if descending else position > (value, last_id))
+        ordering = (column.desc(), game.id.desc()) if descending else (column.asc(), game.id.asc())
+        games = valued.order_by(*ordering).limit(limit + 1).all()
+        if len(games) > limit:
+            games = games[:limit]
+            last = games[-1]
+            get_store_names(db, {g.best_store_id for g in games})
+            return games, _encode_cursor(sort_key, 0, getattr(last, column.key), last.id)
+        last_id = None
+
+    unvalued = query.filter(column.is_(None))
+    if last_id is not None:
+        unvalued = unvalued.filter(game.id > last_id)
+    remaining = limit - len(games)
+    tail = unvalued.order_by(game.id).limit(remaining + 1).all()
+    games.extend(tail[:remaining])
+    get_store_names(db, {g.best_store_id for g in games})
+    if len(tail) > remaining:
+        # The page may end exactly where the games without a value start
+        return games, _encode_cursor(sort_key, 1, None, tail[remaining - 1].id if remaining else 0)
+    return games, None
+
+
+def _encode_cursor(sort_key: str, phase: int, value: object, last_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_key, phase, value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_key: str, column) -> Tuple[int, object, Optional[int]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, phase, value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if value is not None and column.key in ("created_at", "last_price_at"):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if cursor_sort != sort_key or phase not in (0, 1) or not isinstance(last_id, int):
+        raise ValueError("Cursor does not match the requested sort")
+    return phase, value, last_id
+
+
+def _best_price(
+    prices: List[models.CurrentPrice],
+) -> Tuple[Optional[float], Optional[int], Optional[float], Optional[datetime]]:
+    """Returns (best_price, best_store_id, best_discount, last_updated) for a game's current prices."""
+    if not prices:
+        return None, None, None, None
+    last_updated = max(price.last_seen_at or price.timestamp for price in prices)
+    best = min(prices, key=lambda price: price.price_cents)
+    discount = None
+    if best.list_price_cents:
+        discount = round((best.list_price_cents - best.price_cents) / best.list_price_cents * 100, 1)
+    return from_cents(best.price_cents), best.store_id, discount, last_updated
+
+
 def compute_game_summary(
-    game: models.Game, latest_prices: Optional[List[models.PriceSnapshot]] = None
+    game: models.Game, latest_prices: Optional[List[models.CurrentPrice]] = None
 ) -> schemas.GameSummary:
-    best_price = None
-    best_store = None
-    last_updated = None
-    prices = latest_prices if latest_prices is not None else list(game.price_snapshots)
-    if prices:
-        last_updated = max(prices, key=lambda snap: snap.timestamp).timestamp
-        best_snapshot = min(prices, key=lambda snap: snap.price)
-        best_price = best_snapshot.price
-        best_store = best_snapshot.store_name
+    """
+    Builds a summary from the given current prices, or from the game's denormalized columns.
+    Store names come from the store cache; see get_store_names.
+    """
+    if latest_prices is not None:
+        best_price, best_store_id, best_discount, last_updated = _best_price(latest_prices)
+    else:
+        best_price, best_store_id = game.best_price, game.best_store_id
+        best_discount, last_updated = game.best_discount, game.last_price_at
     return schemas.GameSummary(
         id=game.id,
         title=game.title,
@@ -55,112 +325,861 @@ def compute_game_summary(
         created_at=game.created_at,
         updated_at=game.updated_at,
         best_price=best_price,
-        best_store=best_store,
+        best_store=store_cache.stores.name(best_store_id),
+        best_discount=best_discount,
         last_updated=last_updated,
     )
 
 
+def game_read_dict(game: Any) -> Dict[str, Any]:
+    """The GameRead fields of a game or game row as a plain dict, in schema order."""
+    return {
+        "title": game.title,
+        "api_game_id": game.api_game_id,
+        "store_url": game.store_url,
+        "cover_image_url": game.cover_image_url,
+        "id": game.id,
+        "created_at": game.created_at,
+        "updated_at": game.updated_at,
+    }
+
+
+def game_summary_dict(game: Any) -> Dict[str, Any]:
+    """
+    compute_game_summary from the denormalized columns, as a plain dict ready for JSON encoding;
+    skips building and validating a GameSummary per game on the list fast path.
+    """
+    summary = game_read_dict(game)
+    summary["best_price"] = game.best_price
+    summary["best_store"] = store_cache.stores.name(game.best_store_id)
+    summary["best_discount"] = game.best_discount
+    summary["last_updated"] = game.last_price_at
+    return summary
+
+
 def get_games_with_summary(db: Session) -> List[schemas.GameSummary]:
     games = list_games(db)
-    summaries: List[schemas.GameSummary] = []
-    for game in games:
-        latest_prices = get_latest_prices_by_store(db, game.id)
-        summaries.append(compute_game_summary(game, latest_prices))
-    return summaries
+    get_store_names(db, {game.best_store_id for game in games})
+    return [compute_game_summary(game) for game in games]
+
+
+def refresh_game_summaries(
+    db: Session, game_ids: Optional[Iterable[int]] = None, chunk_size: int = SNAPSHOT_BATCH_SIZE
+) -> None:
+    """
+    Recomputes the denormalized best price columns on games from current_prices, for the given
+    games or all of them, and bumps their versions and the watchlist version. Does not commit;
+    callers run it inside their write transaction.
+    """
+    if game_ids is None:
+        game_ids = [game_id for (game_id,) in db.query(models.Game.id)]
+    game_ids = list(game_ids)
+    games = models.Game.__table__
+    for start in range(0, len(game_ids), chunk_size):
+        chunk = game_ids[start : start + chunk_size]
+        prices_by_game = get_current_prices(db, chunk)
+        params = []
+        for game_id in chunk:
+            best_price, best_store_id, best_discount, last_updated = _best_price(prices_by_game.get(game_id, []))
+            params.append(
+                {
+                    "g_id": game_id,
+                    "best_price": best_price,
+                    "best_store_id": best_store_id,
+                    "best_discount": best_discount,
+                    "last_price_at": last_updated,
+                }
+            )
+        # updated_at tracks edits to the game itself, not price ingestion
+        db.execute(
+            update(games)
+            .where(games.c.id == bindparam("g_id"))
+            .values(updated_at=games.c.updated_at, version=func.coalesce(games.c.version, 0) + 1),
+            params,
+        )
+    bump_versions(db, ["watchlist"])
+    missing_keys = db.query(models.Game).filter(models.Game.title_key.is_(None)).all()
+    for game in missing_keys:
+        game.title_key = make_title_key(game.title)
+
+
+def get_current_prices(db: Session, game_ids: Optional[Iterable[int]] = None) -> Dict[int, List[models.CurrentPrice]]:
+    """Returns current prices grouped by game, for the given games or the whole watchlist."""
+    query = db.query(models.CurrentPrice)
+    if game_ids is not None:
+        query = query.filter(models.CurrentPrice.game_id.in_(list(game_ids)))
+    prices_by_game: Dict[int, List[models.CurrentPrice]] = {}
+    for price in query:
+        prices_by_game.setdefault(price.game_id, []).append(price)
+    return prices_by_game
+
+
+def get_latest_prices_by_store(db: Session, game_id: int) -> List[schemas.PriceSnapshotRead]:
+    return [schemas.PriceSnapshotRead(**row) for row in latest_price_dicts(db, game_id)]
 
 
-def get_latest_prices_by_store(db: Session, game_id: int) -> List[models.PriceSnapshot]:
-    subq = (
+def latest_price_dicts(db: Session, game_id: int) -> List[Dict[str, Any]]:
+    """The game's current price per store as PriceSnapshotRead-shaped dicts, sorted by store name."""
+    current = models.CurrentPrice
+    prices = (
         db.query(
-            models.PriceSnapshot.store_name,
-            func.max(models.PriceSnapshot.timestamp).label("max_ts"),
+            current.store_id,
+            current.price_cents,
+            current.list_price_cents,
+            current.currency_id,
+            current.timestamp,
+            current.last_seen_at,
         )
-        .filter(models.PriceSnapshot.game_id == game_id)
-        .group_by(models.PriceSnapshot.store_name)
-        .subquery()
+        .filter(current.game_id == game_id)
+        .all()
+    )
+    names = get_store_names(db, {price.store_id for price in prices})
+    cache = store_cache.stores
+    rows = [
+        {
+            "store_name": names.get(store_id, f"Store {store_id}"),
+            "price": from_cents(price_cents),
+            "list_price": from_cents(list_price_cents),
+            "currency": cache.code("currency", currency_id) or "USD",
+            "timestamp": timestamp,
+            "last_seen_at": last_seen_at,
+        }
+        for store_id, price_cents, list_price_cents, currency_id, timestamp, last_seen_at in prices
+    ]
+    return sorted(rows, key=lambda row: row["store_name"])
+
+
+def get_store_names(db: Session, store_ids: Iterable[Optional[int]]) -> Dict[int, str]:
+    """Returns {store_id: name} from the store cache, reloading it once if an id is unknown."""
+    cache = store_cache.stores
+    store_ids = {store_id for store_id in store_ids if store_id is not None}
+    if not cache.loaded or any(cache.name(store_id) is None for store_id in store_ids):
+        cache.load(db)
+    return {store_id: cache.name(store_id) for store_id in store_ids if cache.name(store_id) is not None}
+
+
+def get_store_ids_named(db: Session, name: str) -> List[int]:
+    """Returns the ids of stores with this name (case-insensitive)."""
+    if not store_cache.stores.loaded:
+        store_cache.stores.load(db)
+    return store_cache.stores.ids_named(name)
+
+
+def resolve_store_ids(db: Session, cheapshark_ids: Iterable[str]) -> Dict[str, int]:
+    """
+    Maps CheapShark store ids to stores.id, adding stores not seen before under a placeholder
+    name ("Store 7") that the next sync_stores replaces. New stores are committed right away;
+    the cache learns them only once that commit is durable (see writer.after_commit), so it never
+    holds ids from a rolled back transaction.
+    """
+    cache = store_cache.stores
+    if not cache.loaded:
+        cache.load(db)
+    ids = {cheapshark_id: cache.id_for(cheapshark_id) for cheapshark_id in set(cheapshark_ids)}
+    missing = sorted(cheapshark_id for cheapshark_id, store_id in ids.items() if store_id is None)
+    if missing:
+        store = models.Store
+        try:
+            _upsert(
+                db,
+                store.__table__,
+                [{"cheapshark_id": cheapshark_id, "name": f"Store {cheapshark_id}"} for cheapshark_id in missing],
+                index_elements=["cheapshark_id"],
+                on_conflict="ignore",
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        rows = (
+            db.query(store.id, store.cheapshark_id, store.name, store.synced_at)
+            .filter(store.cheapshark_id.in_(missing))
+            .all()
+        )
+        writer.after_commit(db, functools.partial(_cache_placeholder_stores, rows))
+        ids.update({cheapshark_id: store_id for store_id, cheapshark_id, _, _ in rows})
+    return ids  # type: ignore[return-value]
+
+
+def _cache_placeholder_stores(rows: List[store_cache.StoreRow]) -> None:
+    store_cache.stores.put(rows)
+    # Placeholders get their real names from a store sync as soon as possible
+    store_cache.stores.synced_at = None
+
+
+def _lookup_id(db: Session, kind: str, value: str) -> int:
+    """Returns the id of a source name or currency code, adding it on first use."""
+    cache = store_cache.stores
+    row_id = cache.lookup_id(kind, value)
+    if row_id is not None:
+        return row_id
+    model, column = (models.Source, "name") if kind == "source" else (models.Currency, "code")
+    try:
+        _upsert(db, model.__table__, [{column: value}], index_elements=[column], on_conflict="ignore")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    row_id = db.query(model.id).filter(getattr(model, column) == value).scalar()
+    writer.after_commit(db, functools.partial(cache.put_lookup, kind, value, row_id))
+    return row_id
+
+
+def sync_stores(db: Session, store_map: Dict[str, str], synced_at: Optional[datetime] = None) -> int:
+    """
+    Upserts CheapShark's store list ({cheapshark_id: name}) into the stores table and reloads the
+    store cache. Renaming a store is a single-row update. Returns the number of stores synced.
+    """
+    synced_at = synced_at or datetime.utcnow()
+    store = models.Store.__table__
+    try:
+        # Stores carried over without a CheapShark id adopt it when a synced store has their name
+        known = {cheapshark_id for (cheapshark_id,) in db.query(models.Store.cheapshark_id)}
+        adopt = [
+            {"c_id": cheapshark_id, "s_name": name} for cheapshark_id, name in store_map.items() if cheapshark_id not in known
+        ]
+        if adopt:
+            db.execute(
+                update(store)
+                .where(store.c.cheapshark_id.is_(None), store.c.name == bindparam("s_name"))
+                .values(cheapshark_id=bindparam("c_id")),
+                adopt,
+            )
+        _upsert(
+            db,
+            store,
+            [
+                {"cheapshark_id": cheapshark_id, "name": name, "synced_at": synced_at}
+                for cheapshark_id, name in store_map.items()
+            ],
+            index_elements=["cheapshark_id"],
+        )
+        # Store names appear in list and detail responses
+        bump_versions(db, ["stores"])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    writer.after_commit(db, functools.partial(store_cache.stores.replace, store_cache.stores.fetch(db)))
+    return len(store_map)
+
+
+def rebuild_current_prices(db: Session) -> int:
+    """Regenerates current_prices from the newest snapshot per (game, store). Returns rows written."""
+    snap = models.PriceSnapshot
+    newest = (
+        select(func.max(snap.id).label("id")).group_by(snap.game_id, snap.store_id).subquery()
     )
-    snapshots = (
-        db.query(models.PriceSnapshot)
-        .join(
-            subq,
-            (models.PriceSnapshot.store_name == subq.c.store_name)
-            & (models.PriceSnapshot.timestamp == subq.c.max_ts),
+    source = select(
+        snap.game_id,
+        snap.store_id,
+        snap.source_id,
+        snap.price_cents,
+        snap.list_price_cents,
+        snap.currency_id,
+        snap.id,
+        snap.timestamp,
+        func.coalesce(snap.last_seen_at, snap.timestamp),
+    ).join(newest, snap.id == newest.c.id)
+    current = models.CurrentPrice.__table__
+    try:
+        db.execute(delete(current))
+        result = db.execute(
+            insert(current).from_select(
+                [
+                    "game_id",
+                    "store_id",
+                    "source_id",
+                    "price_cents",
+                    "list_price_cents",
+                    "currency_id",
+                    "snapshot_id",
+                    "timestamp",
+                    "last_seen_at",
+                ],
+                source,
+            )
         )
-        .filter(models.PriceSnapshot.game_id == game_id)
+        refresh_game_summaries(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result.rowcount
+
+
+def get_price_history(
+    db: Session, game_id: int, resolution: str = "day", days: Optional[int] = None
+) -> List[schemas.PriceHistoryPoint]:
+    """
+    Returns the game's price history from the daily rollups, across all stores.
+    resolution: "day", "week" (ISO weeks starting Monday) or "month"; days limits it to the last N days.
+    """
+    return [schemas.PriceHistoryPoint(**point) for point in iter_price_history(db, game_id, resolution, days)]
+
+
+def iter_price_history(
+    db: Session, game_id: int, resolution: str = "day", days: Optional[int] = None, yield_per: int = 1000
+) -> Iterator[Dict[str, Any]]:
+    """
+    get_price_history as a generator of PriceHistoryPoint-shaped dicts. Rollup rows are fetched
+    `yield_per` at a time and each bucket is emitted as soon as the next one starts, so memory
+    does not grow with the length of the history.
+    """
+    rollup = models.PriceRollup
+    query = db.query(
+        rollup.day,
+        func.min(rollup.min_cents).label("min_cents"),
+        func.max(rollup.max_cents).label("max_cents"),
+        # The best price across stores at the end of the day
+        func.min(rollup.close_cents).label("close_cents"),
+    ).filter(rollup.game_id == game_id)
+    if days is not None:
+        query = query.filter(rollup.day >= datetime.utcnow().date() - timedelta(days=days - 1))
+    rows = query.group_by(rollup.day).order_by(rollup.day).yield_per(yield_per)
+
+    point: Optional[Dict[str, Any]] = None
+    for day, min_cents, max_cents, close_cents in rows:
+        min_price, max_price, close_price = from_cents(min_cents), from_cents(max_cents), from_cents(close_cents)
+        if resolution == "week":
+            start = day - timedelta(days=day.weekday())
+        elif resolution == "month":
+            start = day.replace(day=1)
+        else:
+            start = day
+        if point is None or point["date"] != start:
+            if point is not None:
+                yield point
+            point = {"date": start, "min_price": min_price, "max_price": max_price, "close_price": close_price}
+        else:
+            point["min_price"] = min(point["min_price"], min_price)
+            point["max_price"] = max(point["max_price"], max_price)
+            point["close_price"] = close_price
+    if point is not None:
+        yield point
+
+
+def get_snapshot_columns(
+    db: Session, game_id: int
+) -> List[Tuple[datetime, Optional[datetime], int, int, Optional[int]]]:
+    """(timestamp, last_seen_at, store_id, price_cents, list_price_cents) of a game's snapshots, oldest first."""
+    snap = models.PriceSnapshot
+    return (
+        db.query(snap.timestamp, snap.last_seen_at, snap.store_id, snap.price_cents, snap.list_price_cents)
+        .filter(snap.game_id == game_id)
+        .order_by(snap.timestamp, snap.id)
         .all()
     )
-    return snapshots
 
 
-def get_price_history(db: Session, game_id: int) -> List[schemas.PriceHistoryPoint]:
-    rows = (
-        db.query(
-            func.date(models.PriceSnapshot.timestamp).label("date"),
-            func.min(models.PriceSnapshot.price).label("min_price"),
-        )
-        .filter(models.PriceSnapshot.game_id == game_id)
-        .group_by(func.date(models.PriceSnapshot.timestamp))
-        .order_by(func.date(models.PriceSnapshot.timestamp))
+def get_daily_closes(db: Session, game_ids: List[int], since: date) -> List[Tuple[int, int]]:
+    """(game_id, best closing price in cents across stores) per game and day since `since`, ordered by game."""
+    rollup = models.PriceRollup
+    return (
+        db.query(rollup.game_id, func.min(rollup.close_cents))
+        .filter(rollup.game_id.in_(game_ids), rollup.day >= since)
+        .group_by(rollup.game_id, rollup.day)
+        .order_by(rollup.game_id)
         .all()
     )
-    return [
-        schemas.PriceHistoryPoint(date=row.date, min_price=row.min_price)  # type: ignore
-        for row in rows
-    ]
+
+
+def list_game_prices(db: Session) -> List[Tuple[int, str, str, int, Optional[float], Optional[int]]]:
+    """(id, api_game_id, title, version, best_price, best_store_id) of every game on the watchlist."""
+    game = models.Game
+    rows = db.query(game.id, game.api_game_id, game.title, game.version, game.best_price, game.best_store_id)
+    return [(row[0], row[1], row[2], row[3] or 0, row[4], row[5]) for row in rows]
+
+
+def iter_snapshot_export(
+    db: Session,
+    game_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    chunk_size: int = 10000,
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Raw price_snapshots in id order as lists of up to `chunk_size` rows of
+    (id, game_id, api_game_id, store, price, list_price, currency, timestamp, last_seen_at).
+
+    The query runs on a server-side cursor (stream_results; psycopg2 uses a named cursor) and
+    rows are fetched a chunk at a time, so memory does not grow with the table.
+    """
+    snap = models.PriceSnapshot
+    query = (
+        select(
+            snap.id,
+            snap.game_id,
+            models.Game.api_game_id,
+            snap.store_id,
+            snap.price_cents,
+            snap.list_price_cents,
+            snap.currency_id,
+            snap.timestamp,
+            snap.last_seen_at,
+        )
+        .join(models.Game, models.Game.id == snap.game_id)
+        .order_by(snap.id)
+    )
+    if game_id is not None:
+        query = query.where(snap.game_id == game_id)
+    if since is not None:
+        query = query.where(snap.timestamp >= since)
+    result = db.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+    cache = store_cache.stores
+    for rows in result.partitions():
+        names = get_store_names(db, {row.store_id for row in rows})
+        yield [
+            (
+                snapshot_id,
+                row_game_id,
+                api_game_id,
+                names.get(store_id, f"Store {store_id}"),
+                from_cents(price_cents),
+                from_cents(list_price_cents),
+                cache.code("currency", currency_id) or "USD",
+                timestamp,
+                last_seen_at,
+            )
+            for (
+                snapshot_id,
+                row_game_id,
+                api_game_id,
+                store_id,
+                price_cents,
+                list_price_cents,
+                currency_id,
+                timestamp,
+                last_seen_at,
+            ) in rows
+        ]
+
+
+def rebuild_price_rollups(db: Session, chunk_size: int = 100) -> int:
+    """
+    Regenerates the daily rollups from price_snapshots, committing every `chunk_size` games.
+    A snapshot counts for every day from its timestamp until it was last seen. Returns rows written.
+    """
+    snap = models.PriceSnapshot
+    rollups = models.PriceRollup.__table__
+    game_ids = [game_id for (game_id,) in db.query(models.Game.id).order_by(models.Game.id)]
+    written = 0
+    for start in range(0, len(game_ids), chunk_size):
+        chunk = game_ids[start : start + chunk_size]
+        rows = (
+            db.query(snap.game_id, snap.store_id, snap.price_cents, snap.timestamp, snap.last_seen_at)
+            .filter(snap.game_id.in_(chunk))
+            .order_by(snap.timestamp, snap.id)
+            .all()
+        )
+        daily: Dict[Tuple[int, int, date], dict] = {}
+        for game_id, store_id, price, timestamp, last_seen_at in rows:
+            last_seen_at = last_seen_at or timestamp
+            day = timestamp.date()
+            while day <= last_seen_at.date():
+                close_at = min(last_seen_at, datetime.combine(day, datetime.max.time()))
+                entry = daily.get((game_id, store_id, day))
+                if entry is None:
+                    daily[(game_id, store_id, day)] = {
+                        "game_id": game_id,
+                        "store_id": store_id,
+                        "day": day,
+                        "min_cents": price,
+                        "max_cents": price,
+                        "close_cents": price,
+                        "close_at": close_at,
+                    }
+                else:
+                    entry["min_cents"] = min(entry["min_cents"], price)
+                    entry["max_cents"] = max(entry["max_cents"], price)
+                    entry["close_cents"] = price
+                    entry["close_at"] = close_at
+                day += timedelta(days=1)
+        try:
+            db.execute(delete(rollups).where(rollups.c.game_id.in_(chunk)))
+            values = list(daily.values())
+            for offset in range(0, len(values), SNAPSHOT_BATCH_SIZE):
+                db.execute(insert(rollups), values[offset : offset + SNAPSHOT_BATCH_SIZE])
+            bump_game_versions(db, chunk)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        written += len(daily)
+    return written
 
 
 def upsert_price_snapshots(
     db: Session, game_id: int, snapshots: Iterable[Tuple[str, float, Optional[float], str]]
 ) -> int:
     """
-    Inserts new price snapshots.
-    snapshots: iterable of (store_name, price, list_price, currency)
+    Inserts new price snapshots for a single game.
+    snapshots: iterable of (cheapshark_store_id, price, list_price, currency)
+    """
+    return bulk_insert_snapshots(db, ((game_id, *snap) for snap in snapshots))
+
+
+def bulk_insert_snapshots(
+    db: Session,
+    rows: Iterable[SnapshotRow],
+    batch_size: int = SNAPSHOT_BATCH_SIZE,
+    source: str = "cheapshark",
+    timestamp: Optional[datetime] = None,
+    write_mode: Optional[str] = None,
+) -> int:
+    """
+    Inserts snapshot rows for any number of games in a single transaction and returns the number
+    of rows inserted.
+    rows: iterable of (game_id, cheapshark_store_id, price, list_price, currency)
+
+    Store, source and currency are stored as ids and prices as integer cents (see _compact_rows).
+    Rows are sent as core INSERT executemany batches of `batch_size` rows, bypassing the ORM
+    unit of work (SQLAlchemy renders these as multi-row VALUES on Postgres), and committed
+    once at the end together with the matching current_prices upserts. In "changes" write mode
+    (see SNAPSHOT_WRITE_MODE), rows matching the current price for their (game, store) only
+    bump last_seen_at. The stored rows are checked against the price alert rules of their games
+    (see _record_alerts), and alerts they fire are written in the same transaction.
     """
+    table = models.PriceSnapshot.__table__
+    current = models.CurrentPrice.__table__
+    timestamp = timestamp or datetime.utcnow()
+    write_mode = write_mode or SNAPSHOT_WRITE_MODE
+    rows = all_rows = _compact_rows(db, rows)
+    source_id = _lookup_id(db, "source", source)
     count = 0
-    timestamp = datetime.utcnow()
-    for store_name, price, list_price, currency in snapshots:
-        snap = models.PriceSnapshot(
-            game_id=game_id,
-            source="cheapshark",
-            store_name=store_name,
-            price=price,
-            list_price=list_price,
-            currency=currency,
-            timestamp=timestamp,
-        )
-        db.add(snap)
-        count += 1
-    db.commit()
+    unchanged: List[Tuple[int, int, Optional[int], Optional[datetime]]] = []
+    try:
+        if write_mode == "changes":
+            rows, unchanged = _split_unchanged(rows, _current_price_keys(db, {row[0] for row in rows}, batch_size))
+            for start in range(0, len(unchanged), batch_size):
+                chunk = unchanged[start : start + batch_size]
+                db.execute(
+                    update(table)
+                    .where(table.c.id.in_([snapshot_id for _, _, snapshot_id, _ in chunk if snapshot_id is not None]))
+                    .values(last_seen_at=timestamp)
+                )
+                db.execute(
+                    update(current)
+                    .where((current.c.game_id == bindparam("g_id")) & (current.c.store_id == bindparam("s_id")))
+                    .values(last_seen_at=timestamp),
+                    [{"g_id": game_id, "s_id": store_id} for game_id, store_id, _, _ in chunk],
+                )
+        for start in range(0, len(rows), batch_size):
+            batch = [
+                {
+                    "game_id": game_id,
+                    "store_id": store_id,
+                    "source_id": source_id,
+                    "currency_id": currency_id,
+                    "price_cents": price_cents,
+                    "list_price_cents": list_price_cents,
+                    "timestamp": timestamp,
+                    "last_seen_at": timestamp,
+                }
+                for game_id, store_id, price_cents, list_price_cents, currency_id in rows[start : start + batch_size]
+            ]
+            inserted = db.execute(
+                insert(table).returning(table.c.id, table.c.game_id, table.c.store_id), batch
+            ).all()
+            snapshot_ids = {(game_id, store_id): snapshot_id for snapshot_id, game_id, store_id in inserted}
+            # One upsert per key: Postgres rejects a statement that updates the same row twice
+            latest = {(values["game_id"], values["store_id"]): values for values in batch}
+            _upsert(
+                db,
+                current,
+                [
+                    {**values, "snapshot_id": snapshot_ids.get(key)}
+                    for key, values in latest.items()
+                ],
+                index_elements=["game_id", "store_id"],
+            )
+            count += len(batch)
+        fired, cleared, alerts_version = _record_alerts(db, rows, timestamp)
+        _update_rollups(
+            db, all_rows, timestamp, batch_size, {(game_id, store_id): seen for game_id, store_id, _, seen in unchanged}
+        )
+        refresh_game_summaries(db, {row[0] for row in all_rows}, batch_size)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    writer.after_commit(db, functools.partial(alert_rules.index.apply, fired, cleared, alerts_version))
     return count
 
 
-def normalize_store_names(db: Session, store_map: Dict[str, str]) -> int:
-    """Replace placeholder store names like 'Store 3' with real names when available."""
-    pattern = re.compile(r"Store\s+(\d+)$", re.IGNORECASE)
-    snapshots = db.query(models.PriceSnapshot).filter(models.PriceSnapshot.store_name.ilike("Store %")).all()
-    updated = 0
-    for snap in snapshots:
-        match = pattern.match(snap.store_name.strip())
-        if not match:
+def _compact_rows(db: Session, rows: Iterable[SnapshotRow]) -> List[CompactRow]:
+    """Resolves store and currency ids and converts prices to integer cents."""
+    rows = list(rows)
+    store_ids = resolve_store_ids(db, {row[1] for row in rows})
+    currency_ids = {code: _lookup_id(db, "currency", code) for code in {row[4] for row in rows}}
+    return [
+        (game_id, store_ids[store], to_cents(price), to_cents(list_price), currency_ids[currency])
+        for game_id, store, price, list_price, currency in rows
+    ]
+
+
+def _upsert(
+    db: Session,
+    table,
+    rows: List[dict],
+    index_elements: List[str],
+    merge: Optional[Dict[str, str]] = None,
+    on_conflict: str = "update",
+    index_where=None,
+) -> None:
+    """
+    INSERT ... ON CONFLICT DO UPDATE for SQLite and Postgres. Conflicting rows take the new values,
+    except columns listed in `merge` as "min" or "max", which keep the lower/higher of both.
+    With on_conflict="ignore", conflicting rows are left untouched (ON CONFLICT DO NOTHING).
+    `index_where` is the predicate of a partial unique index on `index_elements`.
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        least, greatest = func.least, func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        # SQLite's multi-argument min()/max() are scalar functions
+        least, greatest = func.min, func.max
+    else:  # pragma: no cover - only SQLite and Postgres are supported
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    stmt = dialect_insert(table)
+    if on_conflict == "ignore":
+        db.execute(stmt.on_conflict_do_nothing(index_elements=index_elements, index_where=index_where), rows)
+        return
+    merge = merge or {}
+    set_ = {}
+    for name in rows[0]:
+        if name in index_elements:
             continue
-        store_id = match.group(1)
-        real_name = store_map.get(store_id)
-        if real_name and snap.store_name != real_name:
-            snap.store_name = real_name
-            updated += 1
-    if updated:
-        db.commit()
-    return updated
+        if merge.get(name) == "min":
+            set_[name] = least(table.c[name], stmt.excluded[name])
+        elif merge.get(name) == "max":
+            set_[name] = greatest(table.c[name], stmt.excluded[name])
+        else:
+            set_[name] = stmt.excluded[name]
+    db.execute(
+        stmt.on_conflict_do_update(index_elements=index_elements, index_where=index_where, set_=set_), rows
+    )
+
+
+def _record_alerts(
+    db: Session, rows: List[CompactRow], timestamp: datetime
+) -> Tuple[List[alert_rules.FiredAlert], List[alert_rules.ClearedAlert], Optional[int]]:
+    """
+    Checks new prices against the alert rule index and writes the alerts they fire or clear.
+    The index only knows this process's alerts, so the database has the last word: a (rule, store)
+    that already has an uncleared alert is skipped by ux_price_alerts_active, and every fire or
+    clear bumps the "alert_rules" version so other processes reload their index. Does not commit;
+    returns (fired, cleared, new version or None) for the caller to apply once it has committed.
+    """
+    sync_alert_rules(db)
+    fired, cleared = alert_rules.index.evaluate(rows)
+    if not fired and not cleared:
+        return fired, cleared, None
+    alerts = models.PriceAlert.__table__
+    if fired:
+        _upsert(
+            db,
+            alerts,
+            [
+                {
+                    "rule_id": rule_id,
+                    "game_id": game_id,
+                    "store_id": store_id,
+                    "price_cents": price_cents,
+                    "list_price_cents": list_price_cents,
+                    "fired_at": timestamp,
+                    "attempts": 0,
+                }
+                for rule_id, game_id, store_id, price_cents, list_price_cents in fired
+            ],
+            index_elements=["rule_id", "store_id"],
+            on_conflict="ignore",
+            index_where=alerts.c.cleared_at.is_(None),
+        )
+    if cleared:
+        db.execute(
+            update(alerts)
+            .where(
+                (alerts.c.rule_id == bindparam("r_id"))
+                & (alerts.c.store_id == bindparam("s_id"))
+                & alerts.c.cleared_at.is_(None)
+            )
+            .values(cleared_at=timestamp),
+            [{"r_id": rule_id, "s_id": store_id} for rule_id, _, store_id in cleared],
+        )
+    bump_versions(db, ["alert_rules"])
+    return fired, cleared, get_versions(db, ["alert_rules"])["alert_rules"]
+
+
+def _update_rollups(
+    db: Session,
+    rows: List[CompactRow],
+    timestamp: datetime,
+    batch_size: int,
+    last_seen: Optional[Dict[Tuple[int, int], Optional[datetime]]] = None,
+) -> None:
+    """
+    Folds observed prices (stored or unchanged) into the daily rollups. `last_seen` maps unchanged
+    (game, store) prices to when they were last seen before now: like rebuild_price_rollups, which
+    counts a snapshot for every day until its last_seen_at, the days in between get that price.
+    """
+    day = timestamp.date()
+    rollups: Dict[Tuple[int, int], dict] = {}
+    # Price of the first row per key, the one _split_unchanged compared with the current price
+    first: Dict[Tuple[int, int], int] = {}
+    for game_id, store_id, price_cents, _, _ in rows:
+        existing = rollups.get((game_id, store_id))
+        if existing is None:
+            first[(game_id, store_id)] = price_cents
+            rollups[(game_id, store_id)] = {
+                "game_id": game_id,
+                "store_id": store_id,
+                "day": day,
+                "min_cents": price_cents,
+                "max_cents": price_cents,
+                "close_cents": price_cents,
+                "close_at": timestamp,
+            }
+        else:
+            existing["min_cents"] = min(existing["min_cents"], price_cents)
+            existing["max_cents"] = max(existing["max_cents"], price_cents)
+            existing["close_cents"] = price_cents
+    filled: List[dict] = []
+    for (game_id, store_id), seen in (last_seen or {}).items():
+        if seen is None:
+            continue
+        price_cents = first[(game_id, store_id)]
+        gap = seen.date() + timedelta(days=1)
+        while gap < day:
+            filled.append(
+                {
+                    "game_id": game_id,
+                    "store_id": store_id,
+                    "day": gap,
+                    "min_cents": price_cents,
+                    "max_cents": price_cents,
+                    "close_cents": price_cents,
+                    "close_at": datetime.combine(gap, datetime.max.time()),
+                }
+            )
+            gap += timedelta(days=1)
+    values = filled + list(rollups.values())
+    for start in range(0, len(values), batch_size):
+        _upsert(
+            db,
+            models.PriceRollup.__table__,
+            values[start : start + batch_size],
+            index_elements=["game_id", "store_id", "day"],
+            merge={"min_cents": "min", "max_cents": "max"},
+        )
+
+
+def _split_unchanged(
+    rows: List[CompactRow], current: Dict[Tuple[int, int], Tuple[Optional[int], int, Optional[int], Optional[datetime]]]
+) -> Tuple[List[CompactRow], List[Tuple[int, int, Optional[int], Optional[datetime]]]]:
+    """
+    Returns (rows whose price changed, (game_id, store_id, snapshot_id, last_seen_at) of prices
+    still current).
+    """
+    changed: List[CompactRow] = []
+    unchanged: List[Tuple[int, int, Optional[int], Optional[datetime]]] = []
+    seen = set()
+    for row in rows:
+        game_id, store_id, price_cents, list_price_cents, _ = row
+        key = (game_id, store_id)
+        # Duplicate rows within one batch are only applied once
+        if key in seen:
+            continue
+        seen.add(key)
+        previous = current.get(key)
+        if previous is not None and previous[1] == price_cents and previous[2] == list_price_cents:
+            unchanged.append((game_id, store_id, previous[0], previous[3]))
+        else:
+            changed.append(row)
+    return changed, unchanged
+
+
+def _current_price_keys(
+    db: Session, game_ids: Iterable[int], chunk_size: int = SNAPSHOT_BATCH_SIZE
+) -> Dict[Tuple[int, int], Tuple[Optional[int], int, Optional[int], Optional[datetime]]]:
+    """
+    Returns {(game_id, store_id): (snapshot_id, price_cents, list_price_cents, last_seen_at)}
+    from current_prices.
+    """
+    game_ids = list(game_ids)
+    cur = models.CurrentPrice
+    result: Dict[Tuple[int, int], Tuple[Optional[int], int, Optional[int], Optional[datetime]]] = {}
+    for start in range(0, len(game_ids), chunk_size):
+        rows = db.query(
+            cur.game_id, cur.store_id, cur.snapshot_id, cur.price_cents, cur.list_price_cents, cur.last_seen_at
+        ).filter(cur.game_id.in_(game_ids[start : start + chunk_size]))
+        for game_id, store_id, snapshot_id, price_cents, list_price_cents, last_seen_at in rows:
+            result[(game_id, store_id)] = (snapshot_id, price_cents, list_price_cents, last_seen_at)
+    return result
+
+
+def compact_snapshots(db: Session, game_id: int) -> int:
+    """
+    Collapses runs of identical consecutive (price, list_price) rows per store for one game into
+    the first row of each run, extending its last_seen_at. Returns the number of rows removed.
+    """
+    snap = models.PriceSnapshot
+    rows = (
+        db.query(snap.id, snap.store_id, snap.price_cents, snap.list_price_cents, snap.timestamp, snap.last_seen_at)
+        .filter(snap.game_id == game_id)
+        .order_by(snap.store_id, snap.timestamp, snap.id)
+        .all()
+    )
+    to_delete: List[int] = []
+    extend: Dict[int, datetime] = {}
+    keeper = None
+    for row in rows:
+        seen = row.last_seen_at or row.timestamp
+        if (
+            keeper is not None
+            and keeper.store_id == row.store_id
+            and keeper.price_cents == row.price_cents
+            and keeper.list_price_cents == row.list_price_cents
+        ):
+            to_delete.append(row.id)
+            if seen > extend.get(keeper.id, keeper.last_seen_at or keeper.timestamp):
+                extend[keeper.id] = seen
+            continue
+        keeper = row
+    for keeper_id, last_seen_at in extend.items():
+        db.execute(update(snap.__table__).where(snap.id == keeper_id).values(last_seen_at=last_seen_at))
+    for start in range(0, len(to_delete), SNAPSHOT_BATCH_SIZE):
+        db.query(snap).filter(snap.id.in_(to_delete[start : start + SNAPSHOT_BATCH_SIZE])).delete(
+            synchronize_session=False
+        )
+    db.commit()
+    return len(to_delete)
 
 
-def upsert_metadata(db: Session, game_id: int, metadata: Dict[str, Optional[object]]) -> models.GameMetadata:
+def upsert_metadata(
+    db: Session,
+    game_id: int,
+    metadata: Dict[str, Optional[object]],
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> models.GameMetadata:
     existing = db.query(models.GameMetadata).filter(models.GameMetadata.game_id == game_id).first()
     tags = metadata.get("tags")
     tags_str = json.dumps(tags) if tags is not None else None
+    bump_game_versions(db, [game_id])
     if existing:
         existing.description = metadata.get("description")  # type: ignore
         existing.tags = tags_str
         existing.last_scraped_at = datetime.utcnow()
+        existing.etag = etag
+        existing.last_modified = last_modified
+        existing.content_hash = content_hash
         db.add(existing)
         db.commit()
         db.refresh(existing)
@@ -171,6 +1190,9 @@ def upsert_metadata(db: Session, game_id: int, metadata: Dict[str, Optional[obje
         description=metadata.get("description"),  # type: ignore
         tags=tags_str,
         last_scraped_at=datetime.utcnow(),
+        etag=etag,
+        last_modified=last_modified,
+        content_hash=content_hash,
     )
     db.add(meta)
     db.commit()
@@ -178,6 +1200,30 @@ def upsert_metadata(db: Session, game_id: int, metadata: Dict[str, Optional[obje
     return meta
 
 
+def get_metadata_validators(db: Session, game_id: int) -> Optional[MetadataValidators]:
+    """last_scraped_at, etag, last_modified and content_hash of a game's stored metadata."""
+    meta = models.GameMetadata
+    row = (
+        db.query(meta.last_scraped_at, meta.etag, meta.last_modified, meta.content_hash)
+        .filter(meta.game_id == game_id)
+        .first()
+    )
+    return tuple(row) if row is not None else None  # type: ignore
+
+
+def touch_metadata(db: Session, game_id: int, etag: Optional[str], last_modified: Optional[str]) -> None:
+    """Marks stored metadata as re-validated against the store page without rewriting it."""
+    meta = models.GameMetadata
+    db.execute(
+        update(meta.__table__)
+        .where(meta.game_id == game_id)
+        .values(last_scraped_at=datetime.utcnow(), etag=etag, last_modified=last_modified)
+    )
+    # last_scraped_at is part of the detail response
+    bump_game_versions(db, [game_id])
+    db.commit()
+
+
 def get_metadata(db: Session, game_id: int) -> Optional[schemas.GameMetadataRead]:
     meta = db.query(models.GameMetadata).filter(models.GameMetadata.game_id == game_id).first()
     if not meta:
@@ -188,3 +1234,310 @@ def get_metadata(db: Session, game_id: int) -> Optional[schemas.GameMetadataRead
         tags=tags,
         last_scraped_at=meta.last_scraped_at,
     )
+
+
+def list_stale_metadata_games(db: Session, scraped_before: datetime) -> List[Tuple[int, str]]:
+    """(game id, store_url) for games with a store page never scraped or last scraped before the cutoff."""
+    meta = models.GameMetadata
+    rows = (
+        db.query(models.Game.id, models.Game.store_url)
+        .outerjoin(meta, meta.game_id == models.Game.id)
+        .filter(models.Game.store_url.isnot(None))
+        .filter((meta.last_scraped_at.is_(None)) | (meta.last_scraped_at < scraped_before))
+        .order_by(meta.last_scraped_at.isnot(None), meta.last_scraped_at, models.Game.id)
+        .all()
+    )
+    return [(game_id, store_url) for game_id, store_url in rows]
+
+
+def record_search_results(db: Session, query: str, results: List[Dict[str, Optional[object]]]) -> None:
+    """Persists an upstream search: the normalized query and every title it returned."""
+    now = datetime.utcnow()
+    titles = {
+        item["api_game_id"]: {
+            "api_game_id": item["api_game_id"],
+            "title": item["title"],
+            "thumb": item.get("thumb"),
+            "cheapest_price": item.get("cheapestPrice"),
+            "updated_at": now,
+        }
+        for item in results
+        if item.get("api_game_id") and item.get("title")
+    }
+    try:
+        _upsert(db, models.SearchTitle.__table__, list(titles.values()), index_elements=["api_game_id"])
+        _upsert(
+            db, models.SearchQuery.__table__, [{"query": query, "searched_at": now}], index_elements=["query"]
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def list_search_titles(db: Session) -> List[Dict[str, Optional[object]]]:
+    """Returns every known title, from the watchlist and from past searches, as search results."""
+    results: Dict[str, Dict[str, Optional[object]]] = {}
+    for row in db.query(models.SearchTitle):
+        results[row.api_game_id] = {
+            "api_game_id": row.api_game_id,
+            "title": row.title,
+            "thumb": row.thumb,
+            "cheapestPrice": row.cheapest_price,
+        }
+    game = models.Game
+    for api_game_id, title, cover_image_url, best_price in db.query(
+        game.api_game_id, game.title, game.cover_image_url, game.best_price
+    ):
+        results[api_game_id] = {
+            "api_game_id": api_game_id,
+            "title": title,
+            "thumb": cover_image_url,
+            "cheapestPrice": best_price,
+        }
+    return list(results.values())
+
+
+def list_search_queries(db: Session) -> List[Tuple[str, datetime]]:
+    """Returns (query, searched_at) for every query CheapShark has answered."""
+    return [(row.query, row.searched_at) for row in db.query(models.SearchQuery)]
+
+
+def acquire_lease(db: Session, name: str, holder: str, ttl: float, now: Optional[datetime] = None) -> bool:
+    """
+    Takes or renews the named lease for `holder` until now + ttl seconds and returns whether it is held.
+    Succeeds when the lease is free, expired or already held by `holder`; a single conditional
+    UPDATE decides, so concurrent callers on SQLite or Postgres cannot both win.
+    """
+    lease = models.Lease.__table__
+    now = now or datetime.utcnow()
+    _upsert(db, lease, [{"name": name, "holder": None, "expires_at": now}], ["name"], on_conflict="ignore")
+    held = db.execute(
+        update(lease)
+        .where(lease.c.name == name)
+        .where((lease.c.holder == holder) | lease.c.holder.is_(None) | (lease.c.expires_at <= now))
+        .values(
+            holder=holder,
+            expires_at=now + timedelta(seconds=ttl),
+            # Keep the original acquisition time across renewals
+            acquired_at=case((lease.c.holder == holder, lease.c.acquired_at), else_=now),
+        )
+    ).rowcount
+    db.commit()
+    return held == 1
+
+
+def release_lease(db: Session, name: str, holder: str) -> None:
+    lease = models.Lease.__table__
+    db.execute(
+        update(lease).where((lease.c.name == name) & (lease.c.holder == holder)).values(holder=None)
+    )
+    db.commit()
+
+
+def get_lease(db: Session, name: str) -> Optional[models.Lease]:
+    return db.query(models.Lease).filter(models.Lease.name == name).first()
+
+
+def bump_versions(db: Session, names: Iterable[str]) -> None:
+    """Increments the named data_versions counters. Does not commit."""
+    table = models.DataVersion.__table__
+    names = list(names)
+    _upsert(db, table, [{"name": name, "version": 0} for name in names], ["name"], on_conflict="ignore")
+    db.execute(update(table).where(table.c.name.in_(names)).values(version=table.c.version + 1))
+
+
+def bump_game_versions(db: Session, game_ids: Optional[Iterable[int]] = None) -> None:
+    """Increments the version of the given games, or all of them. Does not commit."""
+    games = models.Game.__table__
+    stmt = update(games).values(version=func.coalesce(games.c.version, 0) + 1, updated_at=games.c.updated_at)
+    if game_ids is not None:
+        stmt = stmt.where(games.c.id.in_(list(game_ids)))
+    db.execute(stmt)
+
+
+def get_versions(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    names = list(names)
+    table = models.DataVersion
+    found = dict(db.query(table.name, table.version).filter(table.name.in_(names)).all())
+    return {name: found.get(name, 0) for name in names}
+
+
+def get_game_version(db: Session, game_id: int) -> Optional[int]:
+    """The game's version (0 if never bumped), or None if there is no such game."""
+    row = db.query(models.Game.version).filter(models.Game.id == game_id).first()
+    if row is None:
+        return None
+    return row[0] or 0
+
+
+def sync_store_cache(db: Session, version: Optional[int] = None) -> None:
+    """
+    Reloads the store cache if the "stores" data version (read here unless given) moved since it
+    was loaded, i.e. another process synced or renamed stores. Costs at most one query otherwise.
+    """
+    if version is None:
+        version = get_versions(db, ["stores"])["stores"]
+    if store_cache.stores.version != version:
+        store_cache.stores.load(db)
+
+
+def sync_alert_rules(db: Session) -> None:
+    """
+    Reloads the alert rule index if the "alert_rules" data version moved since it was loaded,
+    i.e. rules were added or deleted by this or another process. Costs one query otherwise.
+    """
+    version = get_versions(db, ["alert_rules"])["alert_rules"]
+    if alert_rules.index.version == version:
+        return
+    rule = models.PriceAlertRule
+    alert = models.PriceAlert
+    rules = db.query(rule.id, rule.game_id, rule.target_cents, rule.min_discount).all()
+    active = db.query(alert.rule_id, alert.game_id, alert.store_id).filter(alert.cleared_at.is_(None)).distinct()
+    alert_rules.index.load(rules, active.all(), version)
+
+
+def _alert_rule_read(rule: models.PriceAlertRule) -> schemas.AlertRuleRead:
+    return schemas.AlertRuleRead(
+        id=rule.id,
+        game_id=rule.game_id,
+        target_price=from_cents(rule.target_cents),
+        min_discount=rule.min_discount,
+        created_at=rule.created_at,
+    )
+
+
+def create_alert_rule(
+    db: Session, game_id: int, target_price: Optional[float], min_discount: Optional[float]
+) -> schemas.AlertRuleRead:
+    """
+    Adds an alert rule. Stores whose current price already meets it fire right away; after that
+    the rule is checked by snapshot ingestion.
+    """
+    now = datetime.utcnow()
+    rule = models.PriceAlertRule(
+        game_id=game_id, target_cents=to_cents(target_price), min_discount=min_discount, created_at=now
+    )
+    db.add(rule)
+    db.flush()
+    current = models.CurrentPrice
+    prices = db.query(current.store_id, current.price_cents, current.list_price_cents).filter(
+        current.game_id == game_id
+    )
+    fired = [
+        {
+            "rule_id": rule.id,
+            "game_id": game_id,
+            "store_id": store_id,
+            "price_cents": price_cents,
+            "list_price_cents": list_price_cents,
+            "fired_at": now,
+            "attempts": 0,
+        }
+        for store_id, price_cents, list_price_cents in prices
+        if alert_rules.rule_matches(rule.target_cents, min_discount, price_cents, list_price_cents)
+    ]
+    if fired:
+        db.execute(insert(models.PriceAlert.__table__), fired)
+    bump_versions(db, ["alert_rules"])
+    db.commit()
+    if fired:
+        writer.after_commit(db, alert_rules.index.fired.set)
+    return _alert_rule_read(rule)
+
+
+def list_alert_rules(db: Session, game_id: int) -> List[schemas.AlertRuleRead]:
+    rules = db.query(models.PriceAlertRule).filter(models.PriceAlertRule.game_id == game_id)
+    return [_alert_rule_read(rule) for rule in rules.order_by(models.PriceAlertRule.id)]
+
+
+def delete_alert_rule(db: Session, rule_id: int) -> bool:
+    """Deletes a rule and its alerts; returns False if there is no such rule."""
+    rule = models.PriceAlertRule
+    if db.query(rule.id).filter(rule.id == rule_id).first() is None:
+        return False
+    db.execute(delete(models.PriceAlert.__table__).where(models.PriceAlert.rule_id == rule_id))
+    db.execute(delete(rule.__table__).where(rule.id == rule_id))
+    bump_versions(db, ["alert_rules"])
+    db.commit()
+    return True
+
+
+def list_alerts(
+    db: Session,
+    limit: int = 50,
+    pending: bool = False,
+    max_attempts: Optional[int] = None,
+) -> List[schemas.PriceAlertRead]:
+    """
+    Fired alerts, newest first; with `pending`, only undelivered ones with fewer than
+    `max_attempts` failed deliveries, oldest first (the delivery queue order).
+    """
+    alert = models.PriceAlert
+    rule = models.PriceAlertRule
+    game = models.Game
+    query = (
+        db.query(
+            alert.id,
+            alert.rule_id,
+            alert.game_id,
+            game.api_game_id,
+            game.title,
+            alert.store_id,
+            alert.price_cents,
+            alert.list_price_cents,
+            rule.target_cents,
+            rule.min_discount,
+            alert.fired_at,
+            alert.cleared_at,
+            alert.delivered_at,
+            alert.attempts,
+        )
+        .join(rule, rule.id == alert.rule_id)
+        .join(game, game.id == alert.game_id)
+    )
+    if pending:
+        query = query.filter(alert.delivered_at.is_(None)).order_by(alert.id)
+        if max_attempts is not None:
+            query = query.filter(alert.attempts < max_attempts)
+    else:
+        query = query.order_by(alert.id.desc())
+    rows = query.limit(limit).all()
+    names = get_store_names(db, {row.store_id for row in rows})
+    return [
+        schemas.PriceAlertRead(
+            id=row.id,
+            rule_id=row.rule_id,
+            game_id=row.game_id,
+            api_game_id=row.api_game_id,
+            title=row.title,
+            store_name=names.get(row.store_id, f"Store {row.store_id}"),
+            price=from_cents(row.price_cents),
+            list_price=from_cents(row.list_price_cents),
+            discount=round(alert_rules.discount_percent(row.price_cents, row.list_price_cents), 1),
+            target_price=from_cents(row.target_cents),
+            min_discount=row.min_discount,
+            fired_at=row.fired_at,
+            cleared_at=row.cleared_at,
+            delivered_at=row.delivered_at,
+            attempts=row.attempts or 0,
+        )
+        for row in rows
+    ]
+
+
+def mark_alerts_delivered(db: Session, alert_ids: List[int], delivered_at: Optional[datetime] = None) -> None:
+    alert = models.PriceAlert.__table__
+    db.execute(
+        update(alert)
+        .where(alert.c.id.in_(alert_ids))
+        .values(delivered_at=delivered_at or datetime.utcnow(), attempts=alert.c.attempts + 1)
+    )
+    db.commit()
+
+
+def record_alert_failures(db: Session, alert_ids: List[int]) -> None:
+    """Counts a failed delivery attempt for each alert; they stay queued until they run out of attempts."""
+    alert = models.PriceAlert.__table__
+    db.execute(update(alert).where(alert.c.id.in_(alert_ids)).values(attempts=alert.c.attempts + 1))
+    db.commit()
@@ -1,15 +1,265 @@
 import os
-from sqlalchemy import create_engine
+import re
+from typing import List
+
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from .services import metrics
+
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./gamepricelens.db")
 
-# check_same_thread is required for SQLite when using the same connection in different threads
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+# SQLite profile applied to every new connection (see _apply_sqlite_pragmas). WAL lets readers
+# run alongside the writer; NORMAL synchronous is durable in WAL mode except on power loss
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# Page cache per connection and memory-mapped I/O size, in MB
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+# Seconds a connection waits for the write lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+# Pooled SQLite connections; each concurrent reader needs its own
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "16"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "16"))
+
+
+def is_sqlite_file(url: str = DATABASE_URL) -> bool:
+    """Whether the URL is an on-disk SQLite database (in-memory ones have one connection and no WAL)."""
+    if not url.startswith("sqlite"):
+        return False
+    path = url.split("://", 1)[1].lstrip("/").split("?", 1)[0]
+    return bool(path) and path != ":memory:" and "mode=memory" not in url
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        # Negative cache_size is in KiB
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+    finally:
+        cursor.close()
+
+
+def _engine_options(url: str) -> dict:
+    if not url.startswith("sqlite"):
+        return {}
+    # check_same_thread is required for SQLite when using the same connection in different threads
+    options: dict = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT}}
+    if is_sqlite_file(url):
+        options.update(pool_size=SQLITE_POOL_SIZE, max_overflow=SQLITE_MAX_OVERFLOW)
+    return options
+
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+if is_sqlite_file(DATABASE_URL):
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+metrics.instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ASYNC_MODE=1 serves search, add-game and game detail from async handlers on an async engine
+ASYNC_MODE = os.getenv("ASYNC_MODE", "0") == "1"
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+_async_sessionmaker = None
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """DATABASE_URL with its async driver (aiosqlite or asyncpg), unless ASYNC_DATABASE_URL is set."""
+    if os.getenv("ASYNC_DATABASE_URL"):
+        return os.environ["ASYNC_DATABASE_URL"]
+    scheme, rest = url.split("://", 1)
+    return f"{_ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+def AsyncSessionLocal():
+    """
+    New AsyncSession on the async engine, created on first use so the async drivers are only
+    needed with ASYNC_MODE. Objects stay loaded after commit: lazy loads can't run outside run_sync.
+    """
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = async_database_url()
+        async_engine = create_async_engine(url)
+        if is_sqlite_file(url):
+            event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        metrics.instrument_engine(async_engine.sync_engine, "async")
+        _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker()
+
 Base = declarative_base()
+
+
+# Price tables from before snapshots referenced the stores dimension (they have a store_name column)
+_LEGACY_PRICE_TABLES = ("price_snapshots", "current_prices", "price_rollups_daily")
+
+
+def ensure_schema(bind=None) -> None:
+    """
+    Creates missing tables, then adds columns and indexes introduced after a table was first created.
+    There are no migrations, so columns added to existing tables must be nullable. Price tables
+    still keyed by store name are upgraded in place once (see _upgrade_legacy_price_tables).
+    `bind` defaults to the application engine.
+    """
+    bind = bind if bind is not None else engine
+    with bind.begin() as conn:
+        legacy = _rename_legacy_price_tables(conn)
+        Base.metadata.create_all(bind=conn)
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=conn.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        if legacy:
+            _upgrade_legacy_price_tables(conn, legacy)
+
+
+def _rename_legacy_price_tables(conn) -> List[str]:
+    """Moves legacy price tables aside as legacy_<name>, freeing their index and sequence names."""
+    inspector = inspect(conn)
+    postgres = conn.dialect.name == "postgresql"
+    legacy = []
+    for name in _LEGACY_PRICE_TABLES:
+        if not inspector.has_table(name):
+            continue
+        if "store_name" not in {column["name"] for column in inspector.get_columns(name)}:
+            continue
+        for index in inspector.get_indexes(name):
+            conn.execute(text(f"DROP INDEX {index['name']}"))
+        if postgres:
+            pk_name = inspector.get_pk_constraint(name).get("name")
+            if pk_name:
+                conn.execute(text(f"ALTER INDEX {pk_name} RENAME TO legacy_{pk_name}"))
+            sequence = None
+            if name == "price_snapshots":
+                sequence = conn.execute(text("SELECT pg_get_serial_sequence('price_snapshots', 'id')")).scalar()
+            if sequence:
+                conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO legacy_{sequence.split('.')[-1]}"))
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO legacy_{name}"))
+        legacy.append(name)
+    return legacy
+
+
+def _upgrade_legacy_price_tables(conn, legacy: List[str]) -> None:
+    """
+    Copies legacy price rows into the store/source/currency id and integer cents layout, then drops
+    the legacy tables. Placeholder names ("Store 7") become stores with that CheapShark id; other
+    names keep their name until a store sync adopts them. Legacy tables come from any earlier
+    release, so columns added along the way (last_seen_at, snapshot_id, ...) may be missing.
+    """
+    inspector = inspect(conn)
+    legacy_columns = {
+        name: {column["name"] for column in inspector.get_columns(f"legacy_{name}")} for name in legacy
+    }
+
+    def column(table: str, name: str, fallback: str) -> str:
+        """l.<name> if legacy_<table> has that column, else the `fallback` SQL expression."""
+        return f"l.{name}" if name in legacy_columns[table] else fallback
+
+    names = set()
+    for name in legacy:
+        names.update(store for (store,) in conn.execute(text(f"SELECT DISTINCT store_name FROM legacy_{name}")))
+    games_columns = {column["name"] for column in inspector.get_columns("games")}
+    if "best_store" in games_columns:
+        names.update(
+            store for (store,) in conn.execute(text("SELECT DISTINCT best_store FROM games")) if store is not None
+        )
+    stores = []
+    claimed = set()
+    for store in sorted(names):
+        match = re.fullmatch(r"Store\s+(\d+)", store.strip(), re.IGNORECASE)
+        cheapshark_id = match.group(1) if match and match.group(1) not in claimed else None
+        claimed.add(cheapshark_id)
+        stores.append({"cheapshark_id": cheapshark_id, "name": store})
+    if stores:
+        conn.execute(text("INSERT INTO stores (cheapshark_id, name) VALUES (:cheapshark_id, :name)"), stores)
+
+    sources = {
+        name: f"COALESCE({column(name, 'source', 'NULL')}, 'cheapshark')"
+        for name in ("price_snapshots", "current_prices")
+        if name in legacy
+    }
+    currencies = {
+        name: f"COALESCE({column(name, 'currency', 'NULL')}, 'USD')"
+        for name in ("price_snapshots", "current_prices")
+        if name in legacy
+    }
+    for name in sources:
+        conn.execute(
+            text(
+                f"INSERT INTO sources (name) SELECT DISTINCT {sources[name]} FROM legacy_{name} l "
+                f"WHERE NOT EXISTS (SELECT 1 FROM sources s WHERE s.name = {sources[name]})"
+            )
+        )
+        conn.execute(
+            text(
+                f"INSERT INTO currencies (code) SELECT DISTINCT {currencies[name]} FROM legacy_{name} l "
+                f"WHERE NOT EXISTS (SELECT 1 FROM currencies c WHERE c.code = {currencies[name]})"
+            )
+        )
+
+    def cents(column: str) -> str:
+        return f"CAST(ROUND({column} * 100) AS INTEGER)"
+
+    if "price_snapshots" in legacy:
+        conn.execute(
+            text(
+                "INSERT INTO price_snapshots (id, game_id, store_id, source_id, currency_id, price_cents, "
+                "list_price_cents, timestamp, last_seen_at) "
+                f"SELECT l.id, l.game_id, st.id, so.id, cu.id, {cents('l.price')}, {cents('l.list_price')}, "
+                f"l.timestamp, {column('price_snapshots', 'last_seen_at', 'l.timestamp')} "
+                "FROM legacy_price_snapshots l "
+                "JOIN stores st ON st.name = l.store_name "
+                f"JOIN sources so ON so.name = {sources['price_snapshots']} "
+                f"JOIN currencies cu ON cu.code = {currencies['price_snapshots']}"
+            )
+        )
+        if conn.dialect.name == "postgresql":
+            conn.execute(
+                text(
+                    "SELECT setval(pg_get_serial_sequence('price_snapshots', 'id'), "
+                    "COALESCE((SELECT MAX(id) FROM price_snapshots), 0) + 1, false)"
+                )
+            )
+    if "current_prices" in legacy:
+        conn.execute(
+            text(
+                "INSERT INTO current_prices (game_id, store_id, source_id, currency_id, price_cents, "
+                "list_price_cents, snapshot_id, timestamp, last_seen_at) "
+                f"SELECT l.game_id, st.id, so.id, cu.id, {cents('l.price')}, {cents('l.list_price')}, "
+                f"{column('current_prices', 'snapshot_id', 'NULL')}, l.timestamp, "
+                f"{column('current_prices', 'last_seen_at', 'l.timestamp')} FROM legacy_current_prices l "
+                "JOIN stores st ON st.name = l.store_name "
+                f"JOIN sources so ON so.name = {sources['current_prices']} "
+                f"JOIN currencies cu ON cu.code = {currencies['current_prices']}"
+            )
+        )
+    if "price_rollups_daily" in legacy:
+        conn.execute(
+            text(
+                "INSERT INTO price_rollups_daily (game_id, store_id, day, min_cents, max_cents, close_cents, close_at) "
+                f"SELECT l.game_id, st.id, l.day, {cents('l.min_price')}, {cents('l.max_price')}, "
+                f"{cents('l.close_price')}, l.close_at FROM legacy_price_rollups_daily l "
+                "JOIN stores st ON st.name = l.store_name"
+            )
+        )
+    if "best_store" in games_columns:
+        conn.execute(
+            text(
+                "UPDATE games SET best_store_id = (SELECT id FROM stores WHERE stores.name = games.best_store) "
+                "WHERE best_store IS NOT NULL"
+            )
+        )
+    for name in legacy:
+        conn.execute(text(f"DROP TABLE legacy_{name}"))
@@ -0,0 +1,92 @@
+"""
+Maintenance commands, run from the repo root:
+
+    python -m backend.manage compact-snapshots
+    python -m backend.manage rebuild-current-prices
+    python -m backend.manage rebuild-rollups
+    python -m backend.manage retention
+    python -m backend.manage scrape-stale
+"""
+import argparse
+import logging
+import time
+
+from . import crud, models
+from .database import SessionLocal, ensure_schema
+from .services import retention, scrape_queue
+
+logger = logging.getLogger(__name__)
+
+
+def compact_snapshots() -> None:
+    """Collapse historical runs of identical snapshots, one game per transaction."""
+    db = SessionLocal()
+    try:
+        game_ids = [game_id for (game_id,) in db.query(models.Game.id).order_by(models.Game.id)]
+        removed = 0
+        for game_id in game_ids:
+            removed += crud.compact_snapshots(db, game_id)
+        print(f"Compacted {len(game_ids)} games, removed {removed} duplicate snapshots.")
+        # Compaction can remove the snapshot rows current_prices points at
+        crud.rebuild_current_prices(db)
+    finally:
+        db.close()
+
+
+def rebuild_current_prices() -> None:
+    """Regenerate the current_prices table from price_snapshots."""
+    db = SessionLocal()
+    try:
+        rows = crud.rebuild_current_prices(db)
+        print(f"Rebuilt current_prices with {rows} rows.")
+    finally:
+        db.close()
+
+
+def rebuild_rollups() -> None:
+    """Regenerate the daily price rollups from price_snapshots."""
+    db = SessionLocal()
+    try:
+        rows = crud.rebuild_price_rollups(db)
+        print(f"Rebuilt price_rollups_daily with {rows} rows.")
+    finally:
+        db.close()
+
+
+def run_retention() -> None:
+    """Apply the snapshot retention policy once."""
+    db = SessionLocal()
+    try:
+        print(retention.run_retention(db).model_dump_json(indent=2))
+    finally:
+        db.close()
+
+
+def scrape_stale() -> None:
+    """Scrape Steam metadata for every game whose metadata is missing or stale, and wait for it."""
+    job = scrape_queue.scrapes.enqueue_stale()
+    while job.finished_at is None:
+        time.sleep(1)
+    print(job.as_schema().model_dump_json(indent=2))
+
+
+COMMANDS = {
+    "compact-snapshots": compact_snapshots,
+    "rebuild-current-prices": rebuild_current_prices,
+    "rebuild-rollups": rebuild_rollups,
+    "retention": run_retention,
+    "scrape-stale": scrape_stale,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GamePriceLens maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    ensure_schema()
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
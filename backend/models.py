@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, SmallInteger, String, Text, text
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -17,25 +17,167 @@ class Game(Base):
     cover_image_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Denormalized from current_prices by snapshot ingestion so the watchlist can be sorted,
+    # filtered and keyset-paginated on indexes
+    title_key = Column(String, nullable=True)
+    best_price = Column(Float, nullable=True)
+    best_store_id = Column(Integer, nullable=True)
+    best_discount = Column(Float, nullable=True)
+    last_price_at = Column(DateTime, nullable=True)
+    # Adaptive refresh schedule: current interval in seconds and when the game is next due
+    refresh_interval = Column(Integer, nullable=True)
+    next_refresh_at = Column(DateTime, nullable=True)
+    # Bumped by every write that changes the game's detail response; the detail ETag derives from it
+    version = Column(Integer, nullable=True)
 
     price_snapshots = relationship("PriceSnapshot", back_populates="game", cascade="all, delete-orphan")
+    current_prices = relationship("CurrentPrice", back_populates="game", cascade="all, delete-orphan")
+    price_rollups = relationship("PriceRollup", cascade="all, delete-orphan")
     metadata_entry = relationship("GameMetadata", back_populates="game", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_games_created_at_id", "created_at", "id"),
+        Index("ix_games_title_key_id", "title_key", "id"),
+        Index("ix_games_best_price_id", "best_price", "id"),
+        Index("ix_games_best_discount_id", "best_discount", "id"),
+        Index("ix_games_last_price_at_id", "last_price_at", "id"),
+        Index("ix_games_next_refresh_at_id", "next_refresh_at", "id"),
+    )
+
+
+class Store(Base):
+    """Store dimension synced from CheapShark's store list; snapshots reference it by id."""
+
+    __tablename__ = "stores"
+
+    id = Column(Integer, primary_key=True)
+    # Null for stores carried over from before the dimension existed until a sync matches them by name
+    cheapshark_id = Column(String, unique=True, nullable=True)
+    # Renames only touch this row; snapshots keep pointing at the id
+    name = Column(String, nullable=False)
+    synced_at = Column(DateTime, nullable=True)
+
+
+class Source(Base):
+    __tablename__ = "sources"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+
+class Currency(Base):
+    __tablename__ = "currencies"
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String, unique=True, nullable=False)
+
 
 class PriceSnapshot(Base):
     __tablename__ = "price_snapshots"
 
     id = Column(Integer, primary_key=True, index=True)
     game_id = Column(Integer, ForeignKey("games.id"), nullable=False, index=True)
-    source = Column(String, nullable=False)
-    store_name = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
-    list_price = Column(Float, nullable=True)
-    currency = Column(String, nullable=False, default="USD")
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    source_id = Column(SmallInteger, ForeignKey("sources.id"), nullable=False)
+    currency_id = Column(SmallInteger, ForeignKey("currencies.id"), nullable=False)
+    # Prices are stored as integer cents
+    price_cents = Column(Integer, nullable=False)
+    list_price_cents = Column(Integer, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Last refresh that observed this price; later than timestamp when unchanged refreshes were skipped
+    last_seen_at = Column(DateTime, nullable=True)
 
     game = relationship("Game", back_populates="price_snapshots")
 
+    __table_args__ = (Index("ix_price_snapshots_game_store_ts", "game_id", "store_id", "timestamp"),)
+
+
+class CurrentPrice(Base):
+    """Latest stored price per (game, store), maintained alongside snapshot ingestion."""
+
+    __tablename__ = "current_prices"
+
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    source_id = Column(SmallInteger, ForeignKey("sources.id"), nullable=False)
+    currency_id = Column(SmallInteger, ForeignKey("currencies.id"), nullable=False)
+    price_cents = Column(Integer, nullable=False)
+    list_price_cents = Column(Integer, nullable=True)
+    # The snapshot row holding this price, its timestamp, and the last refresh that observed it
+    snapshot_id = Column(Integer, nullable=True)
+    timestamp = Column(DateTime, nullable=False)
+    last_seen_at = Column(DateTime, nullable=False)
+
+    game = relationship("Game", back_populates="current_prices")
+
+    __table_args__ = (Index("ix_current_prices_store_game", "store_id", "game_id"),)
+
+
+class PriceRollup(Base):
+    """Daily min/max/close price in cents per (game, store), maintained incrementally by snapshot ingestion."""
+
+    __tablename__ = "price_rollups_daily"
+
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    min_cents = Column(Integer, nullable=False)
+    max_cents = Column(Integer, nullable=False)
+    close_cents = Column(Integer, nullable=False)
+    close_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("ix_price_rollups_daily_game_day", "game_id", "day"),)
+
+
+class PriceAlertRule(Base):
+    """
+    A user's alert on a watched game: fires when any store's price drops to `target_cents` or
+    below, or (with `min_discount`) when a store discounts the game by at least that percentage.
+    """
+
+    __tablename__ = "price_alert_rules"
+
+    id = Column(Integer, primary_key=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False, index=True)
+    target_cents = Column(Integer, nullable=True)
+    min_discount = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PriceAlert(Base):
+    """
+    A fired alert, written in the ingestion transaction that observed the matching price and
+    delivered later by the alert delivery job (rows with no delivered_at are its queue).
+    """
+
+    __tablename__ = "price_alerts"
+
+    id = Column(Integer, primary_key=True)
+    rule_id = Column(Integer, ForeignKey("price_alert_rules.id"), nullable=False)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    price_cents = Column(Integer, nullable=False)
+    list_price_cents = Column(Integer, nullable=True)
+    fired_at = Column(DateTime, nullable=False)
+    # Set once the store's price no longer matches the rule; the rule can then fire again for that store
+    cleared_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_price_alerts_rule_store", "rule_id", "store_id"),
+        # At most one uncleared alert per (rule, store), whichever process ingests the price
+        Index(
+            "ux_price_alerts_active",
+            "rule_id",
+            "store_id",
+            unique=True,
+            sqlite_where=text("cleared_at IS NULL"),
+            postgresql_where=text("cleared_at IS NULL"),
+        ),
+        Index("ix_price_alerts_delivered_at_id", "delivered_at", "id"),
+    )
+
 
 class GameMetadata(Base):
     __tablename__ = "game_metadata"
@@ -45,5 +187,51 @@ class GameMetadata(Base):
     description = Column(Text, nullable=True)
     tags = Column(Text, nullable=True)
     last_scraped_at = Column(DateTime, nullable=True)
+    # Validators from the last fetched page, sent back as If-None-Match/If-Modified-Since
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(64), nullable=True)
+    # sha256 of the last fetched page body
+    content_hash = Column(String(64), nullable=True)
 
     game = relationship("Game", back_populates="metadata_entry")
+
+
+class SearchTitle(Base):
+    """Titles returned by CheapShark searches, kept so the local search index survives restarts."""
+
+    __tablename__ = "search_titles"
+
+    api_game_id = Column(String, primary_key=True)
+    title = Column(String, nullable=False)
+    thumb = Column(String, nullable=True)
+    cheapest_price = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SearchQuery(Base):
+    """Normalized queries already answered by CheapShark."""
+
+    __tablename__ = "search_queries"
+
+    query = Column(String, primary_key=True)
+    searched_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Lease(Base):
+    """Named lease held by one process at a time (e.g. the background scheduler), renewed until it expires."""
+
+    __tablename__ = "leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=True)
+    acquired_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class DataVersion(Base):
+    """Named change counters ("watchlist", "stores") bumped in the same transaction as the writes they track."""
+
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,44 +1,48 @@
 import logging
+import os
 import threading
 import time
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from . import crud
 from .database import SessionLocal
-from .services import price_api
+from .services import alert_rules, alerts, leader, metrics, price_api, refresh_schedule, retention
 
 logger = logging.getLogger(__name__)
 
-# Configuration: refresh interval in seconds (default: 1 hour)
-REFRESH_INTERVAL = 3600
+# Configuration: seconds between checks for games due a price refresh (see services/refresh_schedule.py)
+REFRESH_TICK = int(os.getenv("REFRESH_TICK", "60"))
+# Retention/downsampling interval in seconds (default: 6 hours)
+RETENTION_INTERVAL = 6 * 3600
+# Longest wait in seconds before queued price alerts are delivered; alerts fired in this process wake it at once
+ALERT_POLL_SECONDS = float(os.getenv("ALERT_POLL_SECONDS", "30"))
+
+# Every process starts the scheduler threads, but only the holder of this lease runs the jobs
+scheduler_lease = leader.LeaderLease("scheduler")
+
+_threads: List[threading.Thread] = []
+# Job name -> when its thread last woke up (whether or not it held the lease)
+_last_tick: Dict[str, datetime] = {}
 
 
 def refresh_prices_job():
-    """Background job to refresh prices periodically"""
+    """Background job refreshing the games that are due, within the per-tick upstream request budget"""
     while True:
-        time.sleep(REFRESH_INTERVAL)
-        logger.info("Starting scheduled price refresh...")
+        time.sleep(REFRESH_TICK)
+        _last_tick["refresh"] = datetime.utcnow()
+        if not scheduler_lease.is_held():
+            continue
         db = SessionLocal()
         try:
-            games = crud.list_games(db)
-            games_processed = 0
-            snapshots_inserted = 0
-
-            for game in games:
-                games_processed += 1
-                try:
-                    details = price_api.get_game_details(game.api_game_id)
-                    _, _, snapshots = price_api.extract_snapshot_rows(details)
-                    if snapshots:
-                        count = crud.upsert_price_snapshots(db, game.id, snapshots)
-                        snapshots_inserted += count
-                except price_api.CheapSharkError as exc:
-                    logger.error(f"Failed to refresh game {game.id} ({game.title}): {exc}")
-                except Exception as exc:
-                    logger.exception(f"Unexpected error refreshing game {game.id}: {exc}")
-
+            summary = refresh_schedule.refresh_due_games(db)
+            if not summary.games_processed and not summary.games_failed:
+                continue
+            price_api.sync_stores(db)
             logger.info(
-                f"Price refresh complete. Processed {games_processed} games, "
-                f"inserted {snapshots_inserted} snapshots."
+                f"Price refresh complete. Processed {summary.games_processed} games "
+                f"({summary.games_failed} failed), inserted {summary.snapshots_inserted} snapshots "
+                f"in {summary.duration_seconds}s ({summary.games_per_second} games/s, "
+                f"{summary.upstream_requests} upstream requests)."
             )
         except Exception as exc:
             logger.exception(f"Price refresh job failed: {exc}")
@@ -46,8 +50,71 @@ def refresh_prices_job():
             db.close()
 
 
+def retention_job():
+    """Background job to downsample and expire old snapshots periodically"""
+    while True:
+        time.sleep(RETENTION_INTERVAL)
+        _last_tick["retention"] = datetime.utcnow()
+        if not scheduler_lease.is_held():
+            continue
+        db = SessionLocal()
+        try:
+            summary = retention.run_retention(db)
+            logger.info(
+                f"Retention complete. Downsampled {summary.rows_downsampled} and expired "
+                f"{summary.rows_expired} snapshots ({summary.rollups_expired} rollups), reclaimed "
+                f"{summary.bytes_reclaimed} bytes in {summary.duration_seconds}s "
+                f"(vacuum: {summary.vacuumed}, analyze: {summary.analyzed})."
+            )
+        except Exception as exc:
+            logger.exception(f"Retention job failed: {exc}")
+        finally:
+            db.close()
+
+
+def alert_delivery_job():
+    """Background job handing fired price alerts to the delivery sinks"""
+    while True:
+        alert_rules.index.fired.wait(ALERT_POLL_SECONDS)
+        alert_rules.index.fired.clear()
+        _last_tick["alerts"] = datetime.utcnow()
+        if not scheduler_lease.is_held():
+            continue
+        db = SessionLocal()
+        try:
+            delivered = alerts.delivery.deliver_pending(db)
+            if delivered:
+                logger.info(f"Delivered {delivered} price alerts.")
+        except Exception as exc:
+            logger.exception(f"Alert delivery job failed: {exc}")
+        finally:
+            db.close()
+
+
 def start_scheduler():
-    """Start the background price refresh scheduler"""
-    logger.info(f"Starting price refresh scheduler (interval: {REFRESH_INTERVAL}s)")
-    thread = threading.Thread(target=refresh_prices_job, daemon=True)
-    thread.start()
+    """Start the background refresh, retention and alert delivery jobs; they run while this process holds the lease"""
+    scheduler_lease.start()
+    logger.info(
+        f"Starting price refresh scheduler (tick: {REFRESH_TICK}s, retention: {RETENTION_INTERVAL}s)"
+    )
+    for job in (refresh_prices_job, retention_job, alert_delivery_job):
+        thread = threading.Thread(target=job, name=job.__name__, daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def scheduler_status() -> Dict[str, object]:
+    """Whether the job threads are alive, when each last woke up, and when a refresh last refreshed anything"""
+    last_success = metrics.refresh_last_success.value()
+    return {
+        "running": bool(_threads) and all(thread.is_alive() for thread in _threads),
+        "threads": {thread.name: thread.is_alive() for thread in _threads},
+        "last_tick_at": dict(_last_tick),
+        "last_refresh_at": datetime.utcfromtimestamp(last_success) if last_success else None,
+        "leader": scheduler_lease.is_held(),
+    }
+
+
+def stop_scheduler():
+    """Release the scheduler lease so another process takes over without waiting for it to expire"""
+    scheduler_lease.stop()
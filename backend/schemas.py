@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -15,6 +15,10 @@ class GameCreate(GameBase):
     api_game_id: str
 
 
+class GameBatchCreate(BaseModel):
+    games: List[GameCreate]
+
+
 class GameRead(GameBase):
     id: int
     created_at: datetime
@@ -26,22 +30,32 @@ class GameRead(GameBase):
 class GameSummary(GameRead):
     best_price: Optional[float] = None
     best_store: Optional[str] = None
+    best_discount: Optional[float] = None
     last_updated: Optional[datetime] = None
 
 
+class GamePage(BaseModel):
+    items: List[GameSummary]
+    next_cursor: Optional[str] = None
+
+
 class PriceSnapshotRead(BaseModel):
     store_name: str
     price: float
     list_price: Optional[float] = None
     currency: str
     timestamp: datetime
+    last_seen_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
 class PriceHistoryPoint(BaseModel):
+    # Start of the day, ISO week or month covered by this point
     date: date
     min_price: float
+    max_price: Optional[float] = None
+    close_price: Optional[float] = None
 
 
 class GameMetadataRead(BaseModel):
@@ -52,6 +66,19 @@ class GameMetadataRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ScrapeJobRead(BaseModel):
+    id: str
+    status: str
+    total: int
+    completed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: List[str] = []
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class GameDetailResponse(BaseModel):
     game: GameRead
     current_prices: List[PriceSnapshotRead]
@@ -66,6 +93,128 @@ class SearchResult(BaseModel):
     cheapestPrice: Optional[float] = None
 
 
+class AlertRuleCreate(BaseModel):
+    # Exactly one of: alert when a store's price is at or below target_price, or when a store's
+    # discount off its list price is at least min_discount percent
+    target_price: Optional[float] = None
+    min_discount: Optional[float] = None
+
+
+class AlertRuleRead(BaseModel):
+    id: int
+    game_id: int
+    target_price: Optional[float] = None
+    min_discount: Optional[float] = None
+    created_at: datetime
+
+
+class PriceAlertRead(BaseModel):
+    id: int
+    rule_id: int
+    game_id: int
+    api_game_id: str
+    title: str
+    store_name: str
+    price: float
+    list_price: Optional[float] = None
+    discount: float
+    target_price: Optional[float] = None
+    min_discount: Optional[float] = None
+    fired_at: datetime
+    cleared_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+    attempts: int = 0
+
+
+class StoreAnalytics(BaseModel):
+    store_name: str
+    # None once the store no longer lists the game
+    current_price: Optional[float] = None
+    all_time_low: float
+    all_time_low_at: datetime
+    average_price: float
+    snapshots: int
+
+
+class PriceSeriesPoint(BaseModel):
+    date: date
+    best_price: Optional[float] = None
+    ma_7: Optional[float] = None
+    ma_30: Optional[float] = None
+    ma_90: Optional[float] = None
+
+
+class GameAnalytics(BaseModel):
+    game_id: int
+    snapshots: int
+    first_seen_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
+    best_price: Optional[float] = None
+    best_store: Optional[str] = None
+    all_time_low: Optional[float] = None
+    all_time_low_at: Optional[datetime] = None
+    # Share of days whose best price was below the current best price (0 = lowest ever)
+    percentile: Optional[float] = None
+    # Mean discount off list price over discounted store-days, and the share of store-days discounted
+    average_discount: Optional[float] = None
+    discounted_share: Optional[float] = None
+    # Last day any store was ANALYTICS_SALE_DISCOUNT percent or more off
+    last_sale_on: Optional[date] = None
+    days_since_sale: Optional[int] = None
+    # Window in days -> latest moving average of the daily best price
+    moving_averages: Dict[str, Optional[float]] = {}
+    stores: List[StoreAnalytics] = []
+    series: Optional[List[PriceSeriesPoint]] = None
+
+
+class DiscountVsMedian(BaseModel):
+    game_id: int
+    api_game_id: str
+    title: str
+    best_price: float
+    best_store: Optional[str] = None
+    median_price: float
+    low_price: float
+    # Percent the current best price sits below the median daily close
+    below_median: float
+    days: int
+
+
+class DiscountReport(BaseModel):
+    days: int
+    games: int
+    games_ranked: int
+    items: List[DiscountVsMedian]
+
+
 class RefreshSummary(BaseModel):
     games_processed: int
     snapshots_inserted: int
+    games_failed: int = 0
+    upstream_requests: int = 0
+    duration_seconds: float = 0.0
+    games_per_second: float = 0.0
+
+
+class GameImportSummary(BaseModel):
+    games_requested: int
+    games_created: int
+    # Already on the watchlist
+    games_existing: int = 0
+    # Repeats of an api_game_id listed earlier in the request; only its first entry is used
+    games_duplicate: int = 0
+    # api_game_ids CheapShark could not resolve; they were not added
+    failed: List[str] = []
+    snapshots_inserted: int = 0
+    upstream_requests: int = 0
+    duration_seconds: float = 0.0
+
+
+class RetentionSummary(BaseModel):
+    rows_downsampled: int = 0
+    rows_expired: int = 0
+    rollups_expired: int = 0
+    bytes_reclaimed: int = 0
+    vacuumed: bool = False
+    analyzed: bool = False
+    duration_seconds: float = 0.0
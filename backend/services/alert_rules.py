@@ -0,0 +1,154 @@
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# (rule_id, game_id, target_cents, min_discount) as stored; exactly one threshold is set
+RuleRow = Tuple[int, int, Optional[int], Optional[float]]
+# (rule_id, game_id, store_id, price_cents, list_price_cents) of a rule that starts matching a store
+FiredAlert = Tuple[int, int, int, int, Optional[int]]
+# (rule_id, game_id, store_id) of a rule whose store no longer matches
+ClearedAlert = Tuple[int, int, int]
+
+
+def discount_percent(price_cents: int, list_price_cents: Optional[int]) -> float:
+    if not list_price_cents or list_price_cents <= 0:
+        return 0.0
+    return max(0.0, (list_price_cents - price_cents) * 100 / list_price_cents)
+
+
+def rule_matches(
+    target_cents: Optional[int], min_discount: Optional[float], price_cents: int, list_price_cents: Optional[int]
+) -> bool:
+    if target_cents is not None and price_cents <= target_cents:
+        return True
+    return min_discount is not None and discount_percent(price_cents, list_price_cents) >= min_discount
+
+
+class _GameRules:
+    """One game's rules as parallel sorted lists of thresholds and rule ids."""
+
+    __slots__ = ("targets", "target_ids", "discounts", "discount_ids")
+
+    def __init__(self) -> None:
+        self.targets: List[int] = []
+        self.target_ids: List[int] = []
+        self.discounts: List[float] = []
+        self.discount_ids: List[int] = []
+
+    def add(self, rule_id: int, target_cents: Optional[int], min_discount: Optional[float]) -> None:
+        if target_cents is not None:
+            index = bisect.bisect_right(self.targets, target_cents)
+            self.targets.insert(index, target_cents)
+            self.target_ids.insert(index, rule_id)
+        if min_discount is not None:
+            index = bisect.bisect_right(self.discounts, min_discount)
+            self.discounts.insert(index, min_discount)
+            self.discount_ids.insert(index, rule_id)
+
+    def matching(self, price_cents: int, list_price_cents: Optional[int]) -> Set[int]:
+        """Ids of the rules a price meets: targets at or above it, discount floors at or below its discount."""
+        matched = set(self.target_ids[bisect.bisect_left(self.targets, price_cents) :])
+        if self.discounts:
+            discount = discount_percent(price_cents, list_price_cents)
+            matched.update(self.discount_ids[: bisect.bisect_right(self.discounts, discount)])
+        return matched
+
+
+class AlertRuleIndex:
+    """
+    In-memory index of price alert rules, checked against every snapshot ingestion batch.
+
+    Rules are grouped by game and kept sorted by threshold, so a new price finds the rules it
+    meets with one bisect per rule kind; rows for games without rules cost a dict lookup. Alerts
+    are edge-triggered per (rule, store): a rule fires when a store's price starts matching it
+    and may fire again for that store only after a price that no longer matches. `version` is
+    the "alert_rules" data version the index was loaded at (see crud.sync_alert_rules); fired and
+    cleared alerts move that version too, so each process's view of active alerts catches up
+    with what others recorded.
+    """
+
+    def __init__(self) -> None:
+        self._games: Dict[int, _GameRules] = {}
+        self._rule_games: Dict[int, int] = {}
+        # (game_id, store_id) -> rules currently matching that store's price
+        self._active: Dict[Tuple[int, int], Set[int]] = {}
+        self.version: Optional[int] = None
+        # Set whenever alerts are committed, waking the delivery job
+        self.fired = threading.Event()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rule_games)
+
+    def load(self, rules: Iterable[RuleRow], active: Iterable[ClearedAlert], version: int) -> None:
+        """Replaces the index with `rules` and the (rule, game, store) alerts not yet cleared."""
+        games: Dict[int, _GameRules] = {}
+        rule_games: Dict[int, int] = {}
+        for rule_id, game_id, target_cents, min_discount in rules:
+            games.setdefault(game_id, _GameRules()).add(rule_id, target_cents, min_discount)
+            rule_games[rule_id] = game_id
+        matches: Dict[Tuple[int, int], Set[int]] = {}
+        for rule_id, game_id, store_id in active:
+            matches.setdefault((game_id, store_id), set()).add(rule_id)
+        with self._lock:
+            self._games = games
+            self._rule_games = rule_games
+            self._active = matches
+            self.version = version
+
+    def evaluate(self, rows: Sequence[Tuple]) -> Tuple[List[FiredAlert], List[ClearedAlert]]:
+        """
+        Returns the alerts fired and cleared by new prices, without recording them (see apply).
+        rows: (game_id, store_id, price_cents, list_price_cents, ...); the last row per (game, store) counts.
+        """
+        with self._lock:
+            games = self._games
+            if not games:
+                return [], []
+            latest = {(row[0], row[1]): row for row in rows if row[0] in games}
+            fired: List[FiredAlert] = []
+            cleared: List[ClearedAlert] = []
+            for (game_id, store_id), row in latest.items():
+                price_cents, list_price_cents = row[2], row[3]
+                matched = games[game_id].matching(price_cents, list_price_cents)
+                active = self._active.get((game_id, store_id), set())
+                fired.extend(
+                    (rule_id, game_id, store_id, price_cents, list_price_cents) for rule_id in matched - active
+                )
+                cleared.extend((rule_id, game_id, store_id) for rule_id in active - matched)
+        return fired, cleared
+
+    def apply(
+        self, fired: Iterable[FiredAlert], cleared: Iterable[ClearedAlert], version: Optional[int] = None
+    ) -> None:
+        """
+        Records alerts once the transaction that wrote them has committed. `version` is the data
+        version that transaction bumped to; the index adopts it if it was current just before,
+        so the writer does not reload its own changes.
+        """
+        fired = list(fired)
+        with self._lock:
+            if version is not None and self.version == version - 1:
+                self.version = version
+            for rule_id, game_id, store_id in cleared:
+                active = self._active.get((game_id, store_id))
+                if active is not None:
+                    active.discard(rule_id)
+                    if not active:
+                        del self._active[(game_id, store_id)]
+            for rule_id, game_id, store_id, _, _ in fired:
+                self._active.setdefault((game_id, store_id), set()).add(rule_id)
+        if fired:
+            self.fired.set()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "rules": len(self._rule_games),
+                "games": len(self._games),
+                "active_alerts": sum(len(rules) for rules in self._active.values()),
+                "version": self.version,
+            }
+
+
+index = AlertRuleIndex()
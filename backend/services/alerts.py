@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import requests
+from sqlalchemy.orm import Session
+
+from .. import crud
+from . import writer
+
+logger = logging.getLogger(__name__)
+
+# Alerts handed to the sinks per delivery batch
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", "100"))
+# Delivery attempts before an alert is left undelivered
+ALERT_MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", "5"))
+# POST delivery batches as JSON to this URL, in addition to logging them
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+ALERT_WEBHOOK_TIMEOUT = float(os.getenv("ALERT_WEBHOOK_TIMEOUT", "10"))
+
+# Receives a batch of alerts (PriceAlertRead dicts, JSON-ready); raising fails the whole batch
+AlertSink = Callable[[List[Dict[str, object]]], None]
+
+
+def log_sink(alerts: List[Dict[str, object]]) -> None:
+    for alert in alerts:
+        logger.info(
+            f"Price alert: {alert['title']} is {alert['price']} at {alert['store_name']} "
+            f"({alert['discount']}% off, rule {alert['rule_id']})"
+        )
+
+
+class WebhookSink:
+    """POSTs each batch as {"alerts": [...]}; any non-2xx response fails the batch."""
+
+    def __init__(self, url: str, timeout: float = ALERT_WEBHOOK_TIMEOUT) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, alerts: List[Dict[str, object]]) -> None:
+        resp = requests.post(self.url, json={"alerts": alerts}, timeout=self.timeout)
+        resp.raise_for_status()
+
+
+class AlertDelivery:
+    """
+    Delivers fired alerts to the registered sinks.
+
+    The queue is the price_alerts table itself: ingestion writes alerts in the transaction that
+    observed the price, and deliver_pending hands undelivered ones to every sink in id order,
+    marking them delivered only once all sinks accepted the batch. Delivery is at least once:
+    a failed batch is retried (sinks that already accepted it see it again) until its alerts
+    run out of attempts. Only the scheduler lease holder delivers, so processes don't race.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence[AlertSink] = (),
+        batch_size: int = ALERT_BATCH_SIZE,
+        max_attempts: int = ALERT_MAX_ATTEMPTS,
+    ) -> None:
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._sinks: List[AlertSink] = list(sinks)
+        self._counts = {"delivered": 0, "failed_batches": 0}
+        self._last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: AlertSink) -> None:
+        with self._lock:
+            self._sinks.append(sink)
+
+    def deliver_pending(self, db: Session) -> int:
+        """Delivers queued alerts batch by batch until none are left or a batch fails; returns how many."""
+        delivered = 0
+        while True:
+            alerts = crud.list_alerts(db, limit=self.batch_size, pending=True, max_attempts=self.max_attempts)
+            if not alerts:
+                return delivered
+            ids = [alert.id for alert in alerts]
+            payload = [alert.model_dump(mode="json") for alert in alerts]
+            with self._lock:
+                sinks = list(self._sinks)
+            try:
+                for sink in sinks:
+                    sink(payload)
+            except Exception as exc:
+                logger.warning(f"Delivering {len(ids)} price alerts failed: {exc}")
+                writer.writes.run(db, crud.record_alert_failures, ids)
+                with self._lock:
+                    self._counts["failed_batches"] += 1
+                    self._last_error = str(exc)
+                return delivered
+            writer.writes.run(db, crud.mark_alerts_delivered, ids, datetime.utcnow())
+            delivered += len(ids)
+            with self._lock:
+                self._counts["delivered"] += len(ids)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**self._counts, "sinks": len(self._sinks), "last_error": self._last_error}
+
+
+delivery = AlertDelivery([log_sink, WebhookSink(ALERT_WEBHOOK_URL)] if ALERT_WEBHOOK_URL else [log_sink])
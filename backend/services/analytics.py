@@ -0,0 +1,356 @@
+"""
+Price analytics over columnar price history, computed with NumPy.
+
+A game's snapshots are loaded once into parallel arrays (timestamp, store, price, list price)
+and kept in an LRU keyed by the game's version, which ingestion, compaction and retention
+bump. Prices are laid out as a store x day grid, with each store's price carried forward
+from its last snapshot until it was last seen, so the statistics don't depend on
+SNAPSHOT_WRITE_MODE. The watchlist view ranks games by how far their current best price
+sits below the median of their daily closes, computed for many games at once from the
+daily rollups.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .. import crud
+
+# Games whose snapshot arrays are kept in memory (least recently used are dropped)
+ANALYTICS_CACHE_GAMES = int(os.getenv("ANALYTICS_CACHE_GAMES", "256"))
+# A store price at least this many percent below its list price counts as a sale
+ANALYTICS_SALE_DISCOUNT = float(os.getenv("ANALYTICS_SALE_DISCOUNT", "10"))
+# Windows in days of the moving averages over the daily best price
+MOVING_AVERAGE_DAYS = (7, 30, 90)
+# Games per rollup query when the watchlist view loads daily closes
+ANALYTICS_LOAD_CHUNK = 500
+
+
+def _dollars(cents) -> Optional[float]:
+    if cents is None or np.isnan(cents):
+        return None
+    return round(float(cents) / 100, 2)
+
+
+def _percent(value) -> Optional[float]:
+    if value is None or np.isnan(value):
+        return None
+    return round(float(value), 1)
+
+
+def _rolling_mean(values, window: int):
+    """Trailing mean over `window` entries, skipping NaNs (NaN where a window holds no values)."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    window_counts = counts[end] - counts[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, (sums[end] - sums[start]) / window_counts, np.nan)
+
+
+def _group_stats(groups, values):
+    """(group ids, medians, minimums, counts) of `values` labelled by `groups`, without a per-group loop."""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    ids, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    medians = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+    return ids, medians, values[starts], counts
+
+
+class PriceHistory:
+    """A game's snapshots as parallel arrays, oldest first, and the store x day price grid built from them."""
+
+    def __init__(self, version: int, rows: Sequence[Tuple]) -> None:
+        self.version = version
+        timestamps, last_seen, store_ids, prices, list_prices = zip(*rows) if rows else ((), (), (), (), ())
+        self.timestamps = np.array(timestamps, dtype="datetime64[s]")
+        # A snapshot's price held until its last_seen_at, later than its timestamp in "changes" write mode
+        self.seen = np.array([seen or ts for ts, seen in zip(timestamps, last_seen)], dtype="datetime64[s]")
+        self.store_ids, self.store_index = np.unique(np.array(store_ids, dtype=np.int64), return_inverse=True)
+        self.prices = np.array(prices, dtype=np.int64)
+        # A missing list price counts as undiscounted
+        self.list_prices = np.array(
+            [list_price or price for price, list_price in zip(prices, list_prices)], dtype=np.int64
+        )
+        if len(self.prices):
+            self._build_grid()
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def _build_grid(self) -> None:
+        days = self.timestamps.astype("datetime64[D]")
+        seen_days = self.seen.astype("datetime64[D]")
+        self.first_day = days.min()
+        n_days = int((seen_days.max() - self.first_day).astype(np.int64)) + 1
+        n_stores = len(self.store_ids)
+        # The last snapshot of a (store, day) is that day's close; rows are in time order
+        cells = self.store_index * n_days + (days - self.first_day).astype(np.int64)
+        _, reversed_first = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - reversed_first
+        prices = np.full(n_stores * n_days, np.nan)
+        list_prices = np.full(n_stores * n_days, np.nan)
+        prices[cells[last]] = self.prices[last]
+        list_prices[cells[last]] = self.list_prices[last]
+        prices = prices.reshape(n_stores, n_days)
+        list_prices = list_prices.reshape(n_stores, n_days)
+        # Carry each store's price forward over days without a snapshot...
+        source = np.where(np.isnan(prices), 0, np.arange(n_days))
+        np.maximum.accumulate(source, axis=1, out=source)
+        rows = np.arange(n_stores)[:, None]
+        prices, list_prices = prices[rows, source], list_prices[rows, source]
+        # ...but not past the day the store's final price was last seen
+        last_seen = np.zeros(n_stores, dtype=np.int64)
+        np.maximum.at(last_seen, self.store_index, (seen_days - self.first_day).astype(np.int64))
+        gone = np.arange(n_days)[None, :] > last_seen[:, None]
+        prices[gone] = np.nan
+        list_prices[gone] = np.nan
+        self.grid = prices
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.discounts = np.where(list_prices > 0, (list_prices - prices) / list_prices * 100, 0.0)
+        self.discounts[np.isnan(prices)] = np.nan
+        # Lowest price across stores per day; NaN on days no store listed the game
+        self.daily_best = np.fmin.reduce(prices, axis=0)
+
+    def summary(self, today: date, series: bool = False) -> Dict[str, Any]:
+        """Statistics in cents/percent, with store ids; see game_analytics for the response shape."""
+        if not len(self):
+            return {"snapshots": 0, "stores": [], "moving_averages": {}, "series": [] if series else None}
+        # All-time low per store and when it was first reached
+        order = np.lexsort((self.timestamps, self.prices, self.store_index))
+        lows = order[np.unique(self.store_index[order], return_index=True)[1]]
+        observations = np.bincount(self.store_index, minlength=len(self.store_ids))
+        mean_prices = np.bincount(self.store_index, weights=self.prices) / observations
+
+        current = self.grid[:, -1]
+        listed = ~np.isnan(current)
+        best_now = current[listed].min() if listed.any() else np.nan
+        best_store = int(self.store_ids[np.flatnonzero(current == best_now)[0]]) if listed.any() else None
+        valid_days = ~np.isnan(self.daily_best)
+        percentile = np.nan
+        if listed.any() and valid_days.any():
+            percentile = np.count_nonzero(self.daily_best[valid_days] < best_now) / np.count_nonzero(valid_days) * 100
+
+        listed_cells = ~np.isnan(self.grid)
+        discounted = np.nan_to_num(self.discounts) > 0
+        sale_days = np.flatnonzero((np.nan_to_num(self.discounts) >= ANALYTICS_SALE_DISCOUNT).any(axis=0))
+        last_sale = (self.first_day + sale_days[-1]).item() if len(sale_days) else None
+
+        averages = {window: _rolling_mean(self.daily_best, window) for window in MOVING_AVERAGE_DAYS}
+        result: Dict[str, Any] = {
+            "snapshots": len(self),
+            "first_seen_at": self.timestamps[0].item(),
+            "last_seen_at": self.seen.max().item(),
+            "best_price": best_now,
+            "best_store_id": best_store,
+            "all_time_low": self.prices[lows].min(),
+            "all_time_low_at": self.timestamps[lows[np.argmin(self.prices[lows])]].item(),
+            "percentile": percentile,
+            "average_discount": self.discounts[discounted].mean() if discounted.any() else 0.0,
+            "discounted_share": np.count_nonzero(discounted) / np.count_nonzero(listed_cells) * 100,
+            "last_sale_on": last_sale,
+            "days_since_sale": (today - last_sale).days if last_sale else None,
+            "moving_averages": {str(window): values[-1] for window, values in averages.items()},
+            "stores": [
+                {
+                    "store_id": int(self.store_ids[index]),
+                    "current_price": current[index],
+                    "all_time_low": self.prices[low],
+                    "all_time_low_at": self.timestamps[low].item(),
+                    "average_price": mean_prices[index],
+                    "snapshots": int(observations[index]),
+                }
+                for index, low in enumerate(lows)
+            ],
+            "series": None,
+        }
+        if series:
+            days = self.first_day + np.arange(len(self.daily_best))
+            result["series"] = [
+                {
+                    "date": days[index].item(),
+                    "best_price": self.daily_best[index],
+                    **{f"ma_{window}": averages[window][index] for window in MOVING_AVERAGE_DAYS},
+                }
+                for index in range(len(days))
+            ]
+        return result
+
+
+class HistoryCache:
+    """LRU of PriceHistory per game; an entry is only used while its version matches the game's."""
+
+    def __init__(self, max_entries: int = ANALYTICS_CACHE_GAMES) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, PriceHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, db: Session, game_id: int, version: int) -> PriceHistory:
+        with self._lock:
+            history = self._entries.get(game_id)
+            if history is not None and history.version == version:
+                self._entries.move_to_end(game_id)
+                self._counters["hits"] += 1
+                return history
+            self._counters["misses"] += 1
+        history = PriceHistory(version, crud.get_snapshot_columns(db, game_id))
+        with self._lock:
+            self._entries[game_id] = history
+            self._entries.move_to_end(game_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return history
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counters,
+                "games": len(self._entries),
+                "snapshots": sum(len(history) for history in self._entries.values()),
+            }
+
+
+class CloseStatsCache:
+    """
+    Per-game (median, lowest, days) of daily closing best prices since a date, from the daily
+    rollups. Entries are keyed on the game's version and the window start, so after a refresh
+    only the games it touched are reloaded, in chunks, and their medians computed together.
+    """
+
+    def __init__(self, chunk_size: int = ANALYTICS_LOAD_CHUNK) -> None:
+        self.chunk_size = chunk_size
+        # game_id -> (version, since, median cents, lowest cents, days)
+        self._entries: Dict[int, Tuple[int, date, float, float, int]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get_many(self, db: Session, versions: Dict[int, int], since: date) -> Dict[int, Tuple[float, float, int]]:
+        with self._lock:
+            stale = [
+                game_id
+                for game_id, version in versions.items()
+                if self._entries.get(game_id, (None, None))[:2] != (version, since)
+            ]
+            self._counters["hits"] += len(versions) - len(stale)
+            self._counters["misses"] += len(stale)
+        loaded: Dict[int, Tuple[int, date, float, float, int]] = {}
+        for start in range(0, len(stale), self.chunk_size):
+            chunk = stale[start : start + self.chunk_size]
+            for game_id in chunk:
+                loaded[game_id] = (versions[game_id], since, np.nan, np.nan, 0)
+            rows = crud.get_daily_closes(db, chunk, since)
+            if not rows:
+                continue
+            groups = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            values = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+            for game_id, median, lowest, days in zip(*(array.tolist() for array in _group_stats(groups, values))):
+                loaded[game_id] = (versions[game_id], since, median, lowest, days)
+        with self._lock:
+            self._entries.update(loaded)
+            for game_id in set(self._entries) - set(versions):
+                del self._entries[game_id]
+            return {game_id: self._entries[game_id][2:] for game_id in versions}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "games": len(self._entries)}
+
+
+histories = HistoryCache()
+closes = CloseStatsCache()
+
+
+def game_analytics(db: Session, game_id: int, version: int, series: bool = False) -> Dict[str, Any]:
+    """GameAnalytics-shaped dict for one game, from its cached snapshot arrays."""
+    summary = histories.get(db, game_id, version).summary(datetime.utcnow().date(), series=series)
+    if not summary["snapshots"]:
+        return {"game_id": game_id, "snapshots": 0, "stores": [], "moving_averages": {}, "series": summary["series"]}
+    stores = summary["stores"]
+    names = crud.get_store_names(db, [store["store_id"] for store in stores])
+    return {
+        "game_id": game_id,
+        "snapshots": summary["snapshots"],
+        "first_seen_at": summary["first_seen_at"],
+        "last_seen_at": summary["last_seen_at"],
+        "best_price": _dollars(summary["best_price"]),
+        "best_store": names.get(summary["best_store_id"]),
+        "all_time_low": _dollars(summary["all_time_low"]),
+        "all_time_low_at": summary["all_time_low_at"],
+        "percentile": _percent(summary["percentile"]),
+        "average_discount": _percent(summary["average_discount"]),
+        "discounted_share": _percent(summary["discounted_share"]),
+        "last_sale_on": summary["last_sale_on"],
+        "days_since_sale": summary["days_since_sale"],
+        "moving_averages": {window: _dollars(value) for window, value in summary["moving_averages"].items()},
+        "stores": sorted(
+            (
+                {
+                    "store_name": names.get(store["store_id"], f"Store {store['store_id']}"),
+                    "current_price": _dollars(store["current_price"]),
+                    "all_time_low": _dollars(store["all_time_low"]),
+                    "all_time_low_at": store["all_time_low_at"],
+                    "average_price": _dollars(store["average_price"]),
+                    "snapshots": store["snapshots"],
+                }
+                for store in stores
+            ),
+            key=lambda store: store["store_name"],
+        ),
+        "series": (
+            [
+                {key: value if key == "date" else _dollars(value) for key, value in point.items()}
+                for point in summary["series"]
+            ]
+            if summary["series"] is not None
+            else None
+        ),
+    }
+
+
+def watchlist_discounts(db: Session, days: int = 90, limit: int = 20, min_days: int = 7) -> Dict[str, Any]:
+    """
+    Games whose current best price is furthest below the median of their daily closing best
+    prices over the last `days` days. Games with fewer than `min_days` days of closes are skipped.
+    """
+    games = crud.list_game_prices(db)
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    stats = closes.get_many(db, {game[0]: game[3] for game in games}, since)
+    if not games:
+        return {"days": days, "games": 0, "games_ranked": 0, "items": []}
+    best = np.array([np.nan if game[4] is None else game[4] * 100 for game in games])
+    medians = np.array([stats[game[0]][0] for game in games])
+    counts = np.array([stats[game[0]][2] for game in games])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        below = (medians - best) / medians * 100
+    eligible = np.flatnonzero(~np.isnan(best) & (counts >= min_days) & (medians > 0))
+    top = eligible[np.argsort(-below[eligible], kind="stable")[:limit]]
+    names = crud.get_store_names(db, [games[index][5] for index in top])
+    items: List[Dict[str, Any]] = []
+    for index in top.tolist():
+        game_id, api_game_id, title, _, best_price, best_store_id = games[index]
+        median, lowest, observed = stats[game_id]
+        items.append(
+            {
+                "game_id": game_id,
+                "api_game_id": api_game_id,
+                "title": title,
+                "best_price": best_price,
+                "best_store": names.get(best_store_id) if best_store_id is not None else None,
+                "median_price": _dollars(median),
+                "low_price": _dollars(lowest),
+                "below_median": _percent(below[index]),
+                "days": observed,
+            }
+        )
+    return {"days": days, "games": len(games), "games_ranked": len(eligible), "items": items}
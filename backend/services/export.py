@@ -0,0 +1,98 @@
+import csv
+import io
+import os
+from typing import Any, Iterable, Iterator, List, Tuple
+
+# Snapshot rows fetched from the server-side cursor per chunk (and per Parquet row group)
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+
+# Column order of crud.iter_snapshot_export rows
+SNAPSHOT_COLUMNS = (
+    "id",
+    "game_id",
+    "api_game_id",
+    "store",
+    "price",
+    "list_price",
+    "currency",
+    "timestamp",
+    "last_seen_at",
+)
+
+
+def csv_chunks(chunks: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    """Encodes row chunks as CSV with a header line, one encoded block per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SNAPSHOT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(
+            tuple(value.isoformat() if hasattr(value, "isoformat") else value for value in row) for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink that hands back whatever was written since the last take()."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def parquet_chunks(chunks: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    """
+    Encodes row chunks as one Parquet file, one row group per chunk. Each row group is sent as
+    soon as it is written; only the footer waits for the end.
+    """
+    # Loaded on the first Parquet export rather than at startup
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("game_id", pa.int64()),
+            ("api_game_id", pa.string()),
+            ("store", pa.string()),
+            ("price", pa.float64()),
+            ("list_price", pa.float64()),
+            ("currency", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("last_seen_at", pa.timestamp("us")),
+        ]
+    )
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for rows in chunks:
+            if not rows:
+                continue
+            arrays = [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
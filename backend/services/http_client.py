@@ -0,0 +1,383 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Connection pool size per upstream host (keep-alive connections reused across requests)
+POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "10"))
+# Retries on 429/5xx and connection errors, with jittered exponential backoff
+MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "10"))
+# Circuit breaker: open after this many consecutive failures, probe again after the reset timeout
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+DEFAULT_TIMEOUT = 10
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without contacting upstream while a host's circuit breaker is open."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket; `rate` tokens are added per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available and returns 0, otherwise returns the seconds until one is."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire_async(self) -> float:
+        """Like acquire, but waits on the event loop instead of sleeping the thread."""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def acquire(self) -> float:
+        """Blocks until a token is available and returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe after the reset timeout."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """Ends a half-open probe that raised before recording an outcome, so another can run."""
+        with self._lock:
+            self._probing = False
+
+
+class HostStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.rate_limit_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, error: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "latency_avg_ms": round(self.latency_total / self.requests * 1000, 2) if self.requests else 0.0,
+                "latency_max_ms": round(self.latency_max * 1000, 2),
+                "rate_limit_wait_s": round(self.rate_limit_wait, 3),
+            }
+
+
+class _Host:
+    def __init__(self, rate: Optional[float], burst: float) -> None:
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        self.stats = HostStats()
+        # httpx.AsyncClient for the async request path, created on first use (see UpstreamClient.get_async)
+        self.async_session = None
+
+
+class UpstreamClient:
+    """
+    Shared HTTP client for upstream services.
+
+    Keeps one pooled keep-alive session per host, applies the host's token-bucket rate limit,
+    retries 429/5xx and connection errors with jittered exponential backoff, and fails fast
+    with CircuitOpenError while the host's breaker is open.
+    """
+
+    def __init__(self, max_retries: int = MAX_RETRIES) -> None:
+        self.max_retries = max_retries
+        self._hosts: Dict[str, _Host] = {}
+        self._limits: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def configure_host(self, host: str, rate: Optional[float] = None, burst: float = 1) -> None:
+        """Sets the rate limit (requests/second, None for unlimited) and burst size for a host."""
+        with self._lock:
+            self._limits[host] = (rate, burst)
+            existing = self._hosts.get(host)
+            if existing is not None:
+                existing.bucket = TokenBucket(rate, burst) if rate else None
+
+    def _host(self, host: str) -> _Host:
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None:
+                rate, burst = self._limits.get(host, (None, 1))
+                entry = self._hosts[host] = _Host(rate, burst)
+            return entry
+
+    def _backoff(self, attempt: int, resp: Optional[requests.Response] = None) -> float:
+        if resp is not None and resp.headers.get("Retry-After", "").isdigit():
+            return min(float(resp.headers["Retry-After"]), BACKOFF_MAX)
+        # Full jitter: uniform over [0, base * 2^attempt]
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt)))
+
+    def get(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> requests.Response:
+        """
+        Performs a GET and returns the final response (callers still call raise_for_status).
+        Raises requests.RequestException on connection errors once retries are exhausted.
+        """
+        host_name = urlsplit(url).netloc
+        host = self._host(host_name)
+        if not host.breaker.allow():
+            host.stats.incr("rejected")
+            raise CircuitOpenError(f"Circuit open for {host_name}")
+
+        try:
+            return self._get(host, url, params, headers, timeout)
+        except BaseException:
+            host.breaker.release_probe()
+            raise
+
+    def _get(self, host: _Host, url: str, params: Optional[dict], headers: Optional[dict], timeout: float):
+        attempt = 0
+        while True:
+            if host.bucket is not None:
+                host.stats.incr("rate_limit_wait", host.bucket.acquire())
+            started = time.monotonic()
+            try:
+                resp = host.session.get(url, params=params, headers=headers, timeout=timeout)
+            except requests.RequestException:
+                host.stats.record(time.monotonic() - started, error=True)
+                if attempt >= self.max_retries:
+                    host.breaker.record_failure()
+                    raise
+            else:
+                failed = resp.status_code in RETRY_STATUSES
+                host.stats.record(time.monotonic() - started, error=failed)
+                if resp.status_code == 429:
+                    host.stats.incr("throttled")
+                if not failed:
+                    host.breaker.record_success()
+                    return resp
+                if attempt >= self.max_retries:
+                    host.breaker.record_failure()
+                    return resp
+                delay = self._backoff(attempt, resp)
+                resp.close()
+                host.stats.incr("retries")
+                logger.debug("Retrying %s after HTTP %s in %.2fs", url, resp.status_code, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            host.stats.incr("retries")
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def get_async(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+        Async twin of get, on a pooled httpx.AsyncClient per host. Shares the host's rate limit,
+        breaker and stats with the sync path. Returns an httpx.Response (check it with
+        raise_for_status below); connection errors are raised as requests.ConnectionError so
+        callers handle both paths alike.
+        """
+        import httpx
+
+        host_name = urlsplit(url).netloc
+        host = self._host(host_name)
+        if not host.breaker.allow():
+            host.stats.incr("rejected")
+            raise CircuitOpenError(f"Circuit open for {host_name}")
+        if host.async_session is None:
+            limits = httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+            host.async_session = httpx.AsyncClient(limits=limits)
+        try:
+            return await self._get_async(host, url, params, headers, timeout)
+        except BaseException:
+            host.breaker.release_probe()
+            raise
+
+    async def _get_async(self, host: _Host, url: str, params: Optional[dict], headers: Optional[dict], timeout: float):
+        import httpx
+
+        attempt = 0
+        while True:
+            if host.bucket is not None:
+                host.stats.incr("rate_limit_wait", await host.bucket.acquire_async())
+            started = time.monotonic()
+            try:
+                # Requests wait for a pooled connection as long as they need; the rate limit bounds the queue
+                resp = await host.async_session.get(
+                    url, params=params, headers=headers, timeout=httpx.Timeout(timeout, pool=None)
+                )
+            except httpx.HTTPError as exc:
+                host.stats.record(time.monotonic() - started, error=True)
+                if attempt >= self.max_retries:
+                    host.breaker.record_failure()
+                    raise requests.ConnectionError(str(exc) or type(exc).__name__) from exc
+            else:
+                failed = resp.status_code in RETRY_STATUSES
+                host.stats.record(time.monotonic() - started, error=failed)
+                if resp.status_code == 429:
+                    host.stats.incr("throttled")
+                if not failed:
+                    host.breaker.record_success()
+                    return resp
+                if attempt >= self.max_retries:
+                    host.breaker.record_failure()
+                    return resp
+                delay = self._backoff(attempt, resp)
+                host.stats.incr("retries")
+                logger.debug("Retrying %s after HTTP %s in %.2fs", url, resp.status_code, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            host.stats.incr("retries")
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def aclose(self) -> None:
+        with self._lock:
+            hosts = list(self._hosts.values())
+        for host in hosts:
+            if host.async_session is not None:
+                await host.async_session.aclose()
+                host.async_session = None
+
+    def host_stats(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            name: {**entry.stats.as_dict(), "circuit": entry.breaker.state} for name, entry in hosts.items()
+        }
+
+
+client = UpstreamClient()
+
+
+def get(
+    url: str, params: Optional[dict] = None, headers: Optional[dict] = None, timeout: float = DEFAULT_TIMEOUT
+) -> requests.Response:
+    return client.get(url, params=params, headers=headers, timeout=timeout)
+
+
+def configure_host(host: str, rate: Optional[float] = None, burst: float = 1) -> None:
+    client.configure_host(host, rate=rate, burst=burst)
+
+
+def host_stats() -> Dict[str, Dict[str, object]]:
+    return client.host_stats()
+
+
+async def get_async(
+    url: str, params: Optional[dict] = None, headers: Optional[dict] = None, timeout: float = DEFAULT_TIMEOUT
+):
+    return await client.get_async(url, params=params, headers=headers, timeout=timeout)
+
+
+def raise_for_status(resp) -> None:
+    """raise_for_status for responses from either path, raising requests.HTTPError for 4xx/5xx."""
+    if resp.status_code >= 400:
+        raise requests.HTTPError(f"{resp.status_code} error for url: {resp.url}")
@@ -0,0 +1,81 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Dict, Optional
+
+from .. import crud
+from ..database import SessionLocal
+from . import writer
+
+logger = logging.getLogger(__name__)
+
+# A lease not renewed for this many seconds is free for another process to take
+SCHEDULER_LEASE_TTL = float(os.getenv("SCHEDULER_LEASE_TTL", "30"))
+# How often the holder renews and the others try to take over
+SCHEDULER_LEASE_RENEW = float(os.getenv("SCHEDULER_LEASE_RENEW", str(SCHEDULER_LEASE_TTL / 3)))
+
+
+class LeaderLease:
+    """
+    Keeps trying to hold a named DB lease (see crud.acquire_lease) from a daemon thread.
+
+    Every process running the same job competes for the same lease; the one holding it renews it
+    every `renew` seconds. If the holder dies or loses the database, its lease expires after
+    `ttl` seconds and the next process to try takes over.
+    """
+
+    def __init__(self, name: str, ttl: float = SCHEDULER_LEASE_TTL, renew: float = SCHEDULER_LEASE_RENEW) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.renew = min(renew, ttl / 2)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"lease-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stops renewing and releases the lease so another process can take over right away."""
+        self._stopped.set()
+        if self._held.is_set():
+            self._held.clear()
+            db = SessionLocal()
+            try:
+                writer.writes.run(db, crud.release_lease, self.name, self.holder)
+            finally:
+                db.close()
+
+    def is_held(self) -> bool:
+        return self._held.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until this process holds the lease (or the timeout passes) and returns whether it does."""
+        return self._held.wait(timeout)
+
+    def status(self) -> Dict[str, object]:
+        return {"name": self.name, "holder": self.holder, "leader": self.is_held()}
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            db = SessionLocal()
+            try:
+                held = writer.writes.run(db, crud.acquire_lease, self.name, self.holder, self.ttl)
+            except Exception as exc:
+                # Without the database we can't prove we still hold it
+                held = False
+                logger.warning(f"Could not renew lease {self.name}: {exc}")
+            finally:
+                db.close()
+            if held and not self._held.is_set():
+                logger.info(f"Acquired lease {self.name} as {self.holder}")
+                self._held.set()
+            elif not held and self._held.is_set():
+                logger.warning(f"Lost lease {self.name}; pausing jobs until it is reacquired")
+                self._held.clear()
+            self._stopped.wait(self.renew)
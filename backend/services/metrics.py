@@ -0,0 +1,313 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format at /api/metrics.
+
+Counters, gauges and histograms are plain thread-safe objects registered on `registry`;
+components that already keep their own counters (upstream hosts, the writer queue, caches)
+are exported by collector callbacks evaluated at scrape time instead of being double-counted.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import event
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = tuple(
+    float(bound)
+    for bound in os.getenv("METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(",")
+)
+# Buckets for queries issued per request
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+LabelValues = Tuple[str, ...]
+# (labels, value) samples produced by a collector at scrape time
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labels, key)))} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, +Inf included, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+        lines = []
+        for key, (counts, total) in values.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        # (name, type, help, collect) for metrics read from other components at scrape time
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))  # type: ignore[return-value]
+
+    def collector(self, name: str, kind: str, help: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Registers a metric family whose samples are produced by collect() on every scrape."""
+        with self._lock:
+            self._collectors.append((name, kind, help, collect))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, kind, help, collect in collectors:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in collect():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template, until the last body byte",
+    ["method", "route", "status"],
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries", "Database queries issued per request", ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Time spent in database queries per request", ["route"]
+)
+db_query_duration = registry.histogram("db_query_duration_seconds", "Database query latency", ["engine"])
+upstream_call_duration = registry.histogram(
+    "upstream_call_duration_seconds", "Upstream call latency including retries and rate-limit waits", ["host", "client"]
+)
+upstream_call_errors = registry.counter("upstream_call_errors_total", "Upstream calls that failed", ["host", "client"])
+refresh_duration = registry.histogram(
+    "refresh_duration_seconds", "Price refresh run duration", buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+refresh_games = registry.counter("refresh_games_total", "Games refreshed, by outcome", ["outcome"])
+refresh_snapshots = registry.counter("refresh_snapshots_inserted_total", "Price snapshots written by refreshes")
+refresh_games_per_second = registry.gauge("refresh_games_per_second", "Throughput of the last price refresh run")
+refresh_last_success = registry.gauge(
+    "refresh_last_success_timestamp_seconds", "Unix time of the last refresh run that refreshed at least one game"
+)
+
+
+# Query count and time of the request being served; reset by MetricsMiddleware for every request
+_request_db: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("request_db", default=None)
+
+
+def instrument_engine(engine, name: str = "sync") -> None:
+    """
+    Times every query on `engine` (a sync Engine, or an AsyncEngine's sync_engine). The start time
+    lives on the statement's execution context, so a query that raises (no after_cursor_execute)
+    leaves nothing behind to skew the next one.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        db_query_duration.observe(elapsed, engine=name)
+        totals = _request_db.get()
+        if totals is not None:
+            totals[0] += 1
+            totals[1] += elapsed
+
+
+@contextmanager
+def upstream_call(url: str, client: str) -> Iterator[None]:
+    """Times one upstream call for `client` ("cheapshark", "steam") and counts it as an error if it raises."""
+    host = urlsplit(url).netloc
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        upstream_call_errors.inc(host=host, client=client)
+        raise
+    finally:
+        upstream_call_duration.observe(time.perf_counter() - started, host=host, client=client)
+
+
+def record_refresh(duration: float, processed: int, failed: int, inserted: int, games_per_second: float) -> None:
+    refresh_duration.observe(duration)
+    refresh_games.inc(processed, outcome="processed")
+    refresh_games.inc(failed, outcome="failed")
+    refresh_snapshots.inc(inserted)
+    refresh_games_per_second.set(games_per_second)
+    if processed:
+        refresh_last_success.set(time.time())
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Newer FastAPI keeps an included router's route unprefixed and records the full path separately
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(effective, "path", None) or route.path
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing request latency by route template (not raw path, so ids don't
+    create series) and the queries each request ran. Timing ends with the last body chunk, so
+    streamed responses are measured in full.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        totals = [0, 0.0]
+        token = _request_db.set(totals)
+        status = [500]
+
+        def observe() -> None:
+            template = _route_template(scope)
+            http_request_duration.observe(
+                time.perf_counter() - started, method=scope["method"], route=template, status=str(status[0])
+            )
+            http_request_db_queries.observe(totals[0], route=template)
+            http_request_db_duration.observe(totals[1], route=template)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+                status[0] = 0
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Responses that ended without a final body message (errors, disconnects)
+            if status[0]:
+                observe()
+            _request_db.reset(token)
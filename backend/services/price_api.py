@@ -1,10 +1,30 @@
-from typing import Dict, List, Optional, Tuple
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
 
 import requests
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from .. import crud
+from . import http_client, metrics, store_cache, writer
 
-CHEAPSHARK_BASE = "https://www.cheapshark.com/api/1.0"
-_STORE_MAP: Optional[Dict[str, str]] = None
+logger = logging.getLogger(__name__)
+
+CHEAPSHARK_BASE = os.getenv("CHEAPSHARK_BASE", "https://www.cheapshark.com/api/1.0")
+# CheapShark's multiple game lookup accepts at most 25 ids per request
+MAX_IDS_PER_REQUEST = 25
+# The stores table is re-synced from CheapShark's store list once it is older than this (seconds)
+STORE_SYNC_TTL = float(os.getenv("STORE_SYNC_TTL", str(24 * 3600)))
+
+# CheapShark throttles aggressive clients; stay under its limit instead of hitting 429s
+http_client.configure_host(
+    urlsplit(CHEAPSHARK_BASE).netloc,
+    rate=float(os.getenv("CHEAPSHARK_RATE_LIMIT", "4")),
+    burst=float(os.getenv("CHEAPSHARK_BURST", "8")),
+)
 
 
 class CheapSharkError(Exception):
@@ -13,15 +33,33 @@ class CheapSharkError(Exception):
 
 def _get(url: str, params: Optional[dict] = None) -> dict | List[dict]:
     try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        return resp.json()
+        with metrics.upstream_call(url, "cheapshark"):
+            resp = http_client.get(url, params=params, timeout=10)
+            resp.raise_for_status()
+            return resp.json()
     except requests.RequestException as exc:  # pragma: no cover - network failures not under test
         raise CheapSharkError(str(exc)) from exc
 
 
+async def _get_async(url: str, params: Optional[dict] = None) -> dict | List[dict]:
+    try:
+        with metrics.upstream_call(url, "cheapshark"):
+            resp = await http_client.get_async(url, params=params, timeout=10)
+            http_client.raise_for_status(resp)
+            return resp.json()
+    except (requests.RequestException, ValueError) as exc:  # pragma: no cover - network failures not under test
+        raise CheapSharkError(str(exc)) from exc
+
+
 def search_games(query: str) -> List[Dict[str, Optional[str]]]:
-    data = _get(f"{CHEAPSHARK_BASE}/games", params={"title": query})
+    return _search_results(_get(f"{CHEAPSHARK_BASE}/games", params={"title": query}))
+
+
+async def search_games_async(query: str) -> List[Dict[str, Optional[str]]]:
+    return _search_results(await _get_async(f"{CHEAPSHARK_BASE}/games", params={"title": query}))
+
+
+def _search_results(data: List[dict]) -> List[Dict[str, Optional[str]]]:
     results: List[Dict[str, Optional[str]]] = []
     for item in data:
         results.append(
@@ -40,33 +78,82 @@ def get_game_details(api_game_id: str) -> Dict:
     return data
 
 
-def get_store_map(force_refresh: bool = False) -> Dict[str, str]:
-    global _STORE_MAP
-    if (_STORE_MAP is not None and _STORE_MAP) and not force_refresh:
-        return _STORE_MAP
+async def get_game_details_async(api_game_id: str) -> Dict:
+    return await _get_async(f"{CHEAPSHARK_BASE}/games", params={"id": api_game_id})  # type: ignore
+
+
+def get_games_details(api_game_ids: Sequence[str]) -> Dict[str, Dict]:
+    """
+    Looks up many games in one request using CheapShark's multiple game lookup.
+    Returns a dict keyed by api_game_id; each value has the same shape as get_game_details.
+    """
+    if not api_game_ids:
+        return {}
+    if len(api_game_ids) > MAX_IDS_PER_REQUEST:
+        raise ValueError(f"At most {MAX_IDS_PER_REQUEST} ids can be looked up per request")
+    data = _get(f"{CHEAPSHARK_BASE}/games", params={"ids": ",".join(api_game_ids)})
+    if not isinstance(data, dict):
+        return {}
+    return {str(api_id): details for api_id, details in data.items() if isinstance(details, dict)}
+
+
+def get_store_map() -> Dict[str, str]:
+    """Fetches CheapShark's store list as {store_id: store_name}."""
+    return _store_map(_get(f"{CHEAPSHARK_BASE}/stores"))
+
+
+async def get_store_map_async() -> Dict[str, str]:
+    return _store_map(await _get_async(f"{CHEAPSHARK_BASE}/stores"))
+
+
+def _store_map(data: List[dict]) -> Dict[str, str]:
+    return {str(store["storeID"]): store.get("storeName") or f"Store {store['storeID']}" for store in data}
+
+
+def sync_stores(db: Session, force_refresh: bool = False) -> bool:
+    """
+    Syncs the stores table from CheapShark when the last sync is older than STORE_SYNC_TTL (or a
+    new store id was seen since). Returns whether a sync happened; failures keep the current names.
+    """
+    if not _store_sync_due(db, force_refresh):
+        return False
     try:
-        data = _get(f"{CHEAPSHARK_BASE}/stores")
-        _STORE_MAP = {str(store["storeID"]): store.get("storeName", f"Store {store['storeID']}") for store in data}
-    except CheapSharkError:
-        # If store list fails, keep any existing cache or fallback to empty
-        _STORE_MAP = _STORE_MAP or {}
-    return _STORE_MAP or {}
+        store_map = get_store_map()
+    except CheapSharkError as exc:
+        logger.warning(f"Store list unavailable, keeping current store names: {exc}")
+        return False
+    writer.writes.run(db, crud.sync_stores, store_map)
+    return True
+
+
+async def sync_stores_async(db: AsyncSession, force_refresh: bool = False) -> bool:
+    """sync_stores for the async request path."""
+    if not await db.run_sync(_store_sync_due, force_refresh):
+        return False
+    try:
+        store_map = await get_store_map_async()
+    except CheapSharkError as exc:
+        logger.warning(f"Store list unavailable, keeping current store names: {exc}")
+        return False
+    await writer.writes.run_async(db, crud.sync_stores, store_map)
+    return True
 
 
-def _resolve_store_name(deal: Dict) -> str:
-    if deal.get("storeName"):
-        return deal["storeName"]
-    store_id = str(deal.get("storeID", "") or "")
-    if not store_id:
-        return "Unknown store"
-    store_map = get_store_map()
-    return store_map.get(store_id, f"Store {store_id}")
+def _store_sync_due(db: Session, force_refresh: bool) -> bool:
+    cache = store_cache.stores
+    if not cache.loaded:
+        cache.load(db)
+    return (
+        force_refresh
+        or cache.synced_at is None
+        or datetime.utcnow() - cache.synced_at >= timedelta(seconds=STORE_SYNC_TTL)
+    )
 
 
 def extract_snapshot_rows(game_details: Dict) -> Tuple[str, Optional[str], List[Tuple[str, float, Optional[float], str]]]:
     """
     Returns tuple of (title, cover_image_url, snapshots)
-    snapshots is list of (store_name, price, list_price, currency)
+    snapshots is list of (cheapshark_store_id, price, list_price, currency); deals without a store id are skipped
     """
     info = game_details.get("info", {})
     title = info.get("title") or ""
@@ -74,8 +161,16 @@ def extract_snapshot_rows(game_details: Dict) -> Tuple[str, Optional[str], List[
     deals = game_details.get("deals", [])
     snapshots: List[Tuple[str, float, Optional[float], str]] = []
     for deal in deals:
-        store_name = _resolve_store_name(deal)
+        store_id = str(deal.get("storeID", "") or "")
+        if not store_id:
+            continue
         price = float(deal.get("price", 0))
         list_price = float(deal["retailPrice"]) if deal.get("retailPrice") else None
-        snapshots.append((store_name, price, list_price, "USD"))
+        snapshots.append((store_id, price, list_price, "USD"))
     return title, thumb, snapshots
+
+
+def steam_store_url(game_details: Dict) -> Optional[str]:
+    """The Steam store page for a game lookup result, if CheapShark knows its Steam app id."""
+    steam_app_id = game_details.get("info", {}).get("steamAppID") if isinstance(game_details, dict) else None
+    return f"https://store.steampowered.com/app/{steam_app_id}" if steam_app_id else None
@@ -0,0 +1,127 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from .. import crud, models, schemas
+from . import metrics, price_api, writer
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of CheapShark lookups in flight at once
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "4"))
+# Number of games fetched per multiple game lookup
+REFRESH_BATCH_SIZE = min(int(os.getenv("REFRESH_BATCH_SIZE", "25")), price_api.MAX_IDS_PER_REQUEST)
+# Snapshot rows buffered before they are written in one transaction
+REFRESH_FLUSH_ROWS = int(os.getenv("REFRESH_FLUSH_ROWS", "5000"))
+
+K = TypeVar("K")
+
+
+def _chunks(items: Sequence[Tuple[K, str]], size: int) -> List[Sequence[Tuple[K, str]]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def lookup_batches(
+    targets: Sequence[Tuple[K, str]],
+    concurrency: int = REFRESH_CONCURRENCY,
+    batch_size: int = REFRESH_BATCH_SIZE,
+    thread_name_prefix: str = "price-lookup",
+) -> Iterator[Tuple[Sequence[Tuple[K, str]], Dict[str, Dict], Optional[price_api.CheapSharkError]]]:
+    """
+    Looks up (key, api_game_id) targets with CheapShark's multiple game lookup, `batch_size` ids
+    per request and up to `concurrency` requests in flight. Yields (batch, details by api id,
+    error) in completion order, on the calling thread; a failed batch has no details and its error.
+    """
+    batches = _chunks(targets, max(1, batch_size))
+    if not batches:
+        return
+    workers = max(1, min(concurrency, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix) as pool:
+        futures = {
+            pool.submit(price_api.get_games_details, [api_id for _, api_id in batch]): batch for batch in batches
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except price_api.CheapSharkError as exc:
+                yield futures[future], {}, exc
+
+
+def refresh_games(
+    db: Session,
+    games: Optional[List[models.Game]] = None,
+    concurrency: int = REFRESH_CONCURRENCY,
+    batch_size: int = REFRESH_BATCH_SIZE,
+    processed: Optional[Set[int]] = None,
+) -> schemas.RefreshSummary:
+    """
+    Fetches current prices for the given games (default: the whole watchlist) and stores snapshots.
+
+    Games are looked up in batches with CheapShark's multiple game lookup, with up to
+    `concurrency` batches in flight. Results are buffered as each batch arrives and written
+    from the calling thread with crud.bulk_insert_snapshots every `REFRESH_FLUSH_ROWS` rows,
+    so the session is never shared across threads. Ids of games that got prices are added to
+    `processed` when given.
+    """
+    started = time.monotonic()
+    if games is None:
+        games = crud.list_games(db)
+    # Only plain values cross into the worker threads
+    targets = [(game.id, game.api_game_id) for game in games]
+
+    games_processed = 0
+    games_failed = 0
+    snapshots_inserted = 0
+    upstream_requests = 0
+    pending: List[crud.SnapshotRow] = []
+
+    def flush() -> int:
+        written = writer.writes.run(db, crud.bulk_insert_snapshots, pending)
+        pending.clear()
+        return written
+
+    for batch, details_by_id, error in lookup_batches(targets, concurrency, batch_size, "price-refresh"):
+        upstream_requests += 1
+        if error is not None:
+            games_failed += len(batch)
+            logger.error(f"Failed to refresh batch of {len(batch)} games: {error}")
+            continue
+
+        for game_id, api_game_id in batch:
+            details = details_by_id.get(api_game_id)
+            if not details:
+                games_failed += 1
+                logger.warning(f"No CheapShark data returned for game {game_id} ({api_game_id})")
+                continue
+            try:
+                _, _, snapshots = price_api.extract_snapshot_rows(details)
+            except Exception as exc:
+                games_failed += 1
+                logger.exception(f"Unexpected error refreshing game {game_id}: {exc}")
+                continue
+            pending.extend((game_id, *snap) for snap in snapshots)
+            games_processed += 1
+            if processed is not None:
+                processed.add(game_id)
+
+        if len(pending) >= REFRESH_FLUSH_ROWS:
+            snapshots_inserted += flush()
+
+    if pending:
+        snapshots_inserted += flush()
+
+    duration = time.monotonic() - started
+    games_per_second = round(games_processed / duration, 2) if duration > 0 else 0.0
+    metrics.record_refresh(duration, games_processed, games_failed, snapshots_inserted, games_per_second)
+    return schemas.RefreshSummary(
+        games_processed=games_processed,
+        snapshots_inserted=snapshots_inserted,
+        games_failed=games_failed,
+        upstream_requests=upstream_requests,
+        duration_seconds=round(duration, 3),
+        games_per_second=games_per_second,
+    )
@@ -0,0 +1,89 @@
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import crud, models, schemas
+from . import refresh, writer
+
+logger = logging.getLogger(__name__)
+
+# Interval for games without history yet, and the cap for games currently on sale (seconds)
+REFRESH_BASE_INTERVAL = int(os.getenv("REFRESH_BASE_INTERVAL", "3600"))
+# Bounds for the per-game interval
+REFRESH_MIN_INTERVAL = int(os.getenv("REFRESH_MIN_INTERVAL", "900"))
+REFRESH_MAX_INTERVAL = int(os.getenv("REFRESH_MAX_INTERVAL", str(7 * 24 * 3600)))
+# A price change multiplies the interval by SHRINK, an unchanged refresh by GROW
+REFRESH_SHRINK = float(os.getenv("REFRESH_SHRINK", "0.5"))
+REFRESH_GROW = float(os.getenv("REFRESH_GROW", "1.5"))
+# Next-due times are spread by +/- this fraction of the interval
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "0.1"))
+# Upstream lookups allowed per scheduler tick; each covers up to REFRESH_BATCH_SIZE games
+REFRESH_REQUEST_BUDGET = int(os.getenv("REFRESH_REQUEST_BUDGET", "20"))
+
+
+def next_interval(interval: Optional[int], changed: bool, on_sale: bool) -> int:
+    """Shrinks the interval after a price change, grows it after an unchanged refresh."""
+    current = interval or REFRESH_BASE_INTERVAL
+    interval = current * (REFRESH_SHRINK if changed else REFRESH_GROW)
+    if on_sale:
+        # Sales end on their own schedule; don't let a discounted game drift out of view
+        interval = min(interval, REFRESH_BASE_INTERVAL)
+    return int(max(REFRESH_MIN_INTERVAL, min(REFRESH_MAX_INTERVAL, interval)))
+
+
+def _jittered(now: datetime, interval: int) -> datetime:
+    return now + timedelta(seconds=interval * random.uniform(1 - REFRESH_JITTER, 1 + REFRESH_JITTER))
+
+
+def refresh_and_reschedule(
+    db: Session, games: List[models.Game], batch_size: int = refresh.REFRESH_BATCH_SIZE
+) -> schemas.RefreshSummary:
+    """
+    Refreshes the given games and gives each a new interval and next-due time.
+
+    A game counts as changed when any of its (store, price, list price) current prices differ
+    after the refresh. Games that could not be refreshed keep their interval and are retried
+    after at most REFRESH_MIN_INTERVAL.
+    """
+    intervals = {game.id: game.refresh_interval for game in games}
+    before = crud.get_price_fingerprints(db, intervals)
+    processed: Set[int] = set()
+    summary = refresh.refresh_games(db, games, batch_size=batch_size, processed=processed)
+    after = crud.get_price_fingerprints(db, intervals)
+
+    now = datetime.utcnow()
+    schedule: List[Tuple[int, int, datetime]] = []
+    changed = 0
+    for game_id, interval in intervals.items():
+        if game_id not in processed:
+            interval = interval or REFRESH_BASE_INTERVAL
+            schedule.append((game_id, interval, _jittered(now, min(interval, REFRESH_MIN_INTERVAL))))
+            continue
+        prices, previous = after.get(game_id, frozenset()), before.get(game_id)
+        # A game's first prices are not a change
+        is_changed = bool(previous) and prices != previous
+        on_sale = any(list_price is not None and price < list_price for _, price, list_price in prices)
+        interval = next_interval(interval, is_changed, on_sale)
+        schedule.append((game_id, interval, _jittered(now, interval)))
+        changed += is_changed
+    writer.writes.run(db, crud.schedule_refreshes, schedule)
+    logger.debug(f"Rescheduled {len(schedule)} games, {changed} with price changes")
+    return summary
+
+
+def refresh_due_games(
+    db: Session,
+    budget: int = REFRESH_REQUEST_BUDGET,
+    batch_size: int = refresh.REFRESH_BATCH_SIZE,
+    now: Optional[datetime] = None,
+) -> schemas.RefreshSummary:
+    """Refreshes the most overdue games that fit in `budget` upstream lookups."""
+    limit = max(1, budget) * max(1, batch_size)
+    games = crud.list_due_games(db, now or datetime.utcnow(), limit)
+    if not games:
+        return schemas.RefreshSummary(games_processed=0, snapshots_inserted=0)
+    return refresh_and_reschedule(db, games, batch_size=batch_size)
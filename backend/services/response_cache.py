@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+# Serialized responses kept per (path + query); each entry is only served for its exact ETag
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+
+def make_etag(*parts: object) -> str:
+    """Strong ETag over the data versions (and request parameters) a response was built from."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+class ResponseCache:
+    """Bounded LRU of serialized JSON bodies keyed by request URL and stamped with their ETag."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"not_modified": 0, "hits": 0, "misses": 0}
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
+
+    def respond(self, request: Request, etag: str, build: Callable[[], bytes]) -> Response:
+        """
+        304 if the client already has `etag`, else the cached body for this URL and ETag, else
+        the JSON body returned by build(), which is cached for the next request.
+        """
+        if _matches(request, etag):
+            self.count("not_modified")
+            return _response(etag, status_code=304)
+        key = str(request.url)
+        body = self.get(key, etag)
+        if body is None:
+            body = build()
+            self.put(key, etag, body)
+        return _response(etag, body)
+
+    async def respond_async(self, request: Request, etag: str, build: Callable[[], Awaitable[bytes]]) -> Response:
+        """respond for async handlers; build is awaited on a miss."""
+        if _matches(request, etag):
+            self.count("not_modified")
+            return _response(etag, status_code=304)
+        key = str(request.url)
+        body = self.get(key, etag)
+        if body is None:
+            body = await build()
+            self.put(key, etag, body)
+        return _response(etag, body)
+
+
+def _response(etag: str, body: bytes = b"", status_code: int = 200) -> Response:
+    # no-cache: clients may store the response but must revalidate it with If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if status_code == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+responses = ResponseCache()
@@ -0,0 +1,209 @@
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, delete, func, text, update
+from sqlalchemy.orm import Session
+
+from .. import crud, models, schemas
+
+logger = logging.getLogger(__name__)
+
+# Raw snapshots are kept for this many days, then downsampled to one row per store per day
+RETENTION_RAW_DAYS = int(os.getenv("RETENTION_RAW_DAYS", "30"))
+# Snapshots and rollups older than this are deleted
+RETENTION_HORIZON_DAYS = int(os.getenv("RETENTION_HORIZON_DAYS", "730"))
+# Upper bound on rows touched per transaction, so the job never holds the write lock for long
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "1000"))
+# Games examined per downsampling transaction
+RETENTION_GAME_CHUNK = int(os.getenv("RETENTION_GAME_CHUNK", "200"))
+# VACUUM (SQLite) once free pages exceed this fraction of the file; ANALYZE once this fraction of rows went away
+RETENTION_VACUUM_THRESHOLD = float(os.getenv("RETENTION_VACUUM_THRESHOLD", "0.25"))
+RETENTION_ANALYZE_THRESHOLD = float(os.getenv("RETENTION_ANALYZE_THRESHOLD", "0.10"))
+
+# Days before this date have already been downsampled by this process; lets each run only
+# look at the day(s) that aged past the raw window since the previous run
+_downsampled_until: Optional[date] = None
+
+
+def _game_chunks(db: Session) -> List[List[int]]:
+    game_ids = [game_id for (game_id,) in db.query(models.Game.id).order_by(models.Game.id)]
+    return [game_ids[i : i + RETENTION_GAME_CHUNK] for i in range(0, len(game_ids), RETENTION_GAME_CHUNK)]
+
+
+def downsample_snapshots(db: Session, before: date, since: Optional[date] = None) -> int:
+    """
+    Keeps only the last snapshot per (game, store, day) for days in [since, before), extending
+    the kept row's last_seen_at over the day. Works one day and one chunk of games per transaction,
+    bumping the versions of the games that lost rows. Returns the number of rows deleted.
+    """
+    snap = models.PriceSnapshot
+    if since is None:
+        oldest = db.query(func.min(snap.timestamp)).scalar()
+        if oldest is None:
+            return 0
+        since = oldest.date()
+    removed = 0
+    chunks = _game_chunks(db)
+    day = since
+    while day < before:
+        day_start = datetime.combine(day, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+        for chunk in chunks:
+            rows = (
+                db.query(snap.id, snap.game_id, snap.store_id, snap.timestamp, snap.last_seen_at)
+                .filter(snap.game_id.in_(chunk), snap.timestamp >= day_start, snap.timestamp < day_end)
+                .order_by(snap.timestamp, snap.id)
+                .all()
+            )
+            keepers: Dict[Tuple[int, int], Tuple[int, datetime]] = {}
+            doomed: List[int] = []
+            affected: Set[int] = set()
+            for snapshot_id, game_id, store_id, timestamp, last_seen_at in rows:
+                seen = last_seen_at or timestamp
+                previous = keepers.get((game_id, store_id))
+                if previous is not None:
+                    doomed.append(previous[0])
+                    affected.add(game_id)
+                    seen = max(seen, previous[1])
+                keepers[(game_id, store_id)] = (snapshot_id, seen)
+            if not doomed:
+                continue
+            try:
+                table = snap.__table__
+                db.execute(
+                    update(table).where(table.c.id == bindparam("k_id")).values(last_seen_at=bindparam("seen")),
+                    [{"k_id": keeper_id, "seen": seen} for keeper_id, seen in keepers.values()],
+                )
+                for start in range(0, len(doomed), RETENTION_CHUNK_SIZE):
+                    db.execute(delete(table).where(table.c.id.in_(doomed[start : start + RETENTION_CHUNK_SIZE])))
+                # Cached price history and detail ETags are keyed on the game version
+                crud.bump_game_versions(db, affected)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            removed += len(doomed)
+        day += timedelta(days=1)
+    return removed
+
+
+def expire_snapshots(db: Session, horizon: datetime) -> Tuple[int, int]:
+    """
+    Deletes snapshots last seen before the horizon (RETENTION_CHUNK_SIZE rows per transaction) and
+    rollups for days before it (one chunk of games per transaction), bumping the versions of the
+    games that lost rows in the same transaction. Returns (snapshots deleted, rollups deleted).
+    """
+    snap = models.PriceSnapshot
+    rollup = models.PriceRollup
+    snapshots_deleted = 0
+    while True:
+        rows = (
+            db.query(snap.id, snap.game_id)
+            # The timestamp bound lets the index narrow the scan; a price that is still current
+            # keeps its (old) row
+            .filter(snap.timestamp < horizon, func.coalesce(snap.last_seen_at, snap.timestamp) < horizon)
+            .limit(RETENTION_CHUNK_SIZE)
+            .all()
+        )
+        if not rows:
+            break
+        ids = [snapshot_id for snapshot_id, _ in rows]
+        db.query(snap).filter(snap.id.in_(ids)).delete(synchronize_session=False)
+        crud.bump_game_versions(db, {game_id for _, game_id in rows})
+        db.commit()
+        snapshots_deleted += len(ids)
+
+    rollups_deleted = 0
+    for chunk in _game_chunks(db):
+        expired = rollup.game_id.in_(chunk), rollup.day < horizon.date()
+        affected = {game_id for (game_id,) in db.query(rollup.game_id).filter(*expired).distinct()}
+        if not affected:
+            continue
+        result = db.execute(delete(rollup.__table__).where(*expired))
+        crud.bump_game_versions(db, affected)
+        db.commit()
+        rollups_deleted += result.rowcount or 0
+    return snapshots_deleted, rollups_deleted
+
+
+def _database_bytes(db: Session) -> Tuple[int, int]:
+    """Returns (allocated bytes, reclaimable free bytes) for the snapshot storage."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        page_size = db.execute(text("PRAGMA page_size")).scalar() or 0
+        page_count = db.execute(text("PRAGMA page_count")).scalar() or 0
+        freelist = db.execute(text("PRAGMA freelist_count")).scalar() or 0
+        return page_size * page_count, page_size * freelist
+    if dialect == "postgresql":
+        size = db.execute(text("SELECT pg_total_relation_size('price_snapshots')")).scalar() or 0
+        return int(size), 0
+    return 0, 0
+
+
+def _maintain(db: Session, rows_before: int, rows_removed: int) -> Tuple[bool, bool]:
+    """Runs VACUUM/ANALYZE when enough space or rows went away. Returns (vacuumed, analyzed)."""
+    dialect = db.get_bind().dialect.name
+    analyze = rows_before > 0 and rows_removed / rows_before >= RETENTION_ANALYZE_THRESHOLD
+    if dialect == "sqlite":
+        allocated, free = _database_bytes(db)
+        vacuum = allocated > 0 and free / allocated >= RETENTION_VACUUM_THRESHOLD
+    else:
+        # Plain VACUUM only marks space reusable and does not block writers
+        vacuum = analyze
+    if not (vacuum or analyze):
+        return False, False
+
+    db.commit()
+    with db.get_bind().connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if dialect == "sqlite":
+            if vacuum:
+                auto_vacuum = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+                # With incremental auto-vacuum free pages are released without rewriting the file
+                conn.execute(text("PRAGMA incremental_vacuum" if auto_vacuum == 2 else "VACUUM"))
+            if analyze:
+                conn.execute(text("ANALYZE"))
+        else:
+            for table in ("price_snapshots", "price_rollups_daily"):
+                conn.execute(text(f"VACUUM ANALYZE {table}"))
+    return vacuum, analyze
+
+
+def run_retention(db: Session, now: Optional[datetime] = None) -> schemas.RetentionSummary:
+    """Applies the retention policy: expire past the horizon, downsample past the raw window."""
+    global _downsampled_until
+    started = time.monotonic()
+    now = now or datetime.utcnow()
+    raw_cutoff = (now - timedelta(days=RETENTION_RAW_DAYS)).date()
+    horizon = now - timedelta(days=RETENTION_HORIZON_DAYS)
+
+    rows_before = db.query(func.count(models.PriceSnapshot.id)).scalar() or 0
+    bytes_before, free_before = _database_bytes(db)
+
+    rows_expired, rollups_expired = expire_snapshots(db, horizon)
+    since = _downsampled_until
+    if since is not None:
+        since = max(since, horizon.date())
+    rows_downsampled = downsample_snapshots(db, raw_cutoff, since)
+    _downsampled_until = raw_cutoff
+
+    vacuumed, analyzed = _maintain(db, rows_before, rows_expired + rows_downsampled)
+    bytes_after, free_after = _database_bytes(db)
+    if vacuumed:
+        bytes_reclaimed = max(bytes_before - bytes_after, 0)
+    else:
+        # Nothing was returned to the OS; report the space freed for reuse
+        bytes_reclaimed = max(free_after - free_before, 0)
+
+    return schemas.RetentionSummary(
+        rows_downsampled=rows_downsampled,
+        rows_expired=rows_expired,
+        rollups_expired=rollups_expired,
+        bytes_reclaimed=bytes_reclaimed,
+        vacuumed=vacuumed,
+        analyzed=analyzed,
+        duration_seconds=round(time.monotonic() - started, 3),
+    )
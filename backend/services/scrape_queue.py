@@ -0,0 +1,239 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from .. import crud, schemas
+from ..database import SessionLocal
+from . import scraper
+
+logger = logging.getLogger(__name__)
+
+# Worker threads fetching store pages
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "2"))
+# Pages waiting to be scraped; enqueueing beyond this is rejected
+SCRAPE_QUEUE_SIZE = int(os.getenv("SCRAPE_QUEUE_SIZE", "1000"))
+# Minimum gap in seconds between two page fetches from the same host
+SCRAPE_HOST_DELAY = float(os.getenv("SCRAPE_HOST_DELAY", "0.5"))
+# Finished jobs kept for status polling (oldest are forgotten first)
+SCRAPE_JOB_HISTORY = int(os.getenv("SCRAPE_JOB_HISTORY", "500"))
+# Metadata older than this is refreshed by the bulk stale scrape
+METADATA_MAX_AGE_HOURS = float(os.getenv("METADATA_MAX_AGE_HOURS", str(7 * 24)))
+
+
+class QueueFullError(Exception):
+    """Raised when the scrape queue has no room for a job's pages."""
+
+
+class ScrapeJob:
+    def __init__(self, game_ids: Sequence[int]) -> None:
+        self.id = uuid.uuid4().hex
+        self.total = len(game_ids)
+        self.completed = 0
+        # Completed without rewriting metadata (fresh, not modified or unchanged page)
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "failed" if self.total and self.failed == self.total else "done"
+        return "running" if self.started_at is not None else "queued"
+
+    def as_schema(self) -> schemas.ScrapeJobRead:
+        return schemas.ScrapeJobRead(
+            id=self.id,
+            status=self.status,
+            total=self.total,
+            completed=self.completed,
+            skipped=self.skipped,
+            failed=self.failed,
+            errors=self.errors[-10:],
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+        )
+
+
+class ScrapeQueue:
+    """
+    Bounded metadata scraping queue served by a small worker pool.
+
+    Each queued item is one game's store page. Workers space out fetches to the same host by
+    at least `host_delay` seconds, so callers never sleep; a game already waiting or being
+    scraped is not queued twice and the new job shares its result. A forced job upgrades a
+    waiting game to a forced scrape; if the game is already being scraped without force, the
+    forced job waits for that scrape and the same worker then scrapes the game again, forced.
+    """
+
+    def __init__(
+        self,
+        workers: int = SCRAPE_WORKERS,
+        max_size: int = SCRAPE_QUEUE_SIZE,
+        host_delay: float = SCRAPE_HOST_DELAY,
+        history: int = SCRAPE_JOB_HISTORY,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.host_delay = host_delay
+        self.history = history
+        self._queue: "queue.Queue[Tuple[int, str]]" = queue.Queue(maxsize=max_size)
+        self._jobs: "OrderedDict[str, ScrapeJob]" = OrderedDict()
+        # game id -> jobs waiting on that game's pending scrape
+        self._pending: Dict[int, List[ScrapeJob]] = {}
+        # game id -> force flag of queued games no worker has picked up yet
+        self._waiting: Dict[int, bool] = {}
+        # game id -> force flag of the scrape in progress
+        self._running: Dict[int, bool] = {}
+        # game id -> forced jobs waiting for an unforced scrape in progress to finish
+        self._followups: Dict[int, List[ScrapeJob]] = {}
+        self._next_fetch: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"metadata-scrape-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, targets: Sequence[Tuple[int, str]], force: bool = False) -> ScrapeJob:
+        """
+        Queues (game id, store_url) pairs as one job; raises QueueFullError if they don't all fit.
+        `force` re-fetches pages scraped within the freshness window (conditional requests still apply).
+        """
+        self.start()
+        targets = list(dict(targets).items())
+        job = ScrapeJob([game_id for game_id, _ in targets])
+        with self._lock:
+            fresh = [(game_id, url) for game_id, url in targets if game_id not in self._pending]
+            if len(fresh) > self._queue.maxsize - self._queue.qsize():
+                raise QueueFullError(f"Scrape queue is full ({self._queue.qsize()} pages waiting)")
+            for game_id, _ in targets:
+                if game_id in self._followups:
+                    self._followups[game_id].append(job)
+                elif force and self._running.get(game_id) is False:
+                    self._followups[game_id] = [job]
+                else:
+                    self._pending.setdefault(game_id, []).append(job)
+                    if force and game_id in self._waiting:
+                        self._waiting[game_id] = True
+            for game_id, url in fresh:
+                self._waiting[game_id] = force
+                self._queue.put_nowait((game_id, url))
+            self._jobs[job.id] = job
+            self._trim_history()
+            if not targets:
+                job.started_at = job.finished_at = job.created_at
+        return job
+
+    def enqueue_stale(self, max_age_hours: float = METADATA_MAX_AGE_HOURS) -> ScrapeJob:
+        """
+        Queues every game whose metadata is missing or older than `max_age_hours`. The age cutoff
+        replaces the freshness window; conditional requests still apply.
+        """
+        db = SessionLocal()
+        try:
+            targets = crud.list_stale_metadata_games(db, datetime.utcnow() - timedelta(hours=max_age_hours))
+        finally:
+            db.close()
+        return self.enqueue(targets, force=True)
+
+    def get(self, job_id: str) -> Optional[ScrapeJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"queued": self._queue.qsize(), "pending_games": len(self._pending), "jobs": len(self._jobs)}
+
+    def _trim_history(self) -> None:
+        while len(self._jobs) > self.history:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.finished_at is None:
+                break
+            self._jobs.popitem(last=False)
+
+    def _wait_for_host(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_fetch.get(host, now))
+            self._next_fetch[host] = slot + self.host_delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _work(self) -> None:
+        while True:
+            game_id, url = self._queue.get()
+            with self._lock:
+                force = self._waiting.pop(game_id)
+                self._start(game_id, force)
+            try:
+                # Forced jobs that joined an unforced scrape get a forced scrape right after it
+                while self._run(game_id, url, force):
+                    force = True
+            finally:
+                self._queue.task_done()
+
+    def _start(self, game_id: int, force: bool) -> None:
+        self._running[game_id] = force
+        for job in self._pending.get(game_id, []):
+            job.started_at = job.started_at or datetime.utcnow()
+
+    def _run(self, game_id: int, url: str, force: bool) -> bool:
+        """Scrapes one game for its pending jobs; returns whether forced follow-up jobs are waiting."""
+        outcome = error = None
+        try:
+            outcome = self._scrape(game_id, url, force)
+        except requests.RequestException as exc:
+            error = f"game {game_id}: {exc}"
+            logger.warning("Failed to scrape metadata for game %s from %s: %s", game_id, url, exc)
+        except Exception as exc:
+            error = f"game {game_id}: {exc}"
+            logger.exception("Metadata scrape for game %s failed", game_id)
+        return self._finish(game_id, outcome, error)
+
+    def _scrape(self, game_id: int, url: str, force: bool) -> str:
+        db = SessionLocal()
+        try:
+            # Only pages that are actually fetched wait for the host's politeness slot
+            return scraper.refresh_metadata(db, game_id, url, force=force, before_fetch=self._wait_for_host)
+        finally:
+            db.close()
+
+    def _finish(self, game_id: int, outcome: Optional[str], error: Optional[str]) -> bool:
+        with self._lock:
+            self._running.pop(game_id, None)
+            followups = self._followups.pop(game_id, None)
+            for job in self._pending.pop(game_id, []):
+                if error is None:
+                    job.completed += 1
+                    job.skipped += int(outcome != "updated")
+                else:
+                    job.failed += 1
+                    job.errors.append(error)
+                if job.completed + job.failed == job.total:
+                    job.finished_at = datetime.utcnow()
+            if not followups:
+                return False
+            self._pending[game_id] = followups
+            self._start(game_id, True)
+            return True
+
+
+scrapes = ScrapeQueue()
@@ -1,26 +1,162 @@
+import hashlib
 import logging
-import time
-from typing import Dict, List, Optional
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from html import unescape
+from typing import Callable, Dict, List, Optional
 
 import requests
 from bs4 import BeautifulSoup
 from sqlalchemy.orm import Session
 
-from .. import crud, models
+from .. import crud
+from . import http_client, metrics, writer
 
 logger = logging.getLogger(__name__)
 
+# Be gentle to Steam: at most two pages per second by default, no bursts
+http_client.configure_host("store.steampowered.com", rate=float(os.getenv("STEAM_RATE_LIMIT", "2")), burst=1)
 
-def fetch_steam_metadata(url: str) -> Dict[str, Optional[List[str] | str]]:
+# "fast" extracts only the description and tag regions; "soup" parses the whole page with BeautifulSoup
+STEAM_PARSER = os.getenv("STEAM_PARSER", "fast")
+# Metadata scraped less than this many seconds ago is not fetched again unless forced
+METADATA_FRESH_SECONDS = float(os.getenv("METADATA_FRESH_SECONDS", "3600"))
+
+# Outcomes of refresh_metadata; everything but "updated" avoided a parse and metadata write
+_fetch_counters = {"fetched": 0, "fresh": 0, "not_modified": 0, "unchanged": 0, "updated": 0}
+_fetch_counters_lock = threading.Lock()
+
+_DESCRIPTION_START = re.compile(r"<(?P<tag>[a-z][a-z0-9]*)\b[^>]*\bid\s*=\s*[\"']game_area_description[\"'][^>]*>", re.I)
+_SNIPPET_START = re.compile(
+    r"<(?P<tag>[a-z][a-z0-9]*)\b[^>]*\bclass\s*=\s*[\"'][^\"']*\bgame_description_snippet\b[^\"']*[\"'][^>]*>", re.I
+)
+_TAGS_START = re.compile(
+    r"<(?P<tag>[a-z][a-z0-9]*)\b[^>]*\bclass\s*=\s*[\"'](?=[^\"']*\bglance_tags\b)(?=[^\"']*\bpopular_tags\b)[^\"']*[\"'][^>]*>",
+    re.I,
+)
+_APP_TAG = re.compile(r"<a\b[^>]*\bclass\s*=\s*[\"'][^\"']*\bapp_tag\b[^>]*>(.*?)</a\s*>", re.I | re.S)
+# Comments, script/style bodies and tags; what is left between them is text
+_MARKUP = re.compile(r"<!--.*?-->|<(script|style)\b.*?</\1\s*>|<[^>]*>", re.I | re.S)
+
+
+def fetch_steam_page(url: str, headers: Optional[dict] = None) -> requests.Response:
+    """
+    Fetches a store page, optionally with conditional request headers. Returns the response for
+    200 and 304; raises requests.RequestException on network or other HTTP errors.
+    """
+    with metrics.upstream_call(url, "steam"):
+        resp = http_client.get(url, headers=headers, timeout=10)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+    return resp
+
+
+async def fetch_steam_page_async(url: str, headers: Optional[dict] = None):
+    """fetch_steam_page on the async HTTP client; returns an httpx.Response for 200 and 304."""
+    with metrics.upstream_call(url, "steam"):
+        resp = await http_client.get_async(url, headers=headers, timeout=10)
+        if resp.status_code != 304:
+            http_client.raise_for_status(resp)
+    return resp
+
+
+async def fetch_steam_metadata_async(url: str) -> Dict[str, Optional[List[str] | str]]:
     try:
-        time.sleep(0.5)  # be gentle to Steam
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
+        resp = await fetch_steam_page_async(url)
     except requests.RequestException as exc:  # pragma: no cover - network failures not under test
         logger.warning("Failed to fetch Steam page %s: %s", url, exc)
         return {"description": None, "tags": None}
+    return parse_steam_metadata(resp.text)
+
+
+def refresh_metadata(
+    db: Session,
+    game_id: int,
+    url: str,
+    force: bool = False,
+    before_fetch: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Re-scrapes a game's store page unless its stored metadata is still current, and returns the outcome:
+
+    - "fresh": scraped within METADATA_FRESH_SECONDS (skipped unless `force`), nothing fetched
+    - "not_modified": Steam answered the conditional request with 304
+    - "unchanged": the page body hashes the same as last time
+    - "updated": the page was parsed and the metadata rewritten
+
+    The first three skip parsing and the metadata write; only last_scraped_at (and the validators) move.
+    `before_fetch(url)` is called right before the request goes out. Raises requests.RequestException when the page cannot be fetched.
+    """
+    stored = crud.get_metadata_validators(db, game_id)
+    scraped_at, etag, last_modified, content_hash = stored or (None, None, None, None)
+    fresh_after = datetime.utcnow() - timedelta(seconds=METADATA_FRESH_SECONDS)
+    if not force and scraped_at is not None and scraped_at > fresh_after:
+        return _count("fresh")
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    if before_fetch is not None:
+        before_fetch(url)
+    resp = fetch_steam_page(url, headers=headers or None)
+    _count("fetched")
+    new_etag = resp.headers.get("ETag") or etag
+    new_last_modified = resp.headers.get("Last-Modified") or last_modified
+    if resp.status_code == 304:
+        writer.writes.run(db, crud.touch_metadata, game_id, new_etag, new_last_modified)
+        return _count("not_modified")
+
+    digest = hashlib.sha256(resp.content).hexdigest()
+    if stored is not None and digest == content_hash:
+        writer.writes.run(db, crud.touch_metadata, game_id, new_etag, new_last_modified)
+        return _count("unchanged")
+    metadata = parse_steam_metadata(resp.text)
+    writer.writes.run(
+        db, crud.upsert_metadata, game_id, metadata, etag=new_etag, last_modified=new_last_modified, content_hash=digest
+    )
+    return _count("updated")
+
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+def fetch_stats() -> Dict[str, int]:
+    """Metadata refresh outcome counters, plus full page downloads and parses they avoided."""
+    with _fetch_counters_lock:
+        stats = dict(_fetch_counters)
+    stats["downloads_avoided"] = stats["fresh"] + stats["not_modified"]
+    stats["parses_avoided"] = stats["fresh"] + stats["not_modified"] + stats["unchanged"]
+    return stats
+
+
+def _count(outcome: str) -> str:
+    with _fetch_counters_lock:
+        _fetch_counters[outcome] += 1
+    return outcome
+
+
+def parse_steam_metadata(html: str, parser: Optional[str] = None) -> Dict[str, Optional[List[str] | str]]:
+    """
+    Extracts the description and user tags from a Steam store page.
+
+    The "fast" parser (default, see STEAM_PARSER) slices out just the description and tag
+    regions with regex scans and never builds a DOM; when it finds neither region (changed
+    markup, age gates) the page goes through the full BeautifulSoup parse instead.
+    """
+    if (parser or STEAM_PARSER) == "fast":
+        try:
+            metadata = _parse_regions(html)
+        except Exception as exc:  # pragma: no cover - fall through to the full parse
+            logger.warning("Targeted Steam parse failed, using BeautifulSoup: %s", exc)
+        else:
+            if metadata["description"] is not None or metadata["tags"] is not None:
+                return metadata
+    return _parse_soup(html)
+
+
+def _parse_soup(html: str) -> Dict[str, Optional[List[str] | str]]:
+    soup = BeautifulSoup(html, "html.parser")
     description = None
     tags: Optional[List[str]] = None
 
@@ -41,8 +177,37 @@ def fetch_steam_metadata(url: str) -> Dict[str, Optional[List[str] | str]]:
     return {"description": description, "tags": tags}
 
 
-def update_game_metadata(db: Session, game: models.Game) -> models.GameMetadata:
-    if not game.store_url:
-        raise ValueError("Game has no store_url for scraping")
-    metadata = fetch_steam_metadata(game.store_url)
-    return crud.upsert_metadata(db, game.id, metadata)
+def _parse_regions(html: str) -> Dict[str, Optional[List[str] | str]]:
+    description = None
+    # Like select_one, take whichever description element comes first in the document
+    starts = [match for match in (_DESCRIPTION_START.search(html), _SNIPPET_START.search(html)) if match]
+    if starts:
+        region = _element(html, min(starts, key=lambda match: match.start()))
+        if region is not None:
+            description = _text(region)
+
+    tags: Optional[List[str]] = None
+    match = _TAGS_START.search(html)
+    region = _element(html, match) if match else None
+    if region is not None:
+        tags = [text for text in (_text(inner) for inner in _APP_TAG.findall(region)) if text] or None
+    return {"description": description, "tags": tags}
+
+
+def _element(html: str, start: re.Match) -> Optional[str]:
+    """Returns the markup of the element whose start tag matched, up to its balanced end tag."""
+    pattern = re.compile(rf"<(/?){re.escape(start.group('tag'))}\b[^>]*>", re.IGNORECASE)
+    depth = 1
+    for tag in pattern.finditer(html, start.end()):
+        if tag.group(0).endswith("/>"):
+            continue
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return html[start.start() : tag.end()]
+    return None
+
+
+def _text(fragment: str) -> str:
+    """Text of a fragment the way get_text(strip=True) joins it: stripped strings, no separator."""
+    # split() also returns the script/style group between pieces; keep only the text pieces
+    return "".join(unescape(piece).strip() for piece in _MARKUP.split(fragment)[::2])
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of cached queries (least recently used are evicted first)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+# Entries younger than this are served as-is
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+# Older entries are still served for this long while a background refresh runs
+SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", "3600"))
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+class TTLCache(Generic[T]):
+    """
+    Bounded TTL + LRU cache in front of a slow loader.
+
+    Concurrent misses for the same key share one loader call (single-flight). Entries past the
+    TTL but within the stale window are returned immediately while one background refresh
+    reloads them, and any cached value is served if the loader fails.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], T],
+        max_entries: int = SEARCH_CACHE_SIZE,
+        ttl: float = SEARCH_CACHE_TTL,
+        stale_ttl: float = SEARCH_CACHE_STALE_TTL,
+    ) -> None:
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, Tuple[T, float]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "errors": 0,
+            "stale_on_error": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key: str) -> T:
+        while True:
+            kind, value, future = self._begin(key)
+            if kind == "hit":
+                return value  # type: ignore
+            if kind == "load":
+                return self._load(key, future)
+            try:
+                return future.result()
+            except CancelledError:
+                # The loading caller was interrupted; take the load over
+                continue
+
+    async def get_async(self, key: str, loader: Callable[[str], Awaitable[T]]) -> T:
+        """
+        Like get, for the event loop: a miss awaits `loader` (an async twin of self.loader) and
+        coalesced callers await the in-flight load instead of blocking a thread.
+        Stale refreshes still run self.loader in the background pool.
+        """
+        while True:
+            kind, value, future = self._begin(key)
+            if kind == "hit":
+                return value  # type: ignore
+            if kind == "load":
+                break
+            try:
+                # Shielded so a cancelled waiter does not cancel the load other callers share
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The loading caller was cancelled; take the load over
+        try:
+            value = await loader(key)
+        except Exception as exc:
+            return self._failed(key, future, exc)
+        except BaseException:
+            self._abandon(key, future)
+            raise
+        return self._loaded(key, future, value)
+
+    def _begin(self, key: str) -> Tuple[str, Optional[T], Optional[Future]]:
+        """
+        Returns ("hit", value, None) for fresh or stale entries, ("wait", None, in-flight future)
+        to join another caller's load, or ("load", None, future) when this caller must load.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = now - loaded_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return "hit", value, None
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    if key not in self._inflight:
+                        self._counters["refreshes"] += 1
+                        future = self._inflight[key] = Future()
+                        self._refresher.submit(self._load, key, future)
+                    return "hit", value, None
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self._counters["coalesced"] += 1
+                return "wait", None, inflight
+            self._counters["misses"] += 1
+            future = self._inflight[key] = Future()
+            return "load", None, future
+
+    def _load(self, key: str, future: Future) -> T:
+        """Runs the loader for a registered in-flight future and publishes the outcome."""
+        try:
+            value = self.loader(key)
+        except Exception as exc:
+            return self._failed(key, future, exc)
+        except BaseException:
+            self._abandon(key, future)
+            raise
+        return self._loaded(key, future, value)
+
+    def _abandon(self, key: str, future: Future) -> None:
+        """
+        Drops an in-flight load whose caller was cancelled or interrupted: the next caller loads
+        afresh, and cancelling the future wakes waiters so they retry instead of hanging.
+        """
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.cancel()
+
+    def _failed(self, key: str, future: Future, exc: Exception) -> T:
+        """Publishes a failed load: the stale entry if there is one, otherwise re-raises `exc`."""
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._counters["errors"] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._counters["stale_on_error"] += 1
+        if entry is not None:
+            logger.warning("Serving stale cache entry for %r after refresh failed: %s", key, exc)
+            future.set_result(entry[0])
+            return entry[0]
+        future.set_exception(exc)
+        raise exc
+
+    def _loaded(self, key: str, future: Future, value: T) -> T:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries), "inflight": len(self._inflight)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
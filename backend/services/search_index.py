@@ -0,0 +1,160 @@
+import bisect
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Answer a query locally when it already has at least this many local matches
+SEARCH_LOCAL_MIN_RESULTS = int(os.getenv("SEARCH_LOCAL_MIN_RESULTS", "5"))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+SearchResultDict = Dict[str, Optional[object]]
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _within_distance(a: str, b: str, limit: int) -> bool:
+    """Edit distance (with adjacent transpositions) <= limit, abandoning rows that already exceed it."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+class SearchIndex:
+    """
+    In-memory title index for instant local search and autocomplete.
+
+    Every query token must match a title token, either as a prefix (via bisect over the sorted
+    token list) or, for tokens of 4+ characters with no prefix match, within a small edit
+    distance (candidates found through shared trigrams). Results are ranked exact > prefix > fuzzy.
+    """
+
+    def __init__(self) -> None:
+        self._docs: Dict[str, SearchResultDict] = {}
+        self._doc_tokens: Dict[str, List[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._tokens: List[str] = []
+        self._trigram_tokens: Dict[str, Set[str]] = {}
+        # Normalized query -> when CheapShark last answered it (UTC)
+        self._seen_queries: Dict[str, datetime] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, results: Iterable[SearchResultDict]) -> None:
+        """Adds or replaces titles; entries need api_game_id and title."""
+        with self._lock:
+            for item in results:
+                api_game_id = item.get("api_game_id")
+                title = item.get("title")
+                if not api_game_id or not title:
+                    continue
+                self._remove_tokens(str(api_game_id))
+                self._docs[str(api_game_id)] = dict(item)
+                tokens = tokenize(str(title))
+                self._doc_tokens[str(api_game_id)] = tokens
+                for token in tokens:
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = set()
+                        bisect.insort(self._tokens, token)
+                        for gram in _trigrams(token):
+                            self._trigram_tokens.setdefault(gram, set()).add(token)
+                    postings.add(str(api_game_id))
+
+    def _remove_tokens(self, api_game_id: str) -> None:
+        # Tokens left without postings stay in the token lists; lookups skip them
+        for token in self._doc_tokens.pop(api_game_id, []):
+            self._postings.get(token, set()).discard(api_game_id)
+
+    def mark_seen(self, queries: Iterable[Tuple[str, datetime]]) -> None:
+        """Records (query, searched_at) pairs; a query keeps its most recent upstream answer time."""
+        with self._lock:
+            for query, searched_at in queries:
+                previous = self._seen_queries.get(query)
+                if previous is None or searched_at > previous:
+                    self._seen_queries[query] = searched_at
+
+    def has_seen(self, query: str, max_age: float) -> bool:
+        """Whether CheapShark answered `query` within the last `max_age` seconds."""
+        searched_at = self._seen_queries.get(query)
+        return searched_at is not None and (datetime.utcnow() - searched_at).total_seconds() < max_age
+
+    def _prefix_matches(self, token: str) -> Dict[str, int]:
+        """Returns {api_game_id: rank} for titles with a token starting with `token` (0 exact, 1 prefix)."""
+        matches: Dict[str, int] = {}
+        start = bisect.bisect_left(self._tokens, token)
+        for candidate in self._tokens[start:]:
+            if not candidate.startswith(token):
+                break
+            rank = 0 if candidate == token else 1
+            for api_game_id in self._postings.get(candidate, ()):
+                if rank < matches.get(api_game_id, 2):
+                    matches[api_game_id] = rank
+        return matches
+
+    def _fuzzy_matches(self, token: str) -> Dict[str, int]:
+        limit = 1 if len(token) < 8 else 2
+        grams = _trigrams(token)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._trigram_tokens.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        matches: Dict[str, int] = {}
+        # Each edit touches at most three trigrams, and a longer title token lacks the query's end gram
+        needed = max(1, len(grams) - 3 * limit - 1)
+        lengths = range(max(1, len(token) - limit), len(token) + limit + 1)
+        for candidate, count in shared.items():
+            if count < needed:
+                continue
+            # Compare against the candidate's prefixes so misspelled prefixes still match
+            if any(_within_distance(token, candidate[:length], limit) for length in lengths):
+                for api_game_id in self._postings.get(candidate, ()):
+                    matches[api_game_id] = 2
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[SearchResultDict]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            scores: Optional[Dict[str, int]] = None
+            for token in tokens:
+                matches = self._prefix_matches(token)
+                if not matches and len(token) >= 4:
+                    matches = self._fuzzy_matches(token)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {doc: score + matches[doc] for doc, score in scores.items() if doc in matches}
+                if not scores:
+                    return []
+            ranked: List[Tuple[int, int, str]] = sorted(
+                (score, len(str(self._docs[doc]["title"])), doc) for doc, score in scores.items()
+            )
+            return [dict(self._docs[doc]) for _, _, doc in ranked[:limit]]
+
+
+index = SearchIndex()
@@ -0,0 +1,27 @@
+from typing import Any, Iterable, Iterator
+
+import orjson
+
+# Streamed NDJSON lines are flushed in chunks of about this many bytes
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+def dumps(payload: Any) -> bytes:
+    """
+    Compact JSON for plain dicts/lists built from row tuples, with dates as ISO strings; the same
+    bytes pydantic would produce for the equivalent schema.
+    """
+    return orjson.dumps(payload)
+
+
+def ndjson(items: Iterable[Any]) -> Iterator[bytes]:
+    """Encodes items one JSON document per line, yielding chunks so each item is encoded once and dropped."""
+    chunk = bytearray()
+    for item in items:
+        chunk += dumps(item)
+        chunk += b"\n"
+        if len(chunk) >= NDJSON_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
@@ -0,0 +1,98 @@
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# (id, cheapshark_id, name, synced_at)
+StoreRow = Tuple[int, Optional[str], str, Optional[datetime]]
+# (store rows, (source id, name) rows, (currency id, code) rows, "stores" data version) as read by StoreCache.fetch
+StoreTables = Tuple[List[StoreRow], List[Tuple[int, str]], List[Tuple[int, str]], int]
+
+
+class StoreCache:
+    """
+    Warm in-process copy of the stores table and the small source/currency lookup tables.
+
+    Loaded once at startup and updated by every write to those tables, so read paths turn
+    store ids back into names without joining and ingestion resolves CheapShark store ids
+    without a query per row. `version` is the "stores" data version the cache was loaded at;
+    crud.sync_store_cache reloads it when another process has synced or renamed stores since.
+    """
+
+    def __init__(self) -> None:
+        self._names: Dict[int, str] = {}
+        self._ids: Dict[str, int] = {}
+        self._lookups: Dict[Tuple[str, str], int] = {}
+        self._codes: Dict[Tuple[str, int], str] = {}
+        self.synced_at: Optional[datetime] = None
+        self.version: Optional[int] = None
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> None:
+        self.replace(self.fetch(db))
+
+    def fetch(self, db: Session) -> StoreTables:
+        """Reads the tables the cache mirrors, for a later replace."""
+        # Read before the tables, so a sync landing in between leaves the cache looking stale, not fresh
+        version = db.query(models.DataVersion.version).filter(models.DataVersion.name == "stores").scalar() or 0
+        store = models.Store
+        rows = db.query(store.id, store.cheapshark_id, store.name, store.synced_at).all()
+        sources = db.query(models.Source.id, models.Source.name).all()
+        currencies = db.query(models.Currency.id, models.Currency.code).all()
+        return rows, sources, currencies, version
+
+    def replace(self, tables: StoreTables) -> None:
+        rows, sources, currencies, version = tables
+        with self._lock:
+            self._names.clear()
+            self._ids.clear()
+            self._lookups.clear()
+            self._codes.clear()
+            self.synced_at = None
+            self.version = version
+        self.put(rows)
+        for source_id, name in sources:
+            self.put_lookup("source", name, source_id)
+        for currency_id, code in currencies:
+            self.put_lookup("currency", code, currency_id)
+        self.loaded = True
+
+    def put(self, rows: Iterable[StoreRow]) -> None:
+        with self._lock:
+            for store_id, cheapshark_id, name, synced_at in rows:
+                self._names[store_id] = name
+                if cheapshark_id is not None:
+                    self._ids[cheapshark_id] = store_id
+                if synced_at is not None and (self.synced_at is None or synced_at > self.synced_at):
+                    self.synced_at = synced_at
+
+    def name(self, store_id: Optional[int]) -> Optional[str]:
+        if store_id is None:
+            return None
+        return self._names.get(store_id)
+
+    def id_for(self, cheapshark_id: str) -> Optional[int]:
+        return self._ids.get(cheapshark_id)
+
+    def ids_named(self, name: str) -> List[int]:
+        key = name.casefold()
+        with self._lock:
+            return [store_id for store_id, store_name in self._names.items() if store_name.casefold() == key]
+
+    def put_lookup(self, kind: str, value: str, row_id: int) -> None:
+        with self._lock:
+            self._lookups[(kind, value)] = row_id
+            self._codes[(kind, row_id)] = value
+
+    def lookup_id(self, kind: str, value: str) -> Optional[int]:
+        return self._lookups.get((kind, value))
+
+    def code(self, kind: str, row_id: int) -> Optional[str]:
+        return self._codes.get((kind, row_id))
+
+
+stores = StoreCache()
@@ -0,0 +1,84 @@
+import logging
+import time
+from typing import Dict, List, Sequence
+
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from . import price_api, refresh, writer
+
+logger = logging.getLogger(__name__)
+
+
+def import_games(
+    db: Session,
+    games_in: Sequence[schemas.GameCreate],
+    concurrency: int = refresh.REFRESH_CONCURRENCY,
+    batch_size: int = refresh.REFRESH_BATCH_SIZE,
+) -> schemas.GameImportSummary:
+    """
+    Adds many games to the watchlist at once.
+
+    The request is deduped and checked against the watchlist in one query; the new games are
+    looked up with CheapShark's multiple game lookup (see refresh.lookup_batches), inserted
+    with one commit and their first prices written through bulk_insert_snapshots. Provided
+    title/cover/store_url win over CheapShark's, as in POST /games. Games CheapShark can't
+    resolve are reported in `failed` and not added.
+    """
+    started = time.perf_counter()
+    requested: Dict[str, schemas.GameCreate] = {}
+    for game_in in games_in:
+        requested.setdefault(game_in.api_game_id, game_in)
+    existing = crud.get_existing_api_ids(db, requested)
+    targets = [(api_id, api_id) for api_id in requested if api_id not in existing]
+
+    new_games: List[schemas.GameCreate] = []
+    snapshots: Dict[str, list] = {}
+    failed: List[str] = []
+    upstream_requests = 0
+    for batch, details_by_id, error in refresh.lookup_batches(targets, concurrency, batch_size, "game-import"):
+        upstream_requests += 1
+        if error is not None:
+            logger.error(f"Failed to look up batch of {len(batch)} imported games: {error}")
+        for _, api_id in batch:
+            details = details_by_id.get(api_id)
+            if not details:
+                failed.append(api_id)
+                continue
+            title, thumb, rows = price_api.extract_snapshot_rows(details)
+            game_in = requested[api_id]
+            new_games.append(
+                schemas.GameCreate(
+                    api_game_id=api_id,
+                    title=game_in.title or title,
+                    cover_image_url=game_in.cover_image_url or thumb,
+                    store_url=game_in.store_url or price_api.steam_store_url(details),
+                )
+            )
+            snapshots[api_id] = rows
+
+    ids = writer.writes.run(db, crud.bulk_create_games, new_games)
+    rows = [(ids[api_id], *snap) for api_id, snaps in snapshots.items() if api_id in ids for snap in snaps]
+    inserted = 0
+    for start in range(0, len(rows), refresh.REFRESH_FLUSH_ROWS):
+        inserted += writer.writes.run(db, crud.bulk_insert_snapshots, rows[start : start + refresh.REFRESH_FLUSH_ROWS])
+    if rows:
+        # Names stores first seen in these deals (no-op while the last sync is fresh)
+        price_api.sync_stores(db)
+
+    duration = time.perf_counter() - started
+    logger.info(
+        f"Imported {len(new_games)} of {len(games_in)} games ({len(existing)} existing, "
+        f"{len(games_in) - len(requested)} duplicate, {len(failed)} failed) "
+        f"with {upstream_requests} upstream requests in {duration:.2f}s"
+    )
+    return schemas.GameImportSummary(
+        games_requested=len(games_in),
+        games_created=len(new_games),
+        games_existing=len(existing),
+        games_duplicate=len(games_in) - len(requested),
+        failed=sorted(failed),
+        snapshots_inserted=inserted,
+        upstream_requests=upstream_requests,
+        duration_seconds=round(duration, 3),
+    )
@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..database import engine, is_sqlite_file
+
+logger = logging.getLogger(__name__)
+
+# Funnel SQLite writes through one writer thread (on by default for on-disk SQLite, never for Postgres)
+SQLITE_WRITE_QUEUE = os.getenv("SQLITE_WRITE_QUEUE", "1") == "1"
+# Most queued writes committed together in one transaction
+SQLITE_WRITE_BATCH = int(os.getenv("SQLITE_WRITE_BATCH", "64"))
+# Seconds the writer waits for more writes to join a transaction once it has one
+SQLITE_WRITE_LINGER = float(os.getenv("SQLITE_WRITE_LINGER", "0.002"))
+
+T = TypeVar("T")
+# (write function, args, kwargs, future resolved once its transaction commits)
+WriteJob = Tuple[Callable[..., Any], tuple, dict, Future]
+# Session.info key holding the callbacks a write deferred until the group's COMMIT
+AFTER_COMMIT = "after_commit"
+
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """
+    Runs `callback` once the writes `db` just committed are durable: right away when db.commit()
+    was a real COMMIT, or after the shared COMMIT when `db` is a write queue job's session, whose
+    commit() only releases a savepoint. Call it after db.commit(); use it for in-memory state
+    (caches, indexes) that must not see writes which could still be rolled back.
+    """
+    deferred = db.info.get(AFTER_COMMIT)
+    if deferred is None:
+        callback()
+    else:
+        deferred.append(callback)
+
+
+class WriteQueue:
+    """
+    Single writer for SQLite, which allows one write transaction at a time per database.
+
+    Write functions (crud functions taking a Session first) are queued and run by one thread,
+    which takes the write lock once with BEGIN IMMEDIATE and runs every write waiting at that
+    moment, up to `max_batch`, in the same transaction, each inside its own SAVEPOINT. Their
+    commit()/rollback() calls only release or roll back that savepoint, so a failing write's
+    uncommitted work is undone and its exception goes to its caller without affecting the rest
+    of the group. Callers get their result only after the shared COMMIT, and callbacks jobs
+    registered with after_commit run just before that. A job that raises after a commit() keeps
+    that committed work, so its callbacks run too; only a failed group drops them. Reads keep
+    running on pooled connections.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        max_batch: int = SQLITE_WRITE_BATCH,
+        linger: float = SQLITE_WRITE_LINGER,
+    ) -> None:
+        self.enabled = SQLITE_WRITE_QUEUE and is_sqlite_file() if enabled is None else enabled
+        self.max_batch = max(1, max_batch)
+        self.linger = linger
+        self._queue: "queue.Queue[WriteJob]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters = {"writes": 0, "transactions": 0, "failed": 0}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def run(self, db: Session, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        fn(session, *args, **kwargs) on the writer thread, blocking until it is committed; inline on
+        `db` when the queue is disabled or already on the writer. `db` must not hold uncommitted
+        writes, or the writer would wait on its lock. Its objects are expired afterwards, as a
+        commit on `db` itself would have done.
+        """
+        if not self.enabled or threading.current_thread() is self._thread:
+            return fn(db, *args, **kwargs)
+        result = self.submit(fn, *args, **kwargs).result()
+        db.expire_all()
+        return result
+
+    async def run_async(self, db: AsyncSession, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        run for the async request path: awaits the writer thread's COMMIT without blocking the
+        event loop, or runs fn inline through db.run_sync when the queue is disabled.
+        """
+        if not self.enabled:
+            return await db.run_sync(fn, *args, **kwargs)
+        # Shielded so a cancelled request does not cancel a future the writer will still resolve
+        result = await asyncio.shield(asyncio.wrap_future(self.submit(fn, *args, **kwargs)))
+        db.expire_all()
+        return result
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        self.start()
+        future: Future = Future()
+        # Runs in the caller's context, so its queries count towards the caller's request metrics
+        fn = functools.partial(contextvars.copy_context().run, fn)
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        transactions = counters["transactions"]
+        return {
+            **counters,
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "writes_per_transaction": round(counters["writes"] / transactions, 2) if transactions else 0.0,
+        }
+
+    def _work(self) -> None:
+        while True:
+            group = [self._queue.get()]
+            deadline = time.monotonic() + self.linger
+            while len(group) < self.max_batch:
+                try:
+                    group.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._commit(group)
+
+    def _commit(self, group: List[WriteJob]) -> None:
+        outcomes: List[Tuple[Any, Optional[BaseException]]] = []
+        callbacks: List[Callable[[], None]] = []
+        try:
+            with engine.connect() as conn:
+                raw = conn.connection.driver_connection
+                isolation_level = raw.isolation_level
+                # pysqlite would otherwise begin lazily and turn the first SAVEPOINT into the transaction
+                raw.isolation_level = None
+                try:
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                    for fn, args, kwargs, _ in group:
+                        deferred: List[Callable[[], None]] = []
+                        session = Session(
+                            bind=conn,
+                            autoflush=False,
+                            join_transaction_mode="create_savepoint",
+                            info={AFTER_COMMIT: deferred},
+                        )
+                        try:
+                            outcomes.append((fn(session, *args, **kwargs), None))
+                        except Exception as exc:
+                            session.rollback()
+                            outcomes.append((None, exc))
+                        finally:
+                            session.close()
+                            # Registered after commit() calls, so they cover released savepoints only
+                            callbacks.extend(deferred)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    raw.isolation_level = isolation_level
+        except Exception as exc:
+            logger.exception(f"Write transaction of {len(group)} writes failed")
+            outcomes = [(None, exc)] * len(group)
+            callbacks = []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("After-commit callback failed")
+
+        failed = sum(1 for _, error in outcomes if error is not None)
+        with self._lock:
+            self._counters["writes"] += len(group)
+            self._counters["transactions"] += 1
+            self._counters["failed"] += failed
+        for (_, _, _, future), (result, error) in zip(group, outcomes):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+writes = WriteQueue()
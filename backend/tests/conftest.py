@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .. import models  # noqa: F401 - registers the tables ensure_schema creates
+from ..database import ensure_schema
+from ..services import alert_rules, search_index, store_cache, writer
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine, monkeypatch):
+    """A session on a fresh SQLite database, with empty process-wide caches and writes run inline."""
+    ensure_schema(engine)
+    monkeypatch.setattr(writer, "writes", writer.WriteQueue(enabled=False))
+    monkeypatch.setattr(store_cache, "stores", store_cache.StoreCache())
+    monkeypatch.setattr(alert_rules, "index", alert_rules.AlertRuleIndex())
+    monkeypatch.setattr(search_index, "index", search_index.SearchIndex())
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
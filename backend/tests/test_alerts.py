@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+from .. import crud, models, schemas
+from ..services import alert_rules
+
+
+def _alert_counts(db):
+    alert = models.PriceAlert
+    return db.query(alert).filter(alert.cleared_at.is_(None)).count(), db.query(alert).count()
+
+
+def _other_process_index(db, version):
+    """An index another process loaded at `version`, before this process recorded any alert."""
+    rule = models.PriceAlertRule
+    index = alert_rules.AlertRuleIndex()
+    index.load(db.query(rule.id, rule.game_id, rule.target_cents, rule.min_discount).all(), [], version)
+    return index
+
+
+@pytest.mark.parametrize("caught_up", [True, False])
+def test_two_ingestions_against_one_rule_fire_once(db, monkeypatch, caught_up):
+    game = crud.create_game(db, schemas.GameCreate(api_game_id="1", title="Portal"))
+    crud.create_alert_rule(db, game.id, target_price=5.0, min_discount=None)
+    before = crud.get_versions(db, ["alert_rules"])["alert_rules"]
+
+    crud.bulk_insert_snapshots(db, [(game.id, "1", 4.0, 20.0, "USD")], timestamp=datetime.utcnow())
+    assert _alert_counts(db) == (1, 1)
+
+    # caught_up: the other process evaluated at the same version before the first alert was
+    # committed (the Postgres race); otherwise it is behind and reloads on the bumped version
+    version = crud.get_versions(db, ["alert_rules"])["alert_rules"] if caught_up else before
+    monkeypatch.setattr(alert_rules, "index", _other_process_index(db, version))
+    crud.bulk_insert_snapshots(db, [(game.id, "1", 3.0, 20.0, "USD")], timestamp=datetime.utcnow())
+    assert _alert_counts(db) == (1, 1)
+
+    # A price above the target clears the alert, and the next drop fires a new one
+    crud.bulk_insert_snapshots(db, [(game.id, "1", 9.0, 20.0, "USD")], timestamp=datetime.utcnow())
+    crud.bulk_insert_snapshots(db, [(game.id, "1", 2.0, 20.0, "USD")], timestamp=datetime.utcnow())
+    assert _alert_counts(db) == (1, 2)
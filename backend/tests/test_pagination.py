@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from .. import crud, models, schemas
+
+# (title, best_price, best_discount); games without a price sort after every priced game
+GAMES = [
+    ("Portal", 4.99, 80.0),
+    ("Half-Life", 9.99, 50.0),
+    ("Braid", 4.99, 75.0),
+    ("Celeste", None, None),
+    ("Hades", 12.49, 50.0),
+    ("Antichamber", None, None),
+    ("Outer Wilds", 9.99, None),
+]
+
+
+@pytest.fixture
+def games(db):
+    created = datetime(2024, 1, 1)
+    for number, (title, price, discount) in enumerate(GAMES, start=1):
+        game = crud.create_game(db, schemas.GameCreate(api_game_id=str(number), title=title))
+        last_price_at = created + timedelta(hours=number % 3) if price is not None else None
+        db.execute(
+            update(models.Game)
+            .where(models.Game.id == game.id)
+            # Every game shares one creation time, so the id alone breaks ties
+            .values(created_at=created, best_price=price, best_discount=discount, last_price_at=last_price_at)
+        )
+    db.commit()
+
+
+def _walk(db, limit, **params):
+    titles, cursor = [], None
+    while True:
+        page, cursor = crud.list_games_page(db, limit=limit, cursor=cursor, **params)
+        assert len(page) <= limit
+        titles.extend(game.title for game in page)
+        if cursor is None:
+            return titles
+
+
+@pytest.mark.usefixtures("games")
+@pytest.mark.parametrize("sort", sorted(crud.GAME_SORTS))
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_pages_walk_the_whole_watchlist_in_order(db, sort, order, limit):
+    # One page as large as the watchlist is the reference order
+    expected, cursor = crud.list_games_page(db, sort=sort, order=order, limit=len(GAMES))
+    assert cursor is None
+    assert _walk(db, limit, sort=sort, order=order) == [game.title for game in expected]
+
+
+@pytest.mark.usefixtures("games")
+def test_priced_games_come_first_then_unpriced_by_id(db):
+    expected = ["Hades", "Outer Wilds", "Half-Life", "Braid", "Portal", "Celeste", "Antichamber"]
+    assert _walk(db, 2, sort="best_price", order="desc") == expected
+
+
+@pytest.mark.usefixtures("games")
+def test_filters_apply_to_every_page(db):
+    assert _walk(db, 1, sort="title", max_price=9.99) == ["Braid", "Half-Life", "Outer Wilds", "Portal"]
+
+
+@pytest.mark.usefixtures("games")
+def test_cursor_from_another_sort_is_rejected(db):
+    _, cursor = crud.list_games_page(db, sort="title", limit=2)
+    with pytest.raises(ValueError):
+        crud.list_games_page(db, sort="best_price", cursor=cursor)
+    with pytest.raises(ValueError):
+        crud.list_games_page(db, sort="title", order="desc", cursor=cursor)
+    with pytest.raises(ValueError):
+        crud.list_games_page(db, sort="title", cursor="not-a-cursor")
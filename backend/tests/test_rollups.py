@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from .. import crud, models, schemas
+
+START = datetime(2024, 3, 1, 10, 0)
+# (days after START, price) of successive refreshes; unchanged prices span days without a refresh
+REFRESHES = [(0, 9.99), (3, 9.99), (4, 7.5), (4.5, 7.5), (9, 7.5), (10, 8.0)]
+
+
+def _rollups(db):
+    rollup = models.PriceRollup
+    rows = db.query(rollup).order_by(rollup.store_id, rollup.day)
+    return [(row.store_id, row.day, row.min_cents, row.max_cents, row.close_cents) for row in rows]
+
+
+@pytest.mark.parametrize("write_mode", ["append", "changes"])
+def test_incremental_rollups_match_rebuild(db, write_mode):
+    game = crud.create_game(db, schemas.GameCreate(api_game_id="1", title="Portal"))
+    for days, price in REFRESHES:
+        crud.bulk_insert_snapshots(
+            db,
+            [(game.id, "1", price, 20.0, "USD"), (game.id, "2", price + 1, 20.0, "USD")],
+            timestamp=START + timedelta(days=days),
+            write_mode=write_mode,
+        )
+    incremental = _rollups(db)
+    crud.rebuild_price_rollups(db)
+    assert incremental == _rollups(db)
+
+
+def test_changes_mode_carries_unchanged_close_forward(db):
+    game = crud.create_game(db, schemas.GameCreate(api_game_id="1", title="Portal"))
+    for days in (0, 3):
+        crud.bulk_insert_snapshots(
+            db, [(game.id, "1", 9.99, 20.0, "USD")], timestamp=START + timedelta(days=days), write_mode="changes"
+        )
+    assert db.query(models.PriceSnapshot).count() == 1
+    assert [row[1].day for row in _rollups(db)] == [1, 2, 3, 4]
+    assert {row[4] for row in _rollups(db)} == {999}
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from .. import models  # noqa: F401 - registers the tables ensure_schema creates
+from ..database import ensure_schema
+
+# The schema of the first release, before any price table referenced stores
+BASELINE_SCHEMA = (
+    "CREATE TABLE games (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, api_game_id VARCHAR NOT NULL UNIQUE, "
+    "store_url VARCHAR, cover_image_url VARCHAR, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)",
+    "CREATE TABLE price_snapshots (id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL REFERENCES games (id), "
+    "source VARCHAR NOT NULL, store_name VARCHAR NOT NULL, price FLOAT NOT NULL, list_price FLOAT, "
+    "currency VARCHAR NOT NULL, timestamp DATETIME NOT NULL)",
+    "CREATE INDEX ix_price_snapshots_timestamp ON price_snapshots (timestamp)",
+    "CREATE TABLE game_metadata (id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL UNIQUE REFERENCES games (id), "
+    "description TEXT, tags TEXT, last_scraped_at DATETIME)",
+)
+
+# Name-keyed current prices without the columns later releases added
+LEGACY_CURRENT_PRICES = (
+    "CREATE TABLE current_prices (game_id INTEGER NOT NULL, store_name VARCHAR NOT NULL, source VARCHAR NOT NULL, "
+    "price FLOAT NOT NULL, list_price FLOAT, currency VARCHAR NOT NULL, timestamp DATETIME NOT NULL, "
+    "PRIMARY KEY (game_id, store_name))"
+)
+
+NOW = datetime(2024, 5, 1, 12, 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(
+            text(
+                "INSERT INTO games (id, title, api_game_id, created_at, updated_at) "
+                "VALUES (1, 'Portal', '100', :now, :now)"
+            ),
+            {"now": NOW},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO price_snapshots (id, game_id, source, store_name, price, list_price, currency, timestamp) "
+                "VALUES (:id, 1, 'cheapshark', :store, :price, 19.99, 'USD', :now)"
+            ),
+            [
+                {"id": 1, "store": "Steam", "price": 9.99, "now": NOW},
+                {"id": 2, "store": "Store 7", "price": 4.99, "now": NOW},
+            ],
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_baseline_database_is_upgraded(engine):
+    ensure_schema(engine)
+    with engine.connect() as conn:
+        assert not any(name.startswith("legacy_") for name in inspect(conn).get_table_names())
+        rows = conn.execute(
+            text(
+                "SELECT s.id, st.name, st.cheapshark_id, s.price_cents, s.list_price_cents, s.last_seen_at "
+                "FROM price_snapshots s JOIN stores st ON st.id = s.store_id ORDER BY s.id"
+            )
+        ).all()
+        games_columns = {column["name"] for column in inspect(conn).get_columns("games")}
+    assert [row[:5] for row in rows] == [(1, "Steam", None, 999, 1999), (2, "Store 7", "7", 499, 1999)]
+    # Baseline snapshots have no last_seen_at; they were last seen when taken
+    assert all(row[5] is not None for row in rows)
+    assert {"version", "best_price", "best_store_id"} <= games_columns
+
+
+def test_upgrade_tolerates_legacy_columns_missing(engine):
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_CURRENT_PRICES))
+        conn.execute(
+            text(
+                "INSERT INTO current_prices (game_id, store_name, source, price, list_price, currency, timestamp) "
+                "VALUES (1, 'Steam', 'cheapshark', 9.99, 19.99, 'USD', :now)"
+            ),
+            {"now": NOW},
+        )
+    ensure_schema(engine)
+    # A second start finds nothing left to upgrade
+    ensure_schema(engine)
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT price_cents, snapshot_id, last_seen_at FROM current_prices")).one()
+    assert row[0] == 999 and row[1] is None and row[2] is not None
@@ -0,0 +1,51 @@
+import asyncio
+
+from ..services.search_cache import TTLCache
+
+
+def test_cancelled_async_load_does_not_strand_waiters():
+    async def scenario():
+        started = asyncio.Event()
+        calls = []
+
+        async def slow_loader(key):
+            calls.append(key)
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast_loader(key):
+            calls.append(key)
+            return key.upper()
+
+        cache = TTLCache(loader=lambda key: key.upper())
+        loading = asyncio.create_task(cache.get_async("portal", slow_loader))
+        await started.wait()
+        waiting = asyncio.create_task(cache.get_async("portal", fast_loader))
+        await asyncio.sleep(0)
+        loading.cancel()
+        assert await asyncio.wait_for(waiting, 1) == "PORTAL"
+        assert calls == ["portal", "portal"]
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_shared_load_running():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def loader(key):
+            await release.wait()
+            return key.upper()
+
+        cache = TTLCache(loader=lambda key: key.upper())
+        loading = asyncio.create_task(cache.get_async("portal", loader))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(cache.get_async("portal", loader))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.wait_for(loading, 1) == "PORTAL"
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from .. import crud, models, schemas
+
+START = datetime(2024, 3, 1, 10, 0)
+PRICES = [9.99, 9.99, 9.99, 7.5, 7.5, 9.99]
+
+
+def _ingest(db, game_id, write_mode):
+    for hours, price in enumerate(PRICES):
+        crud.bulk_insert_snapshots(
+            db, [(game_id, "1", price, 20.0, "USD")], timestamp=START + timedelta(hours=hours), write_mode=write_mode
+        )
+
+
+def _snapshots(db, game_id):
+    snap = models.PriceSnapshot
+    rows = db.query(snap.price_cents, snap.timestamp, snap.last_seen_at).filter(snap.game_id == game_id)
+    return [(price, timestamp, last_seen_at or timestamp) for price, timestamp, last_seen_at in rows.order_by(snap.id)]
+
+
+def test_changes_mode_writes_a_row_per_price_change(db):
+    game = crud.create_game(db, schemas.GameCreate(api_game_id="1", title="Portal"))
+    _ingest(db, game.id, "changes")
+    hour = timedelta(hours=1)
+    assert _snapshots(db, game.id) == [
+        (999, START, START + 2 * hour),
+        (750, START + 3 * hour, START + 4 * hour),
+        (999, START + 5 * hour, START + 5 * hour),
+    ]
+    current = db.query(models.CurrentPrice).filter_by(game_id=game.id).one()
+    assert (current.price_cents, current.last_seen_at) == (999, START + 5 * hour)
+
+
+def test_compaction_turns_appended_history_into_change_only_history(db):
+    appended = crud.create_game(db, schemas.GameCreate(api_game_id="1", title="Portal"))
+    changes = crud.create_game(db, schemas.GameCreate(api_game_id="2", title="Braid"))
+    _ingest(db, appended.id, "append")
+    _ingest(db, changes.id, "changes")
+    assert len(_snapshots(db, appended.id)) == len(PRICES)
+
+    assert crud.compact_snapshots(db, appended.id) == 3
+    assert _snapshots(db, appended.id) == _snapshots(db, changes.id)
+    # Runs are only collapsed while the price is unchanged, so compacting again removes nothing
+    assert crud.compact_snapshots(db, appended.id) == 0
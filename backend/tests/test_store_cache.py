@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import update
+
+from .. import crud, models
+from ..services import store_cache
+
+
+def _rename_in_other_process(db, cheapshark_id, name):
+    """Renames a store the way another process's sync_stores would, leaving this process's cache alone."""
+    db.execute(update(models.Store).where(models.Store.cheapshark_id == cheapshark_id).values(name=name))
+    crud.bump_versions(db, ["stores"])
+    db.commit()
+
+
+def test_sync_store_cache_reloads_after_another_process_renames(db):
+    crud.sync_stores(db, {"1": "Steam", "2": "GOG"})
+    store_id = crud.resolve_store_ids(db, ["1"])["1"]
+    assert crud.get_store_names(db, [store_id]) == {store_id: "Steam"}
+
+    _rename_in_other_process(db, "1", "Steam Store")
+    assert crud.get_store_names(db, [store_id]) == {store_id: "Steam"}
+    crud.sync_store_cache(db)
+    assert crud.get_store_names(db, [store_id]) == {store_id: "Steam Store"}
+
+
+def test_sync_store_cache_is_a_noop_when_the_version_is_unchanged(db, monkeypatch):
+    crud.sync_stores(db, {"1": "Steam"})
+    assert store_cache.stores.version == crud.get_versions(db, ["stores"])["stores"]
+    monkeypatch.setattr(store_cache.stores, "load", lambda db: pytest.fail("reloaded without a version change"))
+    crud.sync_store_cache(db)
@@ -0,0 +1,25 @@
+from .. import crud, schemas
+from ..services import price_api, refresh, watchlist_import
+
+
+def _lookup(targets, *args):
+    """Stands in for CheapShark's multiple game lookup: every id resolves to one deal."""
+    deal = {"storeID": "1", "price": "4.99"}
+    details = {api_id: {"info": {"title": f"Game {api_id}"}, "deals": [deal]} for _, api_id in targets}
+    yield targets, details, None
+
+
+def test_import_counts_existing_and_duplicate_games_separately(db, monkeypatch):
+    monkeypatch.setattr(refresh, "lookup_batches", _lookup)
+    monkeypatch.setattr(price_api, "sync_stores", lambda db: False)
+    crud.create_game(db, schemas.GameCreate(api_game_id="1", title="Portal"))
+
+    games = [schemas.GameCreate(api_game_id=api_id) for api_id in ("1", "2", "2", "3", "1")]
+    summary = watchlist_import.import_games(db, games)
+
+    assert summary.games_requested == 5
+    assert summary.games_created == 2
+    assert summary.games_existing == 1
+    assert summary.games_duplicate == 2
+    assert summary.snapshots_inserted == 2
+    assert crud.get_existing_api_ids(db, ["1", "2", "3"]) == {"1", "2", "3"}
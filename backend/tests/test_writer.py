@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from .. import crud, models, schemas
+from ..services import search_index, writer
+
+
+@pytest.fixture
+def writes(engine, monkeypatch):
+    """An enabled write queue committing to the test database."""
+    monkeypatch.setattr(writer, "engine", engine)
+    return writer.WriteQueue(enabled=True)
+
+
+def test_run_async_commits_on_the_writer_thread(db, engine, writes):
+    threads = []
+
+    def create(session, game_in):
+        threads.append(threading.current_thread().name)
+        return crud.create_game(session, game_in).id
+
+    async def scenario():
+        async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+        try:
+            async with AsyncSession(async_engine) as session:
+                return await writes.run_async(session, create, schemas.GameCreate(api_game_id="1", title="Portal"))
+        finally:
+            await async_engine.dispose()
+
+    game_id = asyncio.run(scenario())
+    assert threads == ["sqlite-writer"]
+    assert db.get(models.Game, game_id).title == "Portal"
+    # The search index learns the game from the after-commit callback the job deferred
+    assert [item["title"] for item in search_index.index.search("portal")] == ["Portal"]
+
+
+def _insert_game(session, api_id, fail=False):
+    session.add(models.Game(api_game_id=api_id, title=f"Game {api_id}"))
+    session.commit()
+    if fail:
+        raise RuntimeError("job failed after committing")
+    return api_id
+
+
+def _insert_uncommitted_then_fail(session, api_id):
+    session.add(models.Game(api_game_id=api_id, title=f"Game {api_id}"))
+    session.flush()
+    raise RuntimeError("job failed before committing")
+
+
+def test_queued_writes_share_one_transaction_and_fail_alone(db, engine, monkeypatch):
+    monkeypatch.setattr(writer, "engine", engine)
+    writes = writer.WriteQueue(enabled=True, linger=0.5)
+    futures = [
+        writes.submit(_insert_game, "1"),
+        writes.submit(_insert_uncommitted_then_fail, "2"),
+        writes.submit(_insert_game, "3", fail=True),
+        writes.submit(_insert_game, "4"),
+    ]
+    assert futures[0].result(5) == "1"
+    with pytest.raises(RuntimeError, match="before committing"):
+        futures[1].result(5)
+    with pytest.raises(RuntimeError, match="after committing"):
+        futures[2].result(5)
+    assert futures[3].result(5) == "4"
+
+    assert writes.stats()["transactions"] == 1
+    assert writes.stats()["writes"] == 4
+    # The failed job's savepoint was rolled back; work a job committed before raising is kept
+    assert {api_id for (api_id,) in db.query(models.Game.api_game_id)} == {"1", "3", "4"}
+
+
+def test_after_commit_callbacks_wait_for_the_shared_commit(db, engine, writes):
+    events = []
+
+    def visible_games():
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(models.Game)).scalar()
+
+    def job(session):
+        session.add(models.Game(api_game_id="1", title="Portal"))
+        session.commit()
+        writer.after_commit(session, lambda: events.append(("callback", visible_games())))
+        events.append(("job done", visible_games()))
+
+    writes.submit(job).result(5)
+    # The job's commit() only released a savepoint; the callback sees the group's COMMIT
+    assert events == [("job done", 0), ("callback", 1)]
+
+
+def test_after_commit_runs_immediately_outside_the_queue(db):
+    events = []
+    writer.after_commit(db, lambda: events.append("callback"))
+    assert events == ["callback"]
@@ -19,22 +19,50 @@ export interface GameSummary {
   store_url?: string;
   best_price?: number;
   best_store?: string;
+  best_discount?: number;
   last_updated?: string;
   created_at?: string;
   updated_at?: string;
 }
 
+export type WatchlistSort = "created" | "title" | "best_price" | "discount" | "last_updated";
+
+export interface WatchlistQuery {
+  sort?: WatchlistSort;
+  order?: "asc" | "desc";
+  limit?: number;
+  cursor?: string | null;
+  max_price?: number;
+  store?: string;
+  title_prefix?: string;
+}
+
+export interface GamePage {
+  items: GameSummary[];
+  next_cursor?: string | null;
+}
+
 export interface PriceSnapshot {
   store_name: string;
   price: number;
   list_price?: number;
   currency: string;
   timestamp: string;
+  last_seen_at?: string | null;
 }
 
 export interface PriceHistoryPoint {
   date: string;
   min_price: number;
+  max_price?: number | null;
+  close_price?: number | null;
+}
+
+export type HistoryResolution = "day" | "week" | "month";
+
+export interface HistoryQuery {
+  resolution?: HistoryResolution;
+  days?: number;
 }
 
 export interface GameMetadata {
@@ -55,17 +83,22 @@ export const fetchSearchResults = async (query: string) => {
   return res.data;
 };
 
+export const fetchSuggestions = async (query: string) => {
+  const res = await api.get<SearchResult[]>("/search/suggest", { params: { q: query, limit: 8 } });
+  return res.data;
+};
+
 export const addGameToWatchlist = async (api_game_id: string) => {
   const res = await api.post("/games", { api_game_id });
   return res.data;
 };
 
-export const fetchWatchlist = async () => {
-  const res = await api.get<GameSummary[]>("/games");
+export const fetchWatchlist = async (query: WatchlistQuery = {}) => {
+  const res = await api.get<GamePage>("/games", { params: query });
   return res.data;
 };
 
-export const fetchGameDetail = async (id: string) => {
-  const res = await api.get<GameDetail>(`/games/${id}`);
+export const fetchGameDetail = async (id: string, query: HistoryQuery = {}) => {
+  const res = await api.get<GameDetail>(`/games/${id}`, { params: query });
   return res.data;
 };
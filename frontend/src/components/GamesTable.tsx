@@ -18,6 +18,7 @@ function GamesTable({ games }: Props) {
             <th></th>
             <th>Game</th>
             <th>Best price</th>
+            <th>Discount</th>
             <th>Store</th>
             <th>Last updated</th>
             <th></th>
@@ -46,6 +47,7 @@ function GamesTable({ games }: Props) {
               </td>
               <td>{game.title}</td>
               <td>{game.best_price ? `$${game.best_price}` : "-"}</td>
+              <td>{game.best_discount ? `-${game.best_discount}%` : "-"}</td>
               <td>{game.best_store || "-"}</td>
               <td>{game.last_updated ? new Date(game.last_updated).toLocaleString() : "-"}</td>
               <td>
@@ -1,4 +1,5 @@
-import { FormEvent, useState } from "react";
+import { FormEvent, useEffect, useState } from "react";
+import { fetchSuggestions } from "../api/client";
 
 interface Props {
   onSearch: (query: string) => void;
@@ -7,6 +8,27 @@ interface Props {
 
 function SearchBar({ onSearch, loading }: Props) {
   const [query, setQuery] = useState("");
+  const [suggestions, setSuggestions] = useState<string[]>([]);
+
+  // Suggestions come from the backend's local title index, so they never hit CheapShark
+  useEffect(() => {
+    const trimmed = query.trim();
+    if (trimmed.length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    fetchSuggestions(trimmed)
+      .then((results) => {
+        if (!cancelled) setSuggestions(results.map((r) => r.title));
+      })
+      .catch(() => {
+        if (!cancelled) setSuggestions([]);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [query]);
 
   const handleSubmit = (e: FormEvent) => {
     e.preventDefault();
@@ -20,6 +42,7 @@ function SearchBar({ onSearch, loading }: Props) {
         <input
           type="text"
           placeholder="Search for a game..."
+          list="search-suggestions"
           value={query}
           onChange={(e) => setQuery(e.target.value)}
           style={{
@@ -31,6 +54,11 @@ function SearchBar({ onSearch, loading }: Props) {
             color: "#e2e8f0"
           }}
         />
+        <datalist id="search-suggestions">
+          {suggestions.map((title) => (
+            <option key={title} value={title} />
+          ))}
+        </datalist>
         <button className="button" type="submit" disabled={loading}>
           {loading ? "Searching..." : "Search"}
         </button>
@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { Link, useParams } from "react-router-dom";
-import { GameDetail, fetchGameDetail } from "../api/client";
+import { GameDetail, HistoryResolution, fetchGameDetail } from "../api/client";
 import PriceChart from "../components/PriceChart";
 
 function GameDetailPage() {
@@ -8,13 +8,15 @@ function GameDetailPage() {
   const [data, setData] = useState<GameDetail | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [resolution, setResolution] = useState<HistoryResolution>("day");
+  const [days, setDays] = useState<number | undefined>(90);
 
   useEffect(() => {
     const load = async () => {
       if (!id) return;
       setLoading(true);
       try {
-        const res = await fetchGameDetail(id);
+        const res = await fetchGameDetail(id, { resolution, days });
         setData(res);
       } catch (err) {
         console.error(err);
@@ -24,7 +26,7 @@ function GameDetailPage() {
       }
     };
     load();
-  }, [id]);
+  }, [id, resolution, days]);
 
   if (loading) return <div className="card">Loading...</div>;
   if (error) return <div className="card">{error}</div>;
@@ -94,7 +96,7 @@ function GameDetailPage() {
                   <td>{p.store_name}</td>
                   <td>${p.price.toFixed(2)}</td>
                   <td>{p.list_price ? `$${p.list_price.toFixed(2)}` : "-"}</td>
-                  <td>{new Date(p.timestamp).toLocaleString()}</td>
+                  <td>{new Date(p.last_seen_at ?? p.timestamp).toLocaleString()}</td>
                 </tr>
               ))}
             </tbody>
@@ -103,7 +105,25 @@ function GameDetailPage() {
       </div>
 
       <div>
-        <h3 className="section-title">Price history</h3>
+        <div style={{ display: "flex", justifyContent: "space-between", alignItems: "center" }}>
+          <h3 className="section-title">Price history</h3>
+          <div style={{ display: "flex", gap: 8 }}>
+            <select value={resolution} onChange={(e) => setResolution(e.target.value as HistoryResolution)}>
+              <option value="day">Daily</option>
+              <option value="week">Weekly</option>
+              <option value="month">Monthly</option>
+            </select>
+            <select
+              value={days ?? ""}
+              onChange={(e) => setDays(e.target.value ? Number(e.target.value) : undefined)}
+            >
+              <option value="30">Last 30 days</option>
+              <option value="90">Last 90 days</option>
+              <option value="365">Last year</option>
+              <option value="">All time</option>
+            </select>
+          </div>
+        </div>
         <PriceChart data={history} />
       </div>
 
@@ -2,6 +2,7 @@ import { useEffect, useState } from "react";
 import {
   SearchResult,
   GameSummary,
+  WatchlistSort,
   fetchSearchResults,
   addGameToWatchlist,
   fetchWatchlist
@@ -13,15 +14,18 @@ import GamesTable from "../components/GamesTable";
 function HomePage() {
   const [searchResults, setSearchResults] = useState<SearchResult[]>([]);
   const [watchlist, setWatchlist] = useState<GameSummary[]>([]);
+  const [sort, setSort] = useState<WatchlistSort>("created");
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loadingSearch, setLoadingSearch] = useState(false);
   const [loadingWatchlist, setLoadingWatchlist] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
-  const loadWatchlist = async () => {
+  const loadWatchlist = async (cursor: string | null = null) => {
     setLoadingWatchlist(true);
     try {
-      const data = await fetchWatchlist();
-      setWatchlist(data);
+      const page = await fetchWatchlist({ sort, cursor });
+      setWatchlist((current) => (cursor ? [...current, ...page.items] : page.items));
+      setNextCursor(page.next_cursor ?? null);
     } catch (err) {
       console.error(err);
       setError("Failed to load watchlist");
@@ -32,7 +36,7 @@ function HomePage() {
 
   useEffect(() => {
     loadWatchlist();
-  }, []);
+  }, [sort]);
 
   const handleSearch = async (query: string) => {
     setError(null);
@@ -84,8 +88,24 @@ function HomePage() {
       )}
 
       <div className="card" style={{ border: "none", background: "transparent", boxShadow: "none" }}>
-        <h3 className="section-title">Watchlist</h3>
-        {loadingWatchlist ? <div>Loading watchlist...</div> : <GamesTable games={watchlist} />}
+        <div style={{ display: "flex", justifyContent: "space-between", alignItems: "center" }}>
+          <h3 className="section-title">Watchlist</h3>
+          <select value={sort} onChange={(e) => setSort(e.target.value as WatchlistSort)}>
+            <option value="created">Recently added</option>
+            <option value="best_price">Lowest price</option>
+            <option value="discount">Biggest discount</option>
+            <option value="last_updated">Recently updated</option>
+            <option value="title">Title</option>
+          </select>
+        </div>
+        {loadingWatchlist && watchlist.length === 0 ? <div>Loading watchlist...</div> : <GamesTable games={watchlist} />}
+        {nextCursor && (
+          <div style={{ textAlign: "center", marginTop: 12 }}>
+            <button className="button" onClick={() => loadWatchlist(nextCursor)} disabled={loadingWatchlist}>
+              {loadingWatchlist ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );